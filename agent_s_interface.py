@@ -1,20 +1,16 @@
 import os
+from typing import Any, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Try to import Orgo first, then fall back to Agent-S
-try:
-    from orgo import Computer
-    ORGO_AVAILABLE = True
-except ImportError:
-    ORGO_AVAILABLE = False
+from orgo_pool import ORGO_AVAILABLE, get_default_pool
 
 # Try Agent-S imports
 try:
     from gui_agents.core.AgentS import UIAgent
-    from PIL import Image
     from mss import mss
     AGENT_S_AVAILABLE = True
 except ImportError:
@@ -22,16 +18,127 @@ except ImportError:
 
 def get_screenshot():
     """
-    Captures a screenshot of the primary monitor.
+    Captures a screenshot of the primary monitor (or SCREEN_CAPTURE_REGION),
+    downscaled for the vision model by the shared capture service.
+    """
+    from screen_capture import get_capture_service
+    return get_capture_service().grab(encode=False).image
+
+class CalendarExecutor:
+    """
+    Layer 2 backend interface. execute() raises on failure;
+    supports() says whether the backend can create the given event.
+    """
+
+    name = "executor"
+    # run_executor passes the structured event details to executors that set this
+    accepts_event_details = True
+
+    def available(self) -> bool:
+        return True
+
+    def supports(self, event_details: Optional[Dict]) -> bool:
+        return True
+
+    def execute(self, instruction: str, event_details: Optional[Dict] = None) -> Any:
+        raise NotImplementedError
+
+    def __call__(self, instruction: str, event_details: Optional[Dict] = None) -> Any:
+        return self.execute(instruction, event_details)
+
+
+class OrgoExecutor(CalendarExecutor):
+    """
+    GUI automation on the Orgo cloud desktop (any instruction)
+    """
+
+    name = "orgo"
+
+    def available(self) -> bool:
+        return ORGO_AVAILABLE
+
+    def execute(self, instruction: str, event_details: Optional[Dict] = None) -> Any:
+        # Lease a warm computer from the shared pool instead of connecting on every call
+        with get_default_pool().lease() as computer:
+            print("🚀 Sending instruction to Orgo cloud desktop...")
+            return computer.prompt(instruction)
+
+
+class LocalAgentSExecutor(CalendarExecutor):
+    """
+    GUI automation with Agent-S on this machine (any instruction)
+    """
+
+    name = "agent_s"
+
+    def available(self) -> bool:
+        return AGENT_S_AVAILABLE
+
+    def execute(self, instruction: str, event_details: Optional[Dict] = None) -> Any:
+        from local_agent_loop import DEFAULT_MAX_STEPS, AgentSPlanner, LocalAgentLoop, PyAutoGUIDriver
+
+        # Initialize UIAgent with OpenAI
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set.")
+        agent = UIAgent(api_key=api_key, model="gpt-4o")
+
+        # Screenshot -> Agent-S -> actions, step by step until Agent-S reports DONE
+        loop = LocalAgentLoop(AgentSPlanner(agent), PyAutoGUIDriver(), get_screenshot,
+                              max_steps=int(os.getenv("AGENT_S_MAX_STEPS", str(DEFAULT_MAX_STEPS))))
+        print("Running Agent-S step loop...")
+        result = loop.run(instruction)
+        if not result.success and result.resumable:
+            print(f"↩️ {result.reason}; resuming after step {result.state.last_good_step}...")
+            result = loop.run(instruction, resume=result.state)
+        if not result.success:
+            raise RuntimeError(f"Agent-S did not finish: {result.reason}")
+        print(f"✅ Agent-S finished in {len(result.state.steps)} step(s), {result.seconds:.1f}s ({result.reason})")
+        return result
+
+
+_executors: Optional[List[CalendarExecutor]] = None
+
+
+def get_executors() -> List[CalendarExecutor]:
+    """
+    Registered executors in preference order: the Calendar API first (fast, needs
+    event details), then the GUI backends that can run any instruction
+    """
+    global _executors
+    if _executors is None:
+        from google_calendar_api import GoogleCalendarAPIExecutor
+        _executors = [GoogleCalendarAPIExecutor(), OrgoExecutor(), LocalAgentSExecutor()]
+    return _executors
+
+
+def register_executor(executor: CalendarExecutor, first: bool = True) -> None:
+    """
+    Adds a backend, ahead of the built-in ones unless first is False
+    """
+    executors = get_executors()
+    executors.insert(0 if first else len(executors), executor)
+
+
+def select_executor(event_details: Optional[Dict] = None) -> Optional[CalendarExecutor]:
+    """
+    First available executor that supports the event
+    """
+    for executor in get_executors():
+        if executor.available() and executor.supports(event_details):
+            return executor
+    return None
+
+
+def run_executor(executor: Callable[..., Any], instruction: str, event_details: Optional[Dict] = None) -> Any:
+    """
+    Calls a Layer 2 executor. Executors that declare accepts_event_details also get
+    the structured event; plain callables only take the instruction.
     """
-    with mss() as sct:
-        # Get information of monitor 1
-        monitor = sct.monitors[1]
-        # Grab the data
-        sct_img = sct.grab(monitor)
-        # Convert to PIL Image
-        img = Image.frombytes("RGB", sct_img.size, sct_img.rgb)
-        return img
+    if event_details is not None and getattr(executor, "accepts_event_details", False):
+        return executor(instruction, event_details=event_details)
+    return executor(instruction)
+
 
 def create_calendar_event_with_orgo(instruction: str):
     """
@@ -43,13 +150,7 @@ def create_calendar_event_with_orgo(instruction: str):
     print(f"🌐 Watch at: https://www.orgo.ai/projects/computer-ppgg5d6j")
 
     try:
-        # Initialize Orgo Computer
-        project_id = "computer-ppgg5d6j"
-        computer = Computer(project_id=project_id)
-        
-        print("🚀 Sending instruction to Orgo cloud desktop...")
-        result = computer.prompt(instruction)
-        
+        result = OrgoExecutor().execute(instruction)
         print(f"✅ Orgo Result: {result}")
         return result
 
@@ -58,53 +159,59 @@ def create_calendar_event_with_orgo(instruction: str):
         print("Please ensure Orgo is properly configured and your project is running.")
         return None
 
-def create_calendar_event_with_agent_s(instruction: str):
+def create_calendar_event_with_agent_s(instruction: str, event_details: Optional[Dict] = None):
     """
     Sends an instruction to create a calendar event.
-    Tries Orgo first, then falls back to Agent-S.
+    The default ExecutorRouter picks the fastest healthy backend that supports the event
+    (Calendar API, Orgo or local Agent-S) and fails over to the next one on errors.
+    Raises the router's error when nothing could create the event (NoExecutorAvailableError,
+    DuplicateExecutionError or the last executor's error), so callers don't report it as created.
     """
+    from executor_router import NoExecutorAvailableError, get_default_router
+
     print(f"🎯 Creating calendar event with instruction:")
     print(f"   {instruction[:100]}...")
-    
-    # Try Orgo first (preferred for cloud execution)
-    if ORGO_AVAILABLE:
-        print("🌐 Using Orgo cloud desktop...")
-        return create_calendar_event_with_orgo(instruction)
-    
-    # Fall back to Agent-S
-    elif AGENT_S_AVAILABLE:
-        print("🤖 Using Agent-S local execution...")
-        return create_calendar_event_with_local_agent_s(instruction)
-    
-    else:
+
+    try:
+        return get_default_router().execute(instruction, event_details)
+    except NoExecutorAvailableError:
         print("❌ Neither Orgo nor Agent-S is available!")
         print("Please install one of them:")
         print("   pip install orgo")
         print("   or install Agent-S following the setup guide")
+        raise
+
+create_calendar_event_with_agent_s.accepts_event_details = True
+
+def create_calendar_event_or_none(instruction: str, event_details: Optional[Dict] = None):
+    """
+    Legacy wrapper for scripts: like create_calendar_event_with_agent_s, but prints the error
+    and returns None instead of raising
+    """
+    from execution_ledger import DuplicateExecutionError
+    from executor_router import NoExecutorAvailableError
+
+    try:
+        return create_calendar_event_with_agent_s(instruction, event_details)
+    except NoExecutorAvailableError:
+        return None
+    except DuplicateExecutionError as e:
+        print(f"⚠️ Not creating the event again: {e}")
+        return None
+    except Exception as e:
+        print(f"❌ Error during calendar event creation (all executors failed): {e}")
         return None
 
+create_calendar_event_or_none.accepts_event_details = True
+
 def create_calendar_event_with_local_agent_s(instruction: str):
     """
     Local Agent-S execution (fallback method)
     """
     try:
-        # Initialize UIAgent with OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set.")
-        agent = UIAgent(api_key=api_key, model="gpt-4o")
-
-        # Capture screenshot
-        screenshot = get_screenshot()
-
-        if screenshot:
-            print("Sending instruction and screenshot to Agent-S...")
-            result = agent.run(screenshot=screenshot, instruction=instruction)
-            print(f"Agent-S Result: {result}")
-            return result
-        else:
-            print("Could not capture screenshot. Agent-S interaction aborted.")
-            return None
+        result = LocalAgentSExecutor().execute(instruction)
+        print(f"Agent-S Result: {result}")
+        return result
 
     except Exception as e:
         print(f"Error during Agent-S interaction: {e}")
@@ -114,4 +221,4 @@ def create_calendar_event_with_local_agent_s(instruction: str):
 if __name__ == "__main__":
     # Example usage (for testing the interface)
     test_instruction = "Open Firefox, navigate to Google Calendar, and create an event titled 'Team Meeting' on August 1st, 2025 at 10 AM for 1 hour."
-    create_calendar_event_with_agent_s(test_instruction)
\ No newline at end of file
+    create_calendar_event_or_none(test_instruction)
\ No newline at end of file
@@ -0,0 +1,342 @@
+"""
+Async Multi-Layer Calendar System
+asyncio twin of multi_layer_prompt_system built on openai.AsyncOpenAI, so a
+single event loop can serve many users at once. Layer 1 LLM calls and
+Layer 2 executions each have their own concurrency limit.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import inspect
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import openai
+from dotenv import load_dotenv
+from agent_s_interface import create_calendar_event_with_agent_s, run_executor
+from llm_cache import LLMResponseCache
+from multi_layer_prompt_system import (
+    PIPELINE_MODES,
+    SINGLE_CALL_RESPONSE_FORMAT,
+    STRUCTURED_OUTPUT_MODEL,
+    PromptEngineeringBase,
+    observe_stage_timings,
+)
+from rate_limiter import request_key
+from resilience import retry_budget
+from tracing import SPAN_KIND_CLIENT, get_tracer
+
+# Load environment variables from .env file
+load_dotenv()
+
+DEFAULT_MAX_CONCURRENT_LLM_CALLS = 64
+DEFAULT_MAX_CONCURRENT_EXECUTIONS = 4
+
+AnswerProvider = Callable[[List[str]], Union[Dict[str, str], Awaitable[Dict[str, str]]]]
+
+
+class AsyncPromptEngineeringLayer(PromptEngineeringBase):
+    """
+    Layer 1 on AsyncOpenAI: same prompts, fast path, cache and compiler as PromptEngineeringLayer
+    """
+
+    def __init__(self, api_key: str, model: str = "gpt-4",
+                 max_concurrent_calls: int = DEFAULT_MAX_CONCURRENT_LLM_CALLS,
+                 use_fast_path: bool = True, fast_path_threshold: float = 0.75,
+                 use_cache: bool = True, cache: Optional[LLMResponseCache] = None,
+                 use_local_compiler: bool = True):
+        super().__init__(model=model, use_fast_path=use_fast_path, fast_path_threshold=fast_path_threshold,
+                         use_cache=use_cache, cache=cache, use_local_compiler=use_local_compiler)
+        self.client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)
+        # Bounds in-flight completions; callers beyond the limit wait on the event loop
+        self._call_slots = asyncio.Semaphore(max_concurrent_calls)
+
+    async def _chat_completion(self, messages: List[Dict[str, str]], temperature: float,
+                               parse: Optional[Callable[[str], Any]] = None,
+                               response_format: Optional[Dict] = None, stage: str = "llm") -> Any:
+        """
+        Async version of PromptEngineeringLayer._chat_completion.
+        Cache lookups run in a worker thread so SQLite never blocks the event loop.
+        """
+        with get_tracer().span("llm.chat_completion", kind=SPAN_KIND_CLIENT) as span:
+            self._start_llm_span(span, stage, temperature, response_format, streamed=False)
+            cache_extra = {"response_format": response_format} if response_format else None
+            if self.cache is not None:
+                cached = await asyncio.to_thread(self.cache.get, self.model, messages, temperature, cache_extra)
+                if cached is not None:
+                    try:
+                        result = parse(cached) if parse else cached
+                        span.set_attribute("llm.cache_hit", True)
+                        self.token_usage.record(stage, 0, 0, cache_hit=True)
+                        return result
+                    except ValueError:
+                        await asyncio.to_thread(self.cache.invalidate, self.model, messages, temperature, cache_extra)
+
+            request = {"model": self.model, "messages": messages, "temperature": temperature}
+            if response_format:
+                request["response_format"] = response_format
+            reserved = self._estimate_tokens(messages)
+
+            async def create():
+                # Rate limit waits happen before taking a call slot, so they don't hold one
+                waited = await self.rate_limiter.aacquire(reserved)
+                if waited:
+                    span.set_attribute("llm.rate_limit_wait_ms", waited * 1000)
+                try:
+                    async with self._call_slots:
+                        return await self.client.chat.completions.create(**request)
+                except BaseException:
+                    # Only the attempt that returns is settled against its usage (see _rate_limited)
+                    self.rate_limiter.adjust_tokens(-reserved)
+                    raise
+
+            async def call_upstream():
+                response = await self.retry_engine.acall(create)
+                return response.choices[0].message.content, getattr(response, "usage", None)
+
+            (content, usage), shared = await self.single_flight.ado(request_key(request), call_upstream)
+            if shared:
+                self._record_shared(span, stage)
+            else:
+                self._account_tokens(span, stage, messages, content, usage, reserved)
+            result = parse(content) if parse else content
+
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, self.model, messages, temperature, content, cache_extra)
+            return result
+
+    async def analyze_user_input(self, user_input: str) -> Dict:
+        """
+        Async version of PromptEngineeringLayer.analyze_user_input
+        """
+        analysis = self._fast_path_analysis(user_input)
+        if analysis is not None:
+            return analysis
+
+        try:
+            return await self._chat_completion(
+                messages=self._analysis_messages(user_input),
+                temperature=0.3,
+                parse=json.loads,
+                stage="analyze"
+            )
+        except Exception as e:
+            self._use_fallback("analyze", e)
+            return self._fallback_analysis()
+
+    async def refine_event_details(self, initial_details: Dict, user_answers: Dict[str, str]) -> Dict:
+        """
+        Async version of PromptEngineeringLayer.refine_event_details
+        """
+        try:
+            return await self._chat_completion(
+                messages=self._refine_messages(initial_details, user_answers),
+                temperature=0.2,
+                parse=json.loads,
+                stage="refine"
+            )
+        except Exception as e:
+            self._use_fallback("refine", e)
+            return initial_details
+
+    async def generate_agent_s_instruction(self, event_details: Dict) -> str:
+        """
+        Async version of PromptEngineeringLayer.generate_agent_s_instruction
+        """
+        instruction = self._compile_instruction(event_details)
+        if instruction is not None:
+            return instruction
+
+        try:
+            return await self._chat_completion(
+                messages=self._instruction_messages(event_details),
+                temperature=0.1,
+                stage="generate"
+            )
+        except Exception as e:
+            self._use_fallback("generate", e)
+            return self._fallback_instruction(event_details)
+
+    async def analyze_and_instruct(self, user_input: str) -> Dict:
+        """
+        Async version of PromptEngineeringLayer.analyze_and_instruct
+        """
+        analysis = self._fast_path_analysis(user_input)
+        if analysis is not None:
+            return dict(analysis, agent_s_instruction="")
+
+        try:
+            plan = await self._chat_completion(
+                messages=self._plan_messages(user_input),
+                temperature=0.2,
+                parse=json.loads,
+                response_format=SINGLE_CALL_RESPONSE_FORMAT,
+                stage="plan"
+            )
+            return self._clean_plan(plan)
+        except Exception as e:
+            self._use_fallback("plan", e)
+            return dict(self._fallback_analysis(), agent_s_instruction="")
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class AsyncMultiLayerCalendarSystem:
+    """
+    Async orchestrator: many requests share one event loop, one AsyncOpenAI
+    client and a small thread pool for the blocking Layer 2 executor
+    """
+
+    def __init__(self, openai_api_key: str, pipeline_mode: str = "multi_call", model: Optional[str] = None,
+                 max_concurrent_llm_calls: int = DEFAULT_MAX_CONCURRENT_LLM_CALLS,
+                 max_concurrent_executions: int = DEFAULT_MAX_CONCURRENT_EXECUTIONS,
+                 executor: Callable[[str], Any] = create_calendar_event_with_agent_s, use_cache: bool = True):
+        """
+        Args:
+            openai_api_key: OpenAI API key for Layer 1
+            pipeline_mode: "multi_call" or "single_call", as in MultiLayerCalendarSystem
+            model: Layer 1 model; defaults to gpt-4, or gpt-4o in single_call mode
+            max_concurrent_llm_calls: Upper bound on in-flight OpenAI requests
+            max_concurrent_executions: Upper bound on simultaneous Layer 2 executions
+            executor: Blocking Layer 2 function that takes the Agent-S instruction, or a CalendarExecutor
+            use_cache: Whether Layer 1 uses the shared LLM response cache
+        """
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"pipeline_mode must be one of {PIPELINE_MODES}")
+        if model is None:
+            model = STRUCTURED_OUTPUT_MODEL if pipeline_mode == "single_call" else "gpt-4"
+        self.prompt_engineer = AsyncPromptEngineeringLayer(
+            openai_api_key, model=model, max_concurrent_calls=max_concurrent_llm_calls, use_cache=use_cache
+        )
+        self.pipeline_mode = pipeline_mode
+        self.executor = executor
+        self._execution_pool = ThreadPoolExecutor(
+            max_workers=max_concurrent_executions, thread_name_prefix="layer2"
+        )
+
+    async def aprepare_event(self, user_input: str, ask: Optional[AnswerProvider] = None,
+                             request_id: Optional[str] = None) -> Tuple[Dict, str, Dict[str, float]]:
+        """
+        Runs Layer 1 and returns (event_details, agent_s_instruction, timings).
+        ask may be sync or async; without it clarification questions are skipped,
+        since there is no terminal to ask on when serving many users.
+        """
+        tag = f"[{request_id}] " if request_id else ""
+        timings: Dict[str, float] = {}
+        layer_start = time.perf_counter()
+
+        print(f"{tag}🧠 Layer 1: Analyzing your request...")
+        stage_start = time.perf_counter()
+        tracer = get_tracer()
+        with tracer.span("layer1.analyze"):
+            if self.pipeline_mode == "single_call":
+                analysis = await self.prompt_engineer.analyze_and_instruct(user_input)
+            else:
+                analysis = await self.prompt_engineer.analyze_user_input(user_input)
+        timings["analyze"] = time.perf_counter() - stage_start
+        print(f"{tag}📊 Confidence level: {analysis['confidence']:.1%}")
+
+        agent_s_instruction = analysis.get("agent_s_instruction", "")
+        event_details = analysis['extracted_details']
+        if analysis['confidence'] < 0.8 and analysis['clarification_questions'] and ask is not None:
+            print(f"{tag}❓ Missing information: {analysis['missing_details']}")
+            user_answers = ask(analysis['clarification_questions'])
+            if inspect.isawaitable(user_answers):
+                user_answers = await user_answers
+
+            print(f"{tag}🔄 Refining event details...")
+            stage_start = time.perf_counter()
+            with tracer.span("layer1.refine"):
+                event_details = await self.prompt_engineer.refine_event_details(event_details, user_answers)
+            timings["refine"] = time.perf_counter() - stage_start
+            agent_s_instruction = ""
+
+        if not agent_s_instruction:
+            stage_start = time.perf_counter()
+            with tracer.span("layer1.generate"):
+                agent_s_instruction = await self.prompt_engineer.generate_agent_s_instruction(event_details)
+            timings["generate"] = time.perf_counter() - stage_start
+
+        timings["layer1_total"] = time.perf_counter() - layer_start
+        observe_stage_timings(timings, self.pipeline_mode)
+        return event_details, agent_s_instruction, timings
+
+    async def acreate_calendar_event(self, user_input: str, ask: Optional[AnswerProvider] = None) -> bool:
+        """
+        Async version of MultiLayerCalendarSystem.create_calendar_event.
+        The blocking Layer 2 executor runs on the bounded execution pool and is awaited.
+        """
+        request_id = uuid.uuid4().hex[:8]
+        tracer = get_tracer()
+        with tracer.span("calendar.create_event", {"request.id": request_id,
+                                                   "pipeline.mode": self.pipeline_mode}) as request_span, \
+                retry_budget():
+            print(f"[{request_id}] 🎯 Processing request: {user_input}")
+
+            event_details, agent_s_instruction, _ = await self.aprepare_event(user_input, ask, request_id)
+
+            print(f"[{request_id}] 🚀 Layer 2: Executing with Agent-S...")
+            loop = asyncio.get_running_loop()
+            stage_start = time.perf_counter()
+            with tracer.span("layer2.execute") as span:
+                try:
+                    # run_in_executor doesn't carry contextvars; copy them so the executor's spans and
+                    # retry budget belong to this request
+                    context = contextvars.copy_context()
+                    await loop.run_in_executor(self._execution_pool, context.run, run_executor, self.executor,
+                                               agent_s_instruction, event_details)
+                    print(f"[{request_id}] ✅ Calendar event creation completed!")
+                    return True
+                except Exception as e:
+                    span.record_exception(e)
+                    request_span.set_status(False, str(e))
+                    print(f"[{request_id}] ❌ Error during Agent-S execution: {e}")
+                    return False
+                finally:
+                    observe_stage_timings({"execute": time.perf_counter() - stage_start}, self.pipeline_mode)
+
+    async def acreate_many(self, user_inputs: List[str], ask: Optional[AnswerProvider] = None) -> List[bool]:
+        """
+        Processes many requests concurrently; results are in input order
+        """
+        return await asyncio.gather(*(self.acreate_calendar_event(text, ask) for text in user_inputs))
+
+    async def aclose(self) -> None:
+        """
+        Closes the OpenAI client and waits for running executions
+        """
+        await self.prompt_engineer.aclose()
+        await asyncio.to_thread(self._execution_pool.shutdown, True)
+
+
+async def _demo(api_key: str) -> None:
+    calendar_system = AsyncMultiLayerCalendarSystem(api_key)
+    demo_inputs = [
+        "create a diving event on August 22nd at 8am for 2 hours",
+        "meeting with John tomorrow at 2pm for 30 minutes",
+        "gym session next Friday at 8:30am for 1 hour",
+    ]
+    try:
+        results = await calendar_system.acreate_many(demo_inputs)
+        for user_input, success in zip(demo_inputs, results):
+            print(f"{'✅' if success else '❌'} {user_input}")
+    finally:
+        await calendar_system.aclose()
+
+
+def main():
+    """
+    Runs a few demo requests concurrently on one event loop
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is required")
+    asyncio.run(_demo(api_key))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Offline Load Test and Latency Benchmark
+Drives MultiLayerCalendarSystem and OptimizedCalendarAgent against local
+stand-ins: an OpenAI-compatible HTTP server and a fake Orgo Computer, both
+with configurable latency distributions and failure rates. Reports
+throughput and p50/p95/p99 per stage for each concurrency level as JSON,
+so runs can be compared between releases.
+
+Usage:
+    python benchmark.py --requests 200 --concurrency 1,8,32 --output bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import openai
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+from performance_optimizer import OptimizedCalendarAgent
+from progress_events import ProgressReporter
+from rate_limiter import RateLimiter
+
+REPORT_VERSION = 1
+
+# Parsed locally by the fast path
+FAST_PATH_INPUTS = [
+    "Dentist on August 22nd at 8am for 1 hour",
+    "Gym session next Friday at 6:30pm for 90 minutes",
+    "Lunch with Sarah at Cafe Nero tomorrow from 1 to 2:30pm",
+]
+# Recurring / vague requests that always reach the LLM
+LLM_INPUTS = [
+    "Team standup every Monday at 9am for 30 minutes",
+    "dinner with the team sometime next week in the evening",
+    "block out focus time after lunch on weekdays",
+]
+
+FAKE_DETAILS = {
+    "title": "Team standup", "date": "2030-02-04", "time": "09:00",
+    "duration": "30 minutes", "location": ""
+}
+
+
+class LatencyModel:
+    """
+    Log-normal latency with a given mean and standard deviation, plus a failure probability
+    """
+
+    def __init__(self, mean_ms: float = 0.0, stddev_ms: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """
+        Returns a latency in seconds
+        """
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.stddev_ms <= 0:
+            return self.mean_ms / 1000
+        # Log-normal parameters with the requested mean and standard deviation
+        sigma2 = math.log(1 + (self.stddev_ms / self.mean_ms) ** 2)
+        mu = math.log(self.mean_ms) - sigma2 / 2
+        with self._lock:
+            return self._random.lognormvariate(mu, math.sqrt(sigma2)) / 1000
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"mean_ms": self.mean_ms, "stddev_ms": self.stddev_ms, "failure_rate": self.failure_rate}
+
+
+def _fake_completion(request: Dict[str, Any]) -> str:
+    """
+    Picks a plausible response for whichever Layer 1 prompt this is
+    """
+    messages = request.get("messages", [])
+    system_prompt = messages[0]["content"].lower() if messages else ""
+    if request.get("response_format"):
+        return json.dumps({
+            "extracted_details": FAKE_DETAILS, "missing_details": [], "confidence": 0.95,
+            "clarification_questions": [], "agent_s_instruction": "Open Google Calendar and create the event."
+        })
+    if "refine" in system_prompt:
+        return json.dumps(FAKE_DETAILS)
+    if "analyz" in system_prompt:
+        return json.dumps({
+            "extracted_details": FAKE_DETAILS, "missing_details": [], "confidence": 0.9,
+            "clarification_questions": []
+        })
+    return "Open Google Calendar, click Create, fill in the event details and click Save."
+
+
+class FakeOpenAIServer:
+    """
+    Local OpenAI-compatible /v1/chat/completions endpoint (plain and streamed responses)
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency or LatencyModel()
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = json.loads(body or b"{}")
+                time.sleep(server.latency.sample())
+                with server._lock:
+                    server.requests += 1
+                if server.latency.should_fail():
+                    with server._lock:
+                        server.failures += 1
+                    self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+                    return
+                content = _fake_completion(request)
+                if request.get("stream"):
+                    self._send_stream(request, content)
+                else:
+                    self._send_json(200, server.completion_body(request, content))
+
+            def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, request: Dict[str, Any], content: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                base = {"id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": request.get("model", "")}
+                for start in range(0, len(content), 16):
+                    chunk = dict(base, choices=[{"index": 0, "delta": {"content": content[start:start + 16]},
+                                                 "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                final = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def completion_body(request: Dict[str, Any], content: str) -> Dict[str, Any]:
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+class FakeComputer:
+    """
+    Stands in for orgo.Computer; prompt() sleeps for a sampled latency and may fail
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None, project_id: Optional[str] = None):
+        self.latency = latency or LatencyModel()
+        self.project_id = project_id
+        self.prompts = 0
+
+    def prompt(self, instruction: str) -> str:
+        time.sleep(self.latency.sample())
+        self.prompts += 1
+        if self.latency.should_fail():
+            raise RuntimeError("injected computer failure")
+        return "Event created"
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def status(self) -> Dict[str, str]:
+        return {"status": "running"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile (pct in 0-100) of a list of values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """
+    count/mean/p50/p95/p99/max of latencies in seconds, reported in milliseconds
+    """
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3),
+    }
+
+
+class _TimingReporter(ProgressReporter):
+    """
+    Silent reporter that keeps the per-stage timings of one request and the stage it last entered
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.current_stage = ""
+
+    def log(self, message: str) -> None:
+        pass
+
+    def stage(self, name: str) -> None:
+        self.current_stage = name
+
+    def finished(self, success: bool, data: Optional[Dict[str, Any]] = None) -> None:
+        self.timings = dict((data or {}).get("timings", {}))
+
+
+@contextlib.contextmanager
+def _quiet(enabled: bool):
+    # The pipeline prints and logs per request from worker threads; silence that for clean JSON output
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        logging.disable(logging.INFO)
+        try:
+            yield
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+def bench_multi_layer(base_url: str, requests: int, concurrency: int, computer: FakeComputer,
+                      pipeline_mode: str = "multi_call", llm_fraction: float = 0.5,
+                      seed: int = 0) -> Dict[str, Any]:
+    """
+    Runs MultiLayerCalendarSystem.create_calendar_event end to end at a fixed concurrency
+    """
+    system = MultiLayerCalendarSystem("bench-key", pipeline_mode=pipeline_mode, executor=computer.prompt,
+                                      use_cache=False)
+    system.prompt_engineer.client = openai.OpenAI(api_key="bench-key", base_url=base_url, max_retries=0)
+    # Measures the pipeline against the fake server, not the account's rate limits
+    system.prompt_engineer.rate_limiter = RateLimiter(0, 0)
+
+    rng = random.Random(seed)
+    inputs = [rng.choice(LLM_INPUTS if rng.random() < llm_fraction else FAST_PATH_INPUTS) for _ in range(requests)]
+    stages: Dict[str, List[float]] = {}
+    outcomes: List[bool] = []
+    # Failed requests by the stage they failed in
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def run_one(user_input: str) -> None:
+        reporter = _TimingReporter()
+        start = time.perf_counter()
+        try:
+            success = system.create_calendar_event(user_input, ask=lambda questions: {}, progress=reporter)
+        except Exception:
+            success = False
+        total = time.perf_counter() - start
+        with lock:
+            outcomes.append(success)
+            if not success:
+                errors[reporter.current_stage] = errors.get(reporter.current_stage, 0) + 1
+            for stage, seconds in dict(reporter.timings, total=total).items():
+                stages.setdefault(stage, []).append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run_one, inputs))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": f"multi_layer/{pipeline_mode}",
+        "concurrency": concurrency,
+        "requests": requests,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else 0.0,
+        "success_rate": sum(outcomes) / len(outcomes) if outcomes else 0.0,
+        # Layer 1 stages that fell back after failed completions; the request can still succeed
+        "fallbacks": dict(sorted(system.prompt_engineer.fallbacks.items())),
+        "errors": dict(sorted(errors.items())),
+        "stages": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "tokens": system.prompt_engineer.token_usage.report(),
+    }
+
+
+def bench_optimized_agent(operations: int, concurrency: int, computer_latency: LatencyModel,
+                          max_retries: int = 1) -> Dict[str, Any]:
+    """
+    Runs OptimizedCalendarAgent.batch_operations with one fake computer per concurrency slot
+    """
+    computers = [FakeComputer(computer_latency, project_id=f"bench-{i}") for i in range(concurrency)]
+    agent = OptimizedCalendarAgent("bench", use_cache=False, max_retries=max_retries, computers=computers)
+    prompts = [f"Create benchmark event {i}" for i in range(operations)]
+
+    start = time.perf_counter()
+    results = agent.batch_operations(prompts)
+    elapsed = time.perf_counter() - start
+    failed = sum(r["status"] != "success" for r in results)
+
+    return {
+        "scenario": "optimized_agent/batch_operations",
+        "concurrency": concurrency,
+        "requests": operations,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(operations / elapsed, 3) if elapsed else 0.0,
+        "success_rate": sum(r["status"] == "success" for r in results) / len(results),
+        "fallbacks": {},
+        "errors": {"operation": failed} if failed else {},
+        "stages": {"operation": summarize([r["duration"] for r in results])},
+    }
+
+
+def run_benchmark(requests: int = 50, concurrency_levels: Optional[List[int]] = None,
+                  llm_latency: Optional[LatencyModel] = None, computer_latency: Optional[LatencyModel] = None,
+                  pipeline_mode: str = "multi_call", llm_fraction: float = 0.5, max_retries: int = 1,
+                  seed: int = 0, quiet: bool = True) -> Dict[str, Any]:
+    """
+    Runs every scenario at every concurrency level and returns the report
+    """
+    concurrency_levels = concurrency_levels or [1, 4, 16]
+    llm_latency = llm_latency or LatencyModel(200, 80, seed=seed)
+    computer_latency = computer_latency or LatencyModel(50, 20, seed=seed + 1)
+    results = []
+
+    with FakeOpenAIServer(llm_latency) as server, _quiet(quiet):
+        for concurrency in concurrency_levels:
+            results.append(bench_multi_layer(
+                server.base_url, requests, concurrency, FakeComputer(computer_latency),
+                pipeline_mode=pipeline_mode, llm_fraction=llm_fraction, seed=seed
+            ))
+            results.append(bench_optimized_agent(requests, concurrency, computer_latency, max_retries))
+        llm_requests = server.requests
+
+    return {
+        "version": REPORT_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "requests": requests,
+            "concurrency_levels": concurrency_levels,
+            "pipeline_mode": pipeline_mode,
+            "llm_fraction": llm_fraction,
+            "llm_latency": llm_latency.to_dict(),
+            "computer_latency": computer_latency.to_dict(),
+            "max_retries": max_retries,
+            "seed": seed,
+        },
+        "llm_requests": llm_requests,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency benchmark for the calendar pipeline")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--pipeline-mode", default="multi_call", choices=["multi_call", "single_call"])
+    parser.add_argument("--llm-fraction", type=float, default=0.5, help="Share of requests that need the LLM")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-stddev-ms", type=float, default=80)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--computer-latency-ms", type=float, default=50)
+    parser.add_argument("--computer-stddev-ms", type=float, default=20)
+    parser.add_argument("--computer-failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-retries", type=int, default=1, help="OptimizedCalendarAgent retries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        requests=args.requests,
+        concurrency_levels=[int(level) for level in args.concurrency.split(",") if level],
+        llm_latency=LatencyModel(args.llm_latency_ms, args.llm_stddev_ms, args.llm_failure_rate, seed=args.seed),
+        computer_latency=LatencyModel(args.computer_latency_ms, args.computer_stddev_ms,
+                                      args.computer_failure_rate, seed=args.seed + 1),
+        pipeline_mode=args.pipeline_mode,
+        llm_fraction=args.llm_fraction,
+        max_retries=args.max_retries,
+        seed=args.seed,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"📊 Benchmark report written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
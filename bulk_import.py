@@ -0,0 +1,485 @@
+"""
+Bulk Import - ICS/CSV calendar migration
+Streams events from an .ics or .csv file, validates and normalizes them
+locally, and creates them in chunks: each chunk is one multi-event
+instruction run in a single warm Orgo session instead of one
+create_calendar_event run (and one Google Calendar navigation) per event.
+Per-event outcomes are kept in a JSON state file, so failed or unconfirmed
+events are retried and a rerun resumes with what is still missing. Events
+that may have been created (the chunk timed out) are marked unknown and
+left alone until the calendar has been checked.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from event_parser import format_duration
+from execution_ledger import is_ambiguous_failure
+from google_calendar_api import GoogleCalendarClient
+from instruction_compiler import InstructionCompiler, UnsupportedEventError, agent_reply_text, parse_event_markers
+from orgo_pool import ComputerPool, get_default_pool
+from tracing import get_tracer
+
+DEFAULT_CHUNK_SIZE = 5
+DEFAULT_MAX_ATTEMPTS = 2
+
+# CSV header aliases (matched case-insensitively, spaces and dashes read as underscores)
+CSV_COLUMNS = {
+    "title": ("title", "summary", "subject", "name", "event"),
+    "date": ("date", "start_date", "day"),
+    "time": ("time", "start_time", "start"),
+    "end": ("end", "end_time"),
+    "duration": ("duration", "length"),
+    "location": ("location", "where", "place"),
+    "description": ("description", "notes", "details"),
+    "uid": ("uid", "id"),
+}
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d")
+CSV_TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p", "%I%p")
+
+# Per-event Calendar API statuses that may succeed when sent again; other 4xx responses are final
+RETRYABLE_CLIENT_STATUSES = (408, 429)
+
+ICS_DURATION = re.compile(r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+class ImportedEvent(NamedTuple):
+    """
+    One source event: details are ready for InstructionCompiler, error is set when it cannot be imported
+    """
+    key: str
+    line: int
+    details: Dict[str, str]
+    error: Optional[str]
+
+
+class ChunkResult(NamedTuple):
+    """
+    Outcome of one chunk: {event number: "DONE" or failure reason}, the event numbers that failed for
+    good (rejected by the Calendar API) or may have been created (unknown), and the chunk-level error
+    """
+    outcomes: Dict[int, str]
+    rejected: frozenset
+    unknown: frozenset
+    error: Optional[str]
+
+
+# ---------------------------------------------------------------------------
+# Reading
+
+def _ics_lines(f: Iterable[str]) -> Iterator[tuple]:
+    """
+    Unfolds continuation lines (RFC 5545 3.1); yields (line number, logical line)
+    """
+    pending, start = None, 0
+    for number, raw in enumerate(f, 1):
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and pending is not None:
+            pending += raw[1:]
+            continue
+        if pending is not None:
+            yield start, pending
+        pending, start = raw, number
+    if pending is not None:
+        yield start, pending
+
+
+def _ics_property(line: str) -> tuple:
+    # NAME;PARAM=VALUE;PARAM="quoted:value":value
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+    name, *params = head.split(";")
+    parameters = {}
+    for param in params:
+        key, _, param_value = param.partition("=")
+        parameters[key.upper()] = param_value.strip('"')
+    return name.upper(), parameters, value
+
+
+def _ics_text(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: " " if m.group(1) in "nN" else m.group(1), value).strip()
+
+
+def _ics_datetime(value: str, parameters: Dict[str, str]):
+    """
+    DATE values become a date (all-day); UTC times are converted to local time and
+    TZID times are taken as wall-clock times in that zone
+    """
+    value = value.strip()
+    if parameters.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date()
+    moment = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        moment = moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return moment
+
+
+def _ics_duration_minutes(value: str) -> Optional[int]:
+    match = ICS_DURATION.match(value.strip())
+    if not match or match.group(1) == "-":
+        return None
+    weeks, days, hours, minutes, seconds = (int(group or 0) for group in match.groups()[1:])
+    return ((weeks * 7 + days) * 24 + hours) * 60 + minutes + seconds // 60
+
+
+def iter_ics_records(f: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one raw record per VEVENT without reading the whole file
+    """
+    record, nested = None, 0
+    for number, line in _ics_lines(f):
+        name, parameters, value = _ics_property(line)
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            record, nested = {"line": number}, 0
+        elif record is None:
+            continue
+        elif name == "BEGIN":
+            nested += 1  # VALARM and friends
+        elif name == "END" and nested:
+            nested -= 1
+        elif name == "END" and value.upper() == "VEVENT":
+            yield record
+            record = None
+        elif nested:
+            continue
+        elif name == "SUMMARY":
+            record["title"] = _ics_text(value)
+        elif name in ("LOCATION", "DESCRIPTION", "UID"):
+            record[name.lower()] = _ics_text(value)
+        elif name in ("DTSTART", "DTEND"):
+            try:
+                record["start" if name == "DTSTART" else "end"] = _ics_datetime(value, parameters)
+            except ValueError:
+                record["error"] = f"Unreadable {name}: {value}"
+        elif name == "DURATION":
+            record["duration_minutes"] = _ics_duration_minutes(value)
+            if record["duration_minutes"] is None:
+                record["error"] = f"Unreadable DURATION: {value}"
+        elif name in ("RRULE", "RDATE"):
+            record["error"] = "Recurring events are not supported"
+        elif name == "STATUS" and value.upper() == "CANCELLED":
+            record["error"] = "Event is cancelled"
+
+
+def _csv_value(row: Dict[str, str], field: str) -> str:
+    for alias in CSV_COLUMNS[field]:
+        value = row.get(alias)
+        if value:
+            return value.strip()
+    return ""
+
+
+def _parse_with(value: str, formats: Iterable[str]) -> Optional[datetime]:
+    for fmt in formats:
+        try:
+            return datetime.strptime(value.strip().upper() if "%p" in fmt else value.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def iter_csv_records(f: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one raw record per CSV row; the header names the columns (see CSV_COLUMNS)
+    """
+    reader = csv.DictReader(f)
+    for raw_row in reader:
+        row = {re.sub(r"[\s-]+", "_", (key or "").strip().lower()): value or "" for key, value in raw_row.items()}
+        record = {"line": reader.line_num}
+        for field in ("title", "location", "description", "uid"):
+            record[field] = _csv_value(row, field)
+
+        date_text, time_text = _csv_value(row, "date"), _csv_value(row, "time")
+        if not date_text and " " in time_text:
+            # A single "start" column holding "2025-08-22 08:00"
+            date_text, time_text = time_text.split(" ", 1)
+        day = _parse_with(date_text, CSV_DATE_FORMATS)
+        moment = _parse_with(time_text, CSV_TIME_FORMATS) if time_text else None
+        if day is None:
+            record["error"] = f"Unreadable date: {date_text!r}"
+        elif time_text and moment is None:
+            record["error"] = f"Unreadable time: {time_text!r}"
+        elif moment is None:
+            record["start"] = day.date()
+        else:
+            record["start"] = datetime.combine(day.date(), moment.time())
+
+        end_text = _csv_value(row, "end")
+        if end_text and isinstance(record.get("start"), datetime):
+            end = _parse_with(end_text, CSV_TIME_FORMATS)
+            if end is None:
+                record["error"] = f"Unreadable end time: {end_text!r}"
+            else:
+                record["end"] = datetime.combine(record["start"].date(), end.time())
+                if record["end"] <= record["start"]:
+                    record["end"] += timedelta(days=1)
+        record["duration"] = _csv_value(row, "duration")
+        yield record
+
+
+def normalize_record(record: Dict[str, Any], compiler: InstructionCompiler) -> ImportedEvent:
+    """
+    Turns a raw ICS/CSV record into compiler-ready event details and validates them
+    """
+    start = record.get("start")
+    details = {"title": record.get("title") or ""}
+    error = record.get("error")
+    if isinstance(start, datetime):
+        details["date"], details["time"] = start.strftime("%Y-%m-%d"), start.strftime("%H:%M")
+        end = record.get("end")
+        if record.get("duration"):
+            details["duration"] = record["duration"]
+        elif record.get("duration_minutes"):
+            details["duration"] = format_duration(record["duration_minutes"])
+        elif isinstance(end, datetime) and end > start:
+            details["duration"] = format_duration((end - start).total_seconds() // 60)
+    elif isinstance(start, date):
+        error = error or "All-day events are not supported"
+    else:
+        error = error or "Missing start date"
+    for field in ("location", "description"):
+        if record.get(field):
+            details[field] = record[field]
+
+    if error is None:
+        try:
+            compiler.build_context(details)
+        except UnsupportedEventError as e:
+            error = str(e)
+
+    identity = json.dumps({"uid": record.get("uid") or "", **details}, sort_keys=True)
+    key = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+    return ImportedEvent(key, record.get("line", 0), details, error)
+
+
+def load_events(path: str, compiler: Optional[InstructionCompiler] = None) -> Iterator[ImportedEvent]:
+    """
+    Streams normalized events from an .ics or .csv file
+    """
+    compiler = compiler or InstructionCompiler()
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".ics", ".csv"):
+        raise ValueError(f"Unsupported import file (expected .ics or .csv): {path}")
+    with open(path, newline="" if extension == ".csv" else None, encoding="utf-8-sig") as f:
+        records = iter_csv_records(f) if extension == ".csv" else iter_ics_records(f)
+        for record in records:
+            yield normalize_record(record, compiler)
+
+
+# ---------------------------------------------------------------------------
+# State
+
+class ImportState:
+    """
+    Per-event outcomes of an import, persisted as JSON after every chunk
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.events = json.load(f).get("events", {})
+
+    def is_created(self, key: str) -> bool:
+        return self.events.get(key, {}).get("status") == "created"
+
+    def is_unknown(self, key: str) -> bool:
+        return self.events.get(key, {}).get("status") == "unknown"
+
+    def update(self, event: ImportedEvent, status: str, error: Optional[str] = None, attempt: bool = False) -> None:
+        entry = self.events.setdefault(event.key, {"attempts": 0})
+        entry.update({
+            "status": status,
+            "error": error,
+            "line": event.line,
+            "title": event.details.get("title"),
+            "date": event.details.get("date"),
+            "time": event.details.get("time"),
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        if attempt:
+            entry["attempts"] += 1
+
+    def save(self) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"events": self.events}, f, indent=2)
+        os.replace(temporary, self.path)
+
+
+# ---------------------------------------------------------------------------
+# Import
+
+class BulkImporter:
+    """
+    Creates events from a file in chunks of multi-event instructions, one warm computer lease per chunk.
+    With an api_client each chunk is one Calendar API batch request instead.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 pool: Optional[ComputerPool] = None, compiler: Optional[InstructionCompiler] = None,
+                 api_client: Optional[GoogleCalendarClient] = None):
+        if chunk_size < 1 or max_attempts < 1:
+            raise ValueError("chunk_size and max_attempts must be at least 1")
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.pool = pool
+        self.compiler = compiler or InstructionCompiler()
+        self.api_client = api_client
+
+    def _execute_chunk(self, chunk: List[ImportedEvent], span) -> ChunkResult:
+        try:
+            if self.api_client is not None:
+                results = self.api_client.insert_events([event.details for event in chunk])
+                outcomes = {number: "DONE" if result["ok"] else result["error"]
+                            for number, result in enumerate(results, 1)}
+                # 4xx (including unsupported events) won't succeed on a retry; status 0 means the
+                # batch response left the item out, so it may have been created
+                rejected = frozenset(number for number, result in enumerate(results, 1) if not result["ok"]
+                                     and 400 <= result["status"] < 500
+                                     and result["status"] not in RETRYABLE_CLIENT_STATUSES)
+                unknown = frozenset(number for number, result in enumerate(results, 1)
+                                    if not result["ok"] and result["status"] == 0)
+                return ChunkResult(outcomes, rejected, unknown, None)
+            instruction = self.compiler.compile_many([event.details for event in chunk])
+            with (self.pool or get_default_pool()).lease() as computer:
+                result = computer.prompt(instruction)
+            return ChunkResult(parse_event_markers(agent_reply_text(result)), frozenset(), frozenset(), None)
+        except Exception as e:
+            span.record_exception(e)
+            # After a timeout any event of the chunk may have been created, so none is sent again
+            unknown = frozenset(range(1, len(chunk) + 1)) if is_ambiguous_failure(e) else frozenset()
+            return ChunkResult({}, frozenset(), unknown, str(e))
+
+    def _next_chunk(self, retries: deque, events: Iterator[ImportedEvent]) -> List[ImportedEvent]:
+        # Retried events go first so a partially failed chunk resumes where it stopped
+        chunk = []
+        while retries and len(chunk) < self.chunk_size:
+            chunk.append(retries.popleft())
+        for event in events:
+            chunk.append(event)
+            if len(chunk) == self.chunk_size:
+                break
+        return chunk
+
+    def _importable(self, events: Iterator[ImportedEvent], state: ImportState,
+                    summary: Dict[str, Any], retry_unknown: bool = False) -> Iterator[ImportedEvent]:
+        seen = set()
+        for event in events:
+            summary["total"] += 1
+            if event.error:
+                print(f"⚠️ Line {event.line}: skipping \"{event.details.get('title', '')}\" - {event.error}")
+                state.update(event, "invalid", event.error)
+                summary["invalid"] += 1
+            elif event.key in seen or state.is_created(event.key):
+                summary["skipped"] += 1
+            elif state.is_unknown(event.key) and not retry_unknown:
+                print(f"❓ Line {event.line}: \"{event.details['title']}\" may already exist; "
+                      f"check the calendar, then rerun with --retry-unknown")
+                summary["unknown"] += 1
+            else:
+                seen.add(event.key)
+                yield event
+
+    def _run_chunk(self, chunk: List[ImportedEvent], state: ImportState, attempts: Dict[str, int],
+                   retries: deque, summary: Dict[str, Any]) -> None:
+        backend = "google_calendar_api" if self.api_client is not None else "orgo"
+        with get_tracer().span("bulk_import.chunk", {"chunk.size": len(chunk), "chunk.backend": backend}) as span:
+            result = self._execute_chunk(chunk, span)
+            span.set_attribute("chunk.confirmed",
+                               sum(1 for outcome in result.outcomes.values() if outcome == "DONE"))
+
+        for number, event in enumerate(chunk, 1):
+            outcome = result.outcomes.get(number)
+            attempts[event.key] = attempts.get(event.key, 0) + 1
+            if outcome == "DONE":
+                state.update(event, "created", attempt=True)
+                summary["created"] += 1
+                print(f"✅ {event.details['title']} ({event.details['date']} {event.details['time']})")
+                continue
+            reason = outcome or result.error or "Not confirmed by the agent"
+            if number in result.unknown:
+                state.update(event, "unknown", reason, attempt=True)
+                summary["unknown"] += 1
+                print(f"❓ {event.details['title']} ({event.details['date']} {event.details['time']}): "
+                      f"may have been created - {reason}")
+            elif number not in result.rejected and attempts[event.key] < self.max_attempts:
+                state.update(event, "pending", reason, attempt=True)
+                retries.append(event)
+            else:
+                state.update(event, "failed", reason, attempt=True)
+                summary["failed"] += 1
+                print(f"❌ {event.details['title']} ({event.details['date']} {event.details['time']}): {reason}")
+
+    def import_file(self, path: str, state_path: Optional[str] = None, dry_run: bool = False,
+                    retry_unknown: bool = False) -> Dict[str, Any]:
+        """
+        Imports every event in path and returns counts plus per-event outcomes.
+        Events already created according to the state file (default: <path>.import-state.json) are skipped,
+        and so are events whose outcome is unknown unless retry_unknown is set.
+        With dry_run the chunk instructions are printed instead of executed.
+        """
+        state = ImportState(state_path or f"{path}.import-state.json")
+        summary = {"source": path, "total": 0, "created": 0, "failed": 0, "unknown": 0, "invalid": 0,
+                   "skipped": 0, "chunks": 0}
+        events = self._importable(load_events(path, self.compiler), state, summary, retry_unknown)
+        retries: deque = deque()
+        attempts: Dict[str, int] = {}
+
+        while True:
+            chunk = self._next_chunk(retries, events)
+            if not chunk:
+                break
+            summary["chunks"] += 1
+            print(f"📦 Chunk {summary['chunks']}: {len(chunk)} event(s)")
+            if dry_run:
+                if self.api_client is None:
+                    print(self.compiler.compile_many([event.details for event in chunk]))
+                continue
+            self._run_chunk(chunk, state, attempts, retries, summary)
+            state.save()
+
+        if not dry_run:
+            state.save()
+        summary["events"] = state.events
+        return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import calendar events from an .ics or .csv file")
+    parser.add_argument("path", help="Events file (.ics or .csv)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Events per instruction")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts per event")
+    parser.add_argument("--state", help="State file (default: <path>.import-state.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the chunk instructions without running them")
+    parser.add_argument("--retry-unknown", action="store_true",
+                        help="Send events whose earlier attempt may have created them (check the calendar first)")
+    parser.add_argument("--api", action="store_true",
+                        help="Insert with Calendar API batch requests (needs GOOGLE_CALENDAR_ACCESS_TOKEN)")
+    args = parser.parse_args()
+
+    importer = BulkImporter(chunk_size=args.chunk_size, max_attempts=args.max_attempts,
+                            api_client=GoogleCalendarClient() if args.api else None)
+    summary = importer.import_file(args.path, state_path=args.state, dry_run=args.dry_run,
+                                   retry_unknown=args.retry_unknown)
+    print(f"\n📊 {summary['total']} event(s): {summary['created']} created, {summary['failed']} failed, "
+          f"{summary['unknown']} unknown, {summary['invalid']} invalid, {summary['skipped']} already imported, {summary['chunks']} chunk(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Conversation State - bounded context for multi-turn event gathering
+Keeps what a calendar conversation has established as slot-filled event
+details, the last few turns verbatim, and a capped summary of older turns,
+so each model call sends the same amount of context no matter how long
+the session runs. Turns are kept whole (a user message with the replies
+and tool calls/results it led to), so tool call pairs are never split.
+Works with OpenAI-style message dicts and LangChain message objects.
+"""
+
+import json
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+REQUIRED_SLOTS = ("title", "date", "time", "duration")
+DEFAULT_MAX_TURNS = 4
+DEFAULT_MAX_SUMMARY_CHARS = 1200
+# Longest line the default summarizer keeps per turn
+SUMMARY_LINE_CHARS = 200
+
+# (previous summary, texts of the turns leaving the window) -> new summary
+Summarizer = Callable[[str, List[str]], str]
+
+
+def _message_role_and_text(message: Any) -> Tuple[str, str]:
+    if isinstance(message, dict):
+        role, content = message.get("role", ""), message.get("content", "")
+    else:
+        # LangChain messages: type is "human", "ai", "tool" or "system"
+        role, content = getattr(message, "type", ""), getattr(message, "content", message)
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls and not content:
+            content = "called " + ", ".join(call.get("name", "?") for call in tool_calls)
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return {"human": "user", "ai": "assistant"}.get(role, role), " ".join(content.split())
+
+
+def describe_turn(messages: Iterable[Any]) -> str:
+    """
+    One-line rendering of a turn for summaries, e.g. "user: ... | assistant: ..."
+    """
+    parts = []
+    for message in messages:
+        role, text = _message_role_and_text(message)
+        if text and role != "system":
+            parts.append(f"{role}: {text}")
+    return " | ".join(parts)
+
+
+def extractive_summarizer(summary: str, turns: List[str]) -> str:
+    """
+    Default summarizer: appends one clipped line per evicted turn (no LLM call)
+    """
+    lines = [summary] if summary else []
+    for turn in turns:
+        lines.append(turn if len(turn) <= SUMMARY_LINE_CHARS else turn[:SUMMARY_LINE_CHARS - 1] + "…")
+    return "\n".join(lines)
+
+
+class ConversationState:
+    """
+    Event slots + bounded window of recent turns + capped summary of older turns
+    """
+
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS, max_summary_chars: int = DEFAULT_MAX_SUMMARY_CHARS,
+                 summarizer: Optional[Summarizer] = None):
+        """
+        Args:
+            max_turns: Turns kept verbatim
+            max_summary_chars: Cap on the summary of older turns (the oldest part is dropped first)
+            summarizer: Folds evicted turns into the summary; defaults to extractive_summarizer.
+                An LLM summarizer can be passed for denser summaries.
+        """
+        self.max_turns = max_turns
+        self.max_summary_chars = max_summary_chars
+        self.summarizer = summarizer or extractive_summarizer
+        self.slots: Dict[str, Any] = {}
+        self.summary = ""
+        self.turns: Deque[List[Any]] = deque()
+        self.stats = {"turns": 0, "summarized": 0}
+
+    def update_slots(self, details: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merges newly established event details; empty values don't erase known ones.
+        Returns the slots that changed.
+        """
+        changed = {}
+        for name, value in (details or {}).items():
+            if value in (None, "", [], {}) or self.slots.get(name) == value:
+                continue
+            if name == "participants" and isinstance(value, list):
+                known = list(self.slots.get("participants") or [])
+                value = known + [person for person in value if person not in known]
+                if value == known:
+                    continue
+            self.slots[name] = value
+            changed[name] = value
+        return changed
+
+    def missing_slots(self) -> List[str]:
+        return [name for name in REQUIRED_SLOTS if not self.slots.get(name)]
+
+    def add_turn(self, messages: List[Any]) -> None:
+        """
+        Appends a finished turn; turns beyond max_turns are folded into the summary
+        """
+        self.turns.append(list(messages))
+        self.stats["turns"] += 1
+        evicted = []
+        while len(self.turns) > self.max_turns:
+            evicted.append(describe_turn(self.turns.popleft()))
+        if evicted:
+            self.stats["summarized"] += len(evicted)
+            summary = self.summarizer(self.summary, evicted)
+            if len(summary) > self.max_summary_chars:
+                summary = "…" + summary[-(self.max_summary_chars - 1):]
+            self.summary = summary
+
+    def recent_messages(self) -> List[Any]:
+        """
+        Messages of the turns in the window, oldest first
+        """
+        return [message for turn in self.turns for message in turn]
+
+    def state_prompt(self) -> str:
+        """
+        Compact context for a system message: known details, what is missing, and the summary
+        """
+        lines = [f"Known event details: {json.dumps(self.slots, ensure_ascii=False, default=str)}"]
+        missing = self.missing_slots()
+        lines.append(f"Still missing: {', '.join(missing)}" if missing else "All required details are known.")
+        if self.summary:
+            lines.append(f"Earlier in this conversation:\n{self.summary}")
+        return "\n".join(lines)
+
+    def context_messages(self, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        OpenAI-style messages for the next call: system prompt, state, then the recent turns
+        """
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "system", "content": self.state_prompt()})
+        return messages + self.recent_messages()
+
+    def reset(self) -> None:
+        self.slots.clear()
+        self.summary = ""
+        self.turns.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializable snapshot (window messages must be JSON-compatible, e.g. message dicts)
+        """
+        return {"slots": dict(self.slots), "summary": self.summary, "turns": [list(turn) for turn in self.turns]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **kwargs: Any) -> "ConversationState":
+        state = cls(**kwargs)
+        state.slots = dict(data.get("slots", {}))
+        state.summary = data.get("summary", "")
+        for turn in data.get("turns", [])[-state.max_turns:]:
+            state.turns.append(list(turn))
+        return state
@@ -0,0 +1,397 @@
+"""
+Local Event Parser - Deterministic fast path for Layer 1
+Extracts title, date, time, duration and location from simple requests
+without an LLM round trip. Returns the same analysis dict as
+PromptEngineeringLayer.analyze_user_input.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+REQUIRED_FIELDS = ["title", "date", "time", "duration"]
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2, "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4, "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12,
+}
+
+CLARIFICATION_QUESTIONS = {
+    "title": "What would you like to call this event?",
+    "date": "What date is the event on?",
+    "time": "What time does the event start?",
+    "duration": "How long will the event last?",
+}
+
+# Words that mean the request needs reasoning the local parser does not do
+UNSUPPORTED_PATTERN = re.compile(
+    r"\b(every|each|daily|weekly|monthly|yearly|biweekly|fortnightly|recurring|"
+    r"repeat\w*|until|except|weekend|morning|afternoon|evening|night|"
+    r"lunchtime|end of|beginning of|start of|after|before|between)\b",
+    re.IGNORECASE,
+)
+
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY_NAMES = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_NUMBER_NAMES = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_ORDINAL = r"(?:st|nd|rd|th)?"
+
+DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")),
+    ("numeric", re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")),
+    ("month_day", re.compile(
+        rf"\b(?:on\s+)?(?:the\s+)?({_MONTH_NAMES})\.?\s+(\d{{1,2}}){_ORDINAL}\b(?:,?\s+(\d{{4}}))?",
+        re.IGNORECASE,
+    )),
+    ("day_month", re.compile(
+        rf"\b(?:on\s+)?(?:the\s+)?(\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?({_MONTH_NAMES})\b\.?(?:,?\s+(\d{{4}}))?",
+        re.IGNORECASE,
+    )),
+    ("relative_day", re.compile(
+        r"\b(?:on\s+)?(the day after tomorrow|day after tomorrow|today|tonight|tomorrow)\b",
+        re.IGNORECASE,
+    )),
+    ("in_days", re.compile(rf"\bin\s+(\d+|{_NUMBER_NAMES})\s+(day|week)s?\b", re.IGNORECASE)),
+    ("next_week", re.compile(r"\bnext\s+week\b", re.IGNORECASE)),
+    ("weekday", re.compile(
+        rf"\b(?:on\s+)?(?:(this|next|coming)\s+)?({_WEEKDAY_NAMES})\b\.?",
+        re.IGNORECASE,
+    )),
+]
+
+TIME_RANGE_PATTERN = re.compile(
+    r"\b(?:from\s+)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)?\s*(?:-|to|until|till)\s*"
+    r"(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?=\W|$)",
+    re.IGNORECASE,
+)
+TIME_12H_PATTERN = re.compile(
+    r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?=\W|$)",
+    re.IGNORECASE,
+)
+TIME_24H_PATTERN = re.compile(r"\b(?:at\s+)?([01]?\d|2[0-3]):([0-5]\d)\b(?!\s*(?:hours?|hrs?|h)\b)", re.IGNORECASE)
+TIME_WORD_PATTERN = re.compile(r"\b(?:at\s+)?(noon|midday|midnight)\b", re.IGNORECASE)
+TIME_BARE_PATTERN = re.compile(r"\bat\s+(\d{1,2})(?::(\d{2}))?\b(?!\s*(?:hours?|hrs?|mins?|minutes?|h|m)\b)", re.IGNORECASE)
+
+DURATION_PATTERN = re.compile(
+    rf"\b(?:for\s+)?(?:(?P<half>half an hour|half hour)|"
+    rf"(?:(?P<hours>\d+(?:\.\d+)?)\s*(?:hours?|hrs?|h)|(?P<hours_word>{_NUMBER_NAMES})\s+(?:hours?|hrs?))"
+    rf"(?:\s*(?:and\s+)?(?P<extra>\d+)\s*(?:minutes?|mins?|m))?|"
+    rf"(?P<minutes>\d+)\s*(?:minutes?|mins?|m)|(?P<minutes_word>{_NUMBER_NAMES})\s+(?:minutes?|mins?))\b"
+    rf"(?:\s+long)?",
+    re.IGNORECASE,
+)
+
+# A capitalized place, optionally numbered ("Cafe Nero", "Room 5", "Building 4B")
+LOCATION_PATTERN = re.compile(
+    r"\b(?:at|in)\s+(?:the\s+)?([A-Z][\w'&.-]*(?:\s+(?:[A-Z][\w'&.-]*|\d[\w-]*|of|de))*)"
+)
+# "in 2 hours" reads as a start time as often as a duration
+RELATIVE_START_PREFIX = re.compile(r"\bin\s+$", re.IGNORECASE)
+
+LEADING_FILLER = re.compile(
+    r"^(?:please\s+)?(?:(?:can|could|would)\s+you\s+)?(?:(?:create|schedule|book|add|make|plan|put|set\s+up|"
+    r"organi[sz]e|arrange)\s+)?(?:me\s+)?(?:(?:a|an|the|my)\s+)?(?:new\s+)?",
+    re.IGNORECASE,
+)
+# Verbs that are also common title nouns ("Book club", "Plan review"): stripping them is a guess
+# unless an article or "me" follows
+AMBIGUOUS_LEADING_VERB = re.compile(
+    r"^(?:please\s+)?(?:(?:can|could|would)\s+you\s+)?(?:book|add|make|plan)\s+(?!(?:me|a|an|the|my|new)\b)",
+    re.IGNORECASE,
+)
+TRAILING_FILLER = re.compile(r"(?:\s+(?:on|at|for|from|by|this|next|the|in|to|with))+\s*$", re.IGNORECASE)
+
+
+def _to_number(token: str) -> float:
+    token = token.lower()
+    if token in NUMBER_WORDS:
+        return NUMBER_WORDS[token]
+    return float(token)
+
+
+def _to_24h(hour: int, minute: int, meridiem: Optional[str]) -> Optional[str]:
+    if meridiem:
+        meridiem = meridiem.lower().replace(".", "")
+        if not 1 <= hour <= 12:
+            return None
+        if meridiem == "am":
+            hour = 0 if hour == 12 else hour
+        else:
+            hour = 12 if hour == 12 else hour + 12
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def format_duration(total_minutes: int) -> str:
+    """
+    Formats minutes the way the rest of the system writes durations ("2 hours", "1 hour 30 minutes")
+    """
+    hours, minutes = divmod(int(total_minutes), 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if minutes or not hours:
+        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+    return " ".join(parts)
+
+
+def parse_duration_minutes(text: str) -> Optional[int]:
+    """
+    Converts a duration string such as "2 hours" or "1 hour 30 minutes" to minutes
+    """
+    if not text:
+        return None
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    return _duration_from_match(match)
+
+
+def _duration_from_match(match: re.Match) -> Optional[int]:
+    groups = match.groupdict()
+    if groups["half"]:
+        return 30
+    hours = groups["hours"] or groups["hours_word"]
+    if hours:
+        total = round(_to_number(hours) * 60)
+        if groups["extra"]:
+            total += int(groups["extra"])
+        return total
+    minutes = groups["minutes"] or groups["minutes_word"]
+    if minutes:
+        return int(_to_number(minutes))
+    return None
+
+
+class LocalEventParser:
+    """
+    Rule-based extraction engine for well-formed calendar requests
+    """
+
+    def __init__(self, default_year_rollover: bool = True):
+        self.default_year_rollover = default_year_rollover
+
+    def parse(self, user_input: str, today: Optional[date] = None) -> Tuple[Dict, float]:
+        """
+        Parses user input against today's date.
+
+        Returns a tuple of (analysis, certainty). The analysis has the same
+        keys as the LLM analysis; certainty says how much the caller should
+        trust it (low certainty means fall back to the LLM).
+        """
+        today = today or date.today()
+        text = " ".join(user_input.strip().split())
+        remaining = text
+        details: Dict[str, str] = {}
+        certainty = 1.0
+
+        event_date, invalid_date, remaining = self._extract_date(remaining, today)
+        if event_date:
+            details["date"] = event_date.strftime("%Y-%m-%d")
+        if invalid_date:
+            # e.g. "2/30": a date was meant but can't be read, and it is still in the title
+            certainty = min(certainty, 0.3)
+
+        start_time, range_minutes, ambiguous_time, remaining = self._extract_time(remaining)
+        if start_time:
+            details["time"] = start_time
+        if ambiguous_time:
+            certainty = min(certainty, 0.6)
+
+        if UNSUPPORTED_PATTERN.search(remaining):
+            certainty = min(certainty, 0.3)
+
+        duration_match = DURATION_PATTERN.search(remaining)
+        if range_minutes:
+            details["duration"] = format_duration(range_minutes)
+        elif duration_match:
+            minutes = _duration_from_match(duration_match)
+            if minutes:
+                details["duration"] = format_duration(minutes)
+                if (not duration_match.group(0).lower().startswith("for")
+                        and RELATIVE_START_PREFIX.search(remaining[:duration_match.start()])):
+                    certainty = min(certainty, 0.5)
+                remaining = self._cut(remaining, duration_match)
+
+        location_match = LOCATION_PATTERN.search(remaining)
+        if location_match:
+            details["location"] = location_match.group(1).strip()
+            remaining = self._cut(remaining, location_match)
+
+        if AMBIGUOUS_LEADING_VERB.search(remaining.strip(" ,.;:!?-")):
+            certainty = min(certainty, 0.6)
+        title = self._clean_title(remaining)
+        if title:
+            details["title"] = title
+            if not re.search(rf"(?<!\w){re.escape(title)}(?!\w)", text, re.IGNORECASE):
+                # Words from both sides of an extracted part were joined ("meeting ... 5")
+                certainty = min(certainty, 0.6)
+        else:
+            certainty = min(certainty, 0.4)
+
+        if "date" not in details and "time" not in details:
+            certainty = min(certainty, 0.3)
+
+        missing = [field for field in REQUIRED_FIELDS if field not in details]
+        analysis = {
+            "extracted_details": details,
+            "missing_details": missing,
+            "confidence": round((len(REQUIRED_FIELDS) - len(missing)) / len(REQUIRED_FIELDS), 2),
+            "clarification_questions": [self._question_for(field, details) for field in missing],
+        }
+        return analysis, certainty
+
+    def _extract_date(self, text: str, today: date) -> Tuple[Optional[date], bool, str]:
+        """
+        Returns (date, invalid flag, remaining text); the flag is set when a date-like
+        expression such as "2/30" matched but is not a real date
+        """
+        invalid = False
+        for kind, pattern in DATE_PATTERNS:
+            match = pattern.search(text)
+            if not match:
+                continue
+            event_date = self._resolve_date(kind, match, today)
+            if event_date:
+                return event_date, invalid, self._cut(text, match)
+            invalid = True
+        return None, invalid, text
+
+    def _resolve_date(self, kind: str, match: re.Match, today: date) -> Optional[date]:
+        try:
+            if kind == "iso":
+                return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            if kind == "numeric":
+                month, day, year = match.group(1), match.group(2), match.group(3)
+                if year and len(year) == 2:
+                    year = "20" + year
+                return self._with_year(int(month), int(day), year, today)
+            if kind == "month_day":
+                return self._with_year(MONTHS[match.group(1).lower()], int(match.group(2)), match.group(3), today)
+            if kind == "day_month":
+                return self._with_year(MONTHS[match.group(2).lower()], int(match.group(1)), match.group(3), today)
+        except ValueError:
+            return None
+
+        if kind == "relative_day":
+            word = match.group(1).lower()
+            if word in ("today", "tonight"):
+                return today
+            if word == "tomorrow":
+                return today + timedelta(days=1)
+            return today + timedelta(days=2)
+        if kind == "in_days":
+            amount = int(_to_number(match.group(1)))
+            unit_days = 7 if match.group(2).lower() == "week" else 1
+            return today + timedelta(days=amount * unit_days)
+        if kind == "next_week":
+            return today + timedelta(days=7)
+        if kind == "weekday":
+            modifier = (match.group(1) or "").lower()
+            target = WEEKDAYS[match.group(2).lower()]
+            days_ahead = (target - today.weekday()) % 7
+            if days_ahead == 0 and modifier in ("next", "coming"):
+                days_ahead = 7
+            return today + timedelta(days=days_ahead)
+        return None
+
+    def _with_year(self, month: int, day: int, year: Optional[str], today: date) -> date:
+        if year:
+            return date(int(year), month, day)
+        candidate = date(today.year, month, day)
+        if self.default_year_rollover and candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+
+    def _extract_time(self, text: str) -> Tuple[Optional[str], Optional[int], bool, str]:
+        """
+        Returns (start time, range length in minutes, ambiguous flag, remaining text)
+        """
+        match = TIME_RANGE_PATTERN.search(text)
+        if match:
+            start_h, start_m, start_mer, end_h, end_m, end_mer = match.groups()
+            start = _to_24h(int(start_h), int(start_m or 0), start_mer or end_mer)
+            end = _to_24h(int(end_h), int(end_m or 0), end_mer)
+            if start and end:
+                start_dt = datetime.strptime(start, "%H:%M")
+                end_dt = datetime.strptime(end, "%H:%M")
+                if end_dt <= start_dt:
+                    end_dt += timedelta(days=1)
+                minutes = int((end_dt - start_dt).total_seconds() // 60)
+                return start, minutes, False, self._cut(text, match)
+
+        match = TIME_12H_PATTERN.search(text)
+        if match:
+            start = _to_24h(int(match.group(1)), int(match.group(2) or 0), match.group(3))
+            if start:
+                return start, None, False, self._cut(text, match)
+
+        match = TIME_24H_PATTERN.search(text)
+        if match:
+            start = _to_24h(int(match.group(1)), int(match.group(2)), None)
+            if start:
+                # "2:30" or "10:15" without am/pm could be either half of the day; "02:30" and "14:30" can't
+                hour = match.group(1)
+                ambiguous = not hour.startswith("0") and 1 <= int(hour) <= 12
+                return start, None, ambiguous, self._cut(text, match)
+
+        match = TIME_WORD_PATTERN.search(text)
+        if match:
+            start = "00:00" if match.group(1).lower() == "midnight" else "12:00"
+            return start, None, False, self._cut(text, match)
+
+        match = TIME_BARE_PATTERN.search(text)
+        if match:
+            start = _to_24h(int(match.group(1)), int(match.group(2) or 0), None)
+            if start:
+                return start, None, True, self._cut(text, match)
+
+        return None, None, False, text
+
+    @staticmethod
+    def _cut(text: str, match: re.Match) -> str:
+        return " ".join((text[:match.start()] + " " + text[match.end():]).split())
+
+    @staticmethod
+    def _clean_title(text: str) -> str:
+        title = text.strip(" ,.;:!?-")
+        title = LEADING_FILLER.sub("", title)
+        previous = None
+        while previous != title:
+            previous = title
+            title = TRAILING_FILLER.sub("", title).strip(" ,.;:!?-")
+        if not title:
+            return ""
+        return title[0].upper() + title[1:]
+
+    @staticmethod
+    def _question_for(field: str, details: Dict[str, str]) -> str:
+        title = details.get("title")
+        if field == "duration" and title:
+            return f"How long will the {title} last?"
+        if field == "time" and title:
+            return f"What time does the {title} start?"
+        if field == "date" and title:
+            return f"What date is the {title} on?"
+        return CLARIFICATION_QUESTIONS[field]
+
+
+def parse_event_request(user_input: str, today: Optional[date] = None) -> Tuple[Dict, float]:
+    """
+    Convenience wrapper around LocalEventParser.parse
+    """
+    return LocalEventParser().parse(user_input, today=today)
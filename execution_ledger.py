@@ -0,0 +1,287 @@
+"""
+Execution Ledger - idempotency for Layer 2 executions
+SQLite (WAL) record of calendar event executions keyed by a canonical hash
+of the normalized event details. An execution is claimed atomically before
+it runs, so a retry after a timeout or a resubmitted request returns the
+earlier result instead of creating the event again. Safe to share between
+threads and processes (GUI, CLI runners, batch jobs).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from event_parser import parse_duration_minutes
+
+DEFAULT_LEDGER_PATH = os.path.join(".cache", "executions.sqlite3")
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+# An in-flight claim older than this is treated as abandoned (crashed process)
+DEFAULT_IN_FLIGHT_TIMEOUT = 15 * 60
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+FAILED = "failed"
+# The execution raised after it may already have saved the event (e.g. a timeout)
+UNKNOWN = "unknown"
+
+
+class DuplicateExecutionError(RuntimeError):
+    """
+    Raised by run_once when the same event is already running or its earlier outcome is unknown
+    """
+
+    def __init__(self, key: str, status: str, message: str):
+        super().__init__(message)
+        self.key = key
+        self.status = status
+
+
+class Claim(NamedTuple):
+    """
+    Result of ExecutionLedger.claim: status "acquired" means the caller should run the execution
+    """
+    key: str
+    status: str
+    token: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+def _normalize_text(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().casefold()
+
+
+def canonical_event_key(event_details: Optional[Dict] = None, instruction: Optional[str] = None) -> str:
+    """
+    Stable key for an event: title/location/description are case- and whitespace-insensitive and the
+    duration is compared in minutes. Falls back to the normalized instruction text without details.
+    """
+    if event_details:
+        duration = parse_duration_minutes(str(event_details.get("duration") or "")) or 60
+        canonical = {
+            "title": _normalize_text(event_details.get("title")),
+            "date": str(event_details.get("date") or "").strip(),
+            "time": str(event_details.get("time") or "").strip(),
+            "duration_minutes": duration,
+            "location": _normalize_text(event_details.get("location")),
+            "description": _normalize_text(event_details.get("description")),
+        }
+    else:
+        canonical = {"instruction": _normalize_text(instruction)}
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_ambiguous_failure(error: BaseException) -> bool:
+    """
+    True for errors after which the event may or may not have been created (timeouts, dropped connections)
+    """
+    if isinstance(error, (TimeoutError, ConnectionResetError)):
+        return True
+    text = str(error).lower()
+    return "timed out" in text or "timeout" in text
+
+
+class ExecutionLedger:
+    """
+    On-disk ledger of in-flight and finished executions
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 in_flight_timeout: float = DEFAULT_IN_FLIGHT_TIMEOUT):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            ttl_seconds: How long a finished execution is remembered
+            in_flight_timeout: Age after which an unfinished claim can be taken over
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.in_flight_timeout = in_flight_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"claims": 0, "duplicates": 0, "in_flight_conflicts": 0, "takeovers": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS executions (
+                    key TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    token TEXT,
+                    details TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_executions_updated_at ON executions(updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        One connection per thread and process (SQLite connections must not be used across fork());
+        WAL lets readers and a writer work concurrently
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def claim(self, key: str, details: Optional[Dict] = None, retry_unknown: bool = False) -> Claim:
+        """
+        Atomically claims an execution. Returns status "acquired" (run it, then call complete or fail),
+        "completed" (with the earlier result), "in_flight" (another caller is running it) or
+        "unknown" (an earlier run may have created the event; pass retry_unknown to run anyway).
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM executions WHERE status != ? AND updated_at < ?",
+                         (IN_FLIGHT, now - self.ttl_seconds))
+            row = conn.execute("SELECT status, result, error, updated_at FROM executions WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None:
+                status, result, error, updated_at = row
+                if status == COMPLETED:
+                    conn.execute("COMMIT")
+                    self._count("duplicates")
+                    return Claim(key, COMPLETED, result=json.loads(result) if result else None)
+                if status == IN_FLIGHT and now - updated_at < self.in_flight_timeout:
+                    conn.execute("COMMIT")
+                    self._count("in_flight_conflicts")
+                    return Claim(key, IN_FLIGHT)
+                if status == UNKNOWN and not retry_unknown:
+                    conn.execute("COMMIT")
+                    return Claim(key, UNKNOWN, error=error)
+                if status == IN_FLIGHT:
+                    self._count("takeovers")
+
+            token = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO executions (key, status, token, details, attempts, started_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = excluded.status, token = excluded.token, "
+                "error = NULL, attempts = attempts + 1, updated_at = excluded.updated_at",
+                (key, IN_FLIGHT, token, json.dumps(details) if details else None, now, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("claims")
+        return Claim(key, "acquired", token=token)
+
+    def _finish(self, claim: Claim, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        serialized = None
+        if result is not None:
+            try:
+                serialized = json.dumps(result)
+            except TypeError:
+                serialized = json.dumps(str(result))
+        updated = self._connection().execute(
+            "UPDATE executions SET status = ?, result = ?, error = ?, updated_at = ? WHERE key = ? AND token = ?",
+            (status, serialized, error, time.time(), claim.key, claim.token),
+        ).rowcount
+        # 0 rows: the claim expired and another caller took it over
+        return updated == 1
+
+    def complete(self, claim: Claim, result: Any = None) -> bool:
+        return self._finish(claim, COMPLETED, result)
+
+    def fail(self, claim: Claim, error: BaseException) -> bool:
+        """
+        Records a failure; ambiguous ones (see is_ambiguous_failure) block automatic re-runs
+        """
+        return self._finish(claim, UNKNOWN if is_ambiguous_failure(error) else FAILED, error=str(error))
+
+    def wait(self, key: str, timeout: float, interval: float = 0.5) -> Optional[str]:
+        """
+        Waits while the execution is in flight; returns its status (None if unknown to the ledger)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self._connection().execute("SELECT status FROM executions WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] != IN_FLIGHT or time.monotonic() >= deadline:
+                return row[0] if row else None
+            time.sleep(interval)
+
+    def run_once(self, key: str, operation: Callable[[], Any], details: Optional[Dict] = None,
+                 wait_timeout: float = 0.0, retry_unknown: bool = False) -> Any:
+        """
+        Runs operation unless the same execution already completed (then returns its result).
+        Waits up to wait_timeout for a concurrent run of the same key, then raises DuplicateExecutionError.
+        """
+        claim = self.claim(key, details, retry_unknown)
+        if claim.status == IN_FLIGHT and wait_timeout > 0:
+            self.wait(key, wait_timeout)
+            claim = self.claim(key, details, retry_unknown)
+        if claim.status == COMPLETED:
+            print("♻️ This event was already created; returning the earlier result")
+            return claim.result
+        if claim.status == IN_FLIGHT:
+            raise DuplicateExecutionError(key, IN_FLIGHT, "The same event is already being created")
+        if claim.status == UNKNOWN:
+            raise DuplicateExecutionError(
+                key, UNKNOWN, f"An earlier attempt may have created this event ({claim.error}); check the calendar")
+
+        try:
+            result = operation()
+        except Exception as e:
+            self.fail(claim, e)
+            raise
+        except BaseException as e:
+            # Cancelled or interrupted part-way: the event may have been saved, so it must not be re-run
+            self._finish(claim, UNKNOWN, error=f"Interrupted ({type(e).__name__})")
+            raise
+        self.complete(claim, result)
+        return result
+
+    def status(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT status, result, error, attempts, started_at, updated_at FROM executions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "result": json.loads(row[1]) if row[1] else None, "error": row[2],
+                "attempts": row[3], "started_at": row[4], "updated_at": row[5]}
+
+    def forget(self, key: str) -> None:
+        """
+        Removes an entry, e.g. after checking that an "unknown" execution did not create the event
+        """
+        self._connection().execute("DELETE FROM executions WHERE key = ?", (key,))
+
+
+_default_ledger: Optional[ExecutionLedger] = None
+_default_ledger_lock = threading.Lock()
+
+
+def get_default_ledger() -> ExecutionLedger:
+    """
+    Returns the process-wide ledger at EXECUTION_LEDGER_PATH
+    """
+    global _default_ledger
+    with _default_ledger_lock:
+        if _default_ledger is None:
+            _default_ledger = ExecutionLedger(path=os.getenv("EXECUTION_LEDGER_PATH", DEFAULT_LEDGER_PATH))
+        return _default_ledger
@@ -0,0 +1,266 @@
+"""
+Executor Router - latency- and success-aware Layer 2 backend choice
+Keeps rolling latency and success statistics per executor, sends each
+instruction to the healthy backend with the lowest expected cost
+(latency / success rate), fails over to the next backend when one raises,
+and puts a backend into a cooldown after repeated failures. With an
+execution ledger, an event that was already created is not sent again.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from agent_s_interface import CalendarExecutor, get_executors
+from execution_ledger import ExecutionLedger, canonical_event_key, get_default_ledger, is_ambiguous_failure
+from metrics import get_default_registry
+from tracing import get_tracer
+
+DEFAULT_WINDOW = 20
+DEFAULT_LATENCY_ALPHA = 0.3
+DEFAULT_PRIOR_LATENCY = 30.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 60.0
+DEFAULT_STALE_AFTER = 600.0
+# Floor for the success rate so a failing backend's cost stays finite
+MIN_SUCCESS_RATE = 0.05
+
+
+class NoExecutorAvailableError(RuntimeError):
+    """
+    Raised when no registered executor is available for the event
+    """
+
+
+class ExecutorStats:
+    """
+    Rolling statistics for one executor; callers hold the router lock
+    """
+
+    def __init__(self, window: int):
+        self.outcomes = deque(maxlen=window)
+        self.latency: Optional[float] = None
+        self.last_sample = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.routed = 0
+        self.failovers = 0
+
+    @property
+    def success_rate(self) -> float:
+        # Optimistic smoothing: an untried executor counts as reliable until it fails
+        return (sum(self.outcomes) + 1) / (len(self.outcomes) + 1)
+
+    def record(self, success: bool, latency: float, now: float, alpha: float) -> None:
+        self.calls += 1
+        self.outcomes.append(1 if success else 0)
+        if success:
+            self.successes += 1
+            self.consecutive_failures = 0
+            # Only successful runs say how long the backend takes to create an event
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+            self.last_sample = now
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+
+class ExecutorRouter(CalendarExecutor):
+    """
+    CalendarExecutor that routes to the best healthy registered executor and fails over on errors
+    """
+
+    name = "router"
+
+    def __init__(self, executors: Optional[List[CalendarExecutor]] = None, window: int = DEFAULT_WINDOW,
+                 latency_alpha: float = DEFAULT_LATENCY_ALPHA, prior_latency: float = DEFAULT_PRIOR_LATENCY,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, cooldown: float = DEFAULT_COOLDOWN,
+                 stale_after: float = DEFAULT_STALE_AFTER, clock: Callable[[], float] = time.monotonic,
+                 ledger: Optional[ExecutionLedger] = None):
+        """
+        Args:
+            executors: Backends to route between (default: the agent_s_interface registry, read on every call)
+            window: Outcomes per executor used for the success rate
+            latency_alpha: Weight of the newest sample in the latency moving average
+            prior_latency: Seconds assumed for an executor without (recent) latency samples
+            failure_threshold: Consecutive failures that put an executor into cooldown
+            cooldown: Seconds an executor is skipped after reaching the failure threshold
+            stale_after: Seconds after which a latency estimate reverts to the prior, so a
+                backend that was slow once gets tried again
+            ledger: Execution ledger; repeats of a created event return the earlier result, and a
+                timeout does not fail over (the first backend may have saved the event)
+        """
+        self._executors = executors
+        self.window = window
+        self.latency_alpha = latency_alpha
+        self.prior_latency = prior_latency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stale_after = stale_after
+        self.clock = clock
+        self.ledger = ledger
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ExecutorStats] = {}
+        self.decisions = {"requests": 0, "failovers": 0, "exhausted": 0}
+
+    @property
+    def executors(self) -> List[CalendarExecutor]:
+        return self._executors if self._executors is not None else get_executors()
+
+    def _stats_for(self, executor: CalendarExecutor) -> ExecutorStats:
+        if executor.name not in self._stats:
+            self._stats[executor.name] = ExecutorStats(self.window)
+        return self._stats[executor.name]
+
+    def _expected_latency(self, stats: ExecutorStats, now: float) -> float:
+        if stats.latency is None or now - stats.last_sample > self.stale_after:
+            return self.prior_latency
+        return stats.latency
+
+    def expected_cost(self, executor: CalendarExecutor) -> float:
+        """
+        Expected seconds per successful event: latency estimate / success rate
+        """
+        with self._lock:
+            stats = self._stats_for(executor)
+            return self._expected_latency(stats, self.clock()) / max(stats.success_rate, MIN_SUCCESS_RATE)
+
+    def available(self) -> bool:
+        return any(executor.available() for executor in self.executors)
+
+    def supports(self, event_details: Optional[Dict]) -> bool:
+        return any(executor.available() and executor.supports(event_details) for executor in self.executors)
+
+    def rank(self, event_details: Optional[Dict] = None) -> List[CalendarExecutor]:
+        """
+        Eligible executors, best first: healthy ones by expected cost (registry order breaks ties),
+        then the ones in cooldown by when their cooldown ends
+        """
+        candidates = [executor for executor in self.executors
+                      if executor.available() and executor.supports(event_details)]
+        now = self.clock()
+        with self._lock:
+            def key(item):
+                order, executor = item
+                stats = self._stats_for(executor)
+                if stats.cooldown_until > now:
+                    return (1, stats.cooldown_until, order)
+                cost = self._expected_latency(stats, now) / max(stats.success_rate, MIN_SUCCESS_RATE)
+                return (0, cost, order)
+            return [executor for _, executor in sorted(enumerate(candidates), key=key)]
+
+    def _record(self, executor: CalendarExecutor, success: bool, latency: float) -> None:
+        now = self.clock()
+        with self._lock:
+            stats = self._stats_for(executor)
+            stats.record(success, latency, now, self.latency_alpha)
+            if not success and stats.consecutive_failures >= self.failure_threshold:
+                stats.cooldown_until = now + self.cooldown
+        get_default_registry().observe("executor_seconds", latency, "Duration of Layer 2 executions by backend and outcome",
+                                       backend=executor.name, outcome="success" if success else "failure")
+
+    def execute(self, instruction: str, event_details: Optional[Dict] = None, key: Optional[str] = None,
+                ledger: Optional[ExecutionLedger] = None) -> Any:
+        """
+        Runs the instruction on the best executor, failing over to the next one on an exception.
+        Raises NoExecutorAvailableError if none is eligible, else the last executor's error
+        (or DuplicateExecutionError when the ledger has the same event in flight).
+        key and ledger replace the ledger record (default: canonical_event_key in the router's
+        ledger), so a caller that tracks executions itself, like the job queue, keeps one record.
+        """
+        ledger = ledger if ledger is not None else self.ledger
+        if ledger is None:
+            return self._route(instruction, event_details, at_most_once=False)
+        key = key or canonical_event_key(event_details, instruction)
+        return ledger.run_once(key, lambda: self._route(instruction, event_details, at_most_once=True),
+                               details=event_details)
+
+    def _route(self, instruction: str, event_details: Optional[Dict], at_most_once: bool) -> Any:
+        ranked = self.rank(event_details)
+        with self._lock:
+            self.decisions["requests"] += 1
+            if not ranked:
+                self.decisions["exhausted"] += 1
+        if not ranked:
+            raise NoExecutorAvailableError("No available executor supports this event")
+
+        with get_tracer().span("executor.route", {"executor.candidates": ",".join(e.name for e in ranked)}) as span:
+            last_error: Optional[Exception] = None
+            for attempt, executor in enumerate(ranked):
+                with self._lock:
+                    stats = self._stats_for(executor)
+                    if attempt == 0:
+                        stats.routed += 1
+                    else:
+                        stats.failovers += 1
+                        self.decisions["failovers"] += 1
+                print(f"{'🔀 Failing over to' if attempt else '🧭 Routing to'} {executor.name} executor...")
+                start = self.clock()
+                try:
+                    result = executor.execute(instruction, event_details)
+                except Exception as e:
+                    self._record(executor, False, self.clock() - start)
+                    print(f"⚠️ {executor.name} failed: {e}")
+                    last_error = e
+                    if at_most_once and is_ambiguous_failure(e):
+                        # Another backend would create the event a second time if this one saved it
+                        break
+                    continue
+                self._record(executor, True, self.clock() - start)
+                span.set_attributes({"executor.name": executor.name, "executor.failovers": attempt})
+                return result
+
+            with self._lock:
+                self.decisions["exhausted"] += 1
+            span.set_attribute("executor.failovers", attempt)
+            raise last_error
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Routing decisions and per-executor statistics
+        """
+        now = self.clock()
+        with self._lock:
+            executors = {}
+            for name, stats in self._stats.items():
+                executors[name] = {
+                    "calls": stats.calls,
+                    "successes": stats.successes,
+                    "failures": stats.failures,
+                    "routed": stats.routed,
+                    "failovers": stats.failovers,
+                    "success_rate": stats.success_rate,
+                    "latency_ms": None if stats.latency is None else stats.latency * 1000,
+                    "expected_latency_ms": self._expected_latency(stats, now) * 1000,
+                    "healthy": stats.cooldown_until <= now,
+                }
+            return {"decisions": dict(self.decisions), "executors": executors}
+
+    def print_metrics(self) -> None:
+        metrics = self.metrics()
+        decisions = metrics["decisions"]
+        print(f"\n🧭 Executor routing: {decisions['requests']} requests, {decisions['failovers']} failovers, "
+              f"{decisions['exhausted']} with no working executor")
+        for name, stats in metrics["executors"].items():
+            latency = "n/a" if stats["latency_ms"] is None else f"{stats['latency_ms']:.0f} ms"
+            print(f"   {'✅' if stats['healthy'] else '⏸️'} {name:20s} routed {stats['routed']:4d}  "
+                  f"success {stats['success_rate']:.0%}  latency {latency}")
+
+
+_default_router: Optional[ExecutorRouter] = None
+_default_router_lock = threading.Lock()
+
+
+def get_default_router() -> ExecutorRouter:
+    """
+    Process-wide router over the agent_s_interface executor registry, deduplicated by the default ledger
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ExecutorRouter(ledger=get_default_ledger())
+        return _default_router
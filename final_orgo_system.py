@@ -5,6 +5,7 @@ This script runs your multi-layer system on https://www.orgo.ai/projects/compute
 """
 
 import os
+from orgo_pool import get_default_pool
 
 # Load API keys from environment variables
 # Make sure to set these in your .env file or environment
@@ -18,16 +19,15 @@ def test_orgo_connection():
     print("🧪 Testing Orgo connection with all API keys...")
     
     try:
-        from orgo import Computer
-        
-        computer = Computer(project_id="computer-ppgg5d6j")
-        
-        # Test with simple prompt
-        result = computer.prompt("Take a screenshot and tell me what you can see on the screen in one sentence.")
+        # The pool keeps the connected computer for the Layer 2 runs that follow
+        pool = get_default_pool()
+        with pool.lease() as computer:
+            # Test with simple prompt
+            result = computer.prompt("Take a screenshot and tell me what you can see on the screen in one sentence.")
         
         print("✅ Orgo connection successful!")
         print(f"📊 Test result: {result}")
-        return computer
+        return pool
         
     except Exception as e:
         print(f"❌ Orgo connection failed: {e}")
@@ -40,8 +40,8 @@ def run_complete_calendar_demo():
     print("=" * 60)
     
     # Test Orgo connection
-    computer = test_orgo_connection()
-    if not computer:
+    pool = test_orgo_connection()
+    if not pool:
         print("❌ Cannot proceed without Orgo connection")
         return False
     
@@ -105,7 +105,8 @@ def run_complete_calendar_demo():
     print(f"⏳ This may take 30-60 seconds...")
     
     try:
-        result = computer.prompt(agent_instruction)
+        with pool.lease() as computer:
+            result = computer.prompt(agent_instruction)
         
         print(f"\n✅ ORGO EXECUTION COMPLETED!")
         print(f"📊 Result: {result}")
@@ -130,8 +131,8 @@ def run_interactive_session():
     print("=" * 50)
     
     # Setup
-    computer = test_orgo_connection()
-    if not computer:
+    pool = test_orgo_connection()
+    if not pool:
         return
     
     from multi_layer_prompt_system import MultiLayerCalendarSystem
@@ -169,7 +170,8 @@ def run_interactive_session():
                 instruction = calendar_system.prompt_engineer.generate_agent_s_instruction(event_details)
                 
                 print("🌐 Layer 2: Executing on Orgo...")
-                result = computer.prompt(instruction)
+                with pool.lease() as computer:
+                    result = computer.prompt(instruction)
                 
                 print(f"✅ Done! Result: {result[:100]}...")
                 print()
@@ -0,0 +1,163 @@
+"""
+Frame Diff - change detection between consecutive screenshots
+Decides whether the screen actually changed so the vision model only sees
+new frames, and waits for the UI to settle after an action instead of
+sleeping for a fixed time. Two methods:
+  - "blocks": grayscale block diff; the share of blocks whose mean absolute
+    difference exceeds pixel_tolerance (NumPy when installed, else Pillow's C ops)
+  - "dhash": 64-bit difference hash; the share of differing hash bits
+"""
+
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_THRESHOLD = 0.0
+DEFAULT_BLOCK_SIZE = 16
+DEFAULT_PIXEL_TOLERANCE = 8
+# Frames are compared at this width: 4x fewer pixels at 2560, text fields still cover whole blocks
+COMPARE_WIDTH = 640
+METHODS = ("blocks", "dhash")
+
+
+def _grayscale(image: Image.Image, width: int = COMPARE_WIDTH) -> Image.Image:
+    gray = image.convert("L")
+    if gray.width > width:
+        gray = gray.resize((width, max(1, round(gray.height * width / gray.width))), Image.BILINEAR)
+    return gray
+
+
+def block_change_ratio(first: Image.Image, second: Image.Image, block_size: int = DEFAULT_BLOCK_SIZE,
+                       pixel_tolerance: int = DEFAULT_PIXEL_TOLERANCE) -> float:
+    """
+    Share (0..1) of block_size x block_size blocks whose mean absolute grayscale difference exceeds pixel_tolerance
+    """
+    a, b = _grayscale(first), _grayscale(second)
+    if a.size != b.size:
+        return 1.0
+    columns, rows = max(1, a.width // block_size), max(1, a.height // block_size)
+    if NUMPY_AVAILABLE:
+        diff = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16))
+        diff = diff[:rows * block_size, :columns * block_size]
+        means = diff.reshape(rows, diff.shape[0] // rows, columns, diff.shape[1] // columns).mean(axis=(1, 3))
+        return float((means > pixel_tolerance).mean())
+    # Box-downsampling the difference image averages each block in C
+    means = ImageChops.difference(a, b).resize((columns, rows), Image.BOX)
+    histogram = means.histogram()
+    return sum(histogram[pixel_tolerance + 1:]) / (columns * rows)
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash: brightness gradients of a (hash_size + 1) x hash_size thumbnail as bits
+    """
+    pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(hash_size):
+        for column in range(hash_size):
+            left = pixels[row * (hash_size + 1) + column]
+            value = (value << 1) | (left > pixels[row * (hash_size + 1) + column + 1])
+    return value
+
+
+def dhash_change_ratio(first: Image.Image, second: Image.Image, hash_size: int = 8) -> float:
+    return bin(dhash(first, hash_size) ^ dhash(second, hash_size)).count("1") / (hash_size * hash_size)
+
+
+class FrameChangeDetector:
+    """
+    Remembers the last frame the model saw and reports whether a new frame differs from it
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, method: str = "blocks",
+                 block_size: int = DEFAULT_BLOCK_SIZE, pixel_tolerance: int = DEFAULT_PIXEL_TOLERANCE):
+        """
+        Args:
+            threshold: Change ratio above which two frames count as different (0: any block over
+                pixel_tolerance, since one changed text field is a single block or two)
+            method: "blocks" (precise, catches a changed text field) or "dhash" (cheaper, layout-level changes)
+            block_size: Block edge in pixels at the comparison width
+            pixel_tolerance: Mean grayscale difference a block may have and still count as unchanged
+        """
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        self.threshold = threshold
+        self.method = method
+        self.block_size = block_size
+        self.pixel_tolerance = pixel_tolerance
+        self.reference: Optional[Image.Image] = None
+        self._lock = threading.Lock()
+        self.stats = {"frames": 0, "changed": 0, "skipped": 0}
+
+    def change_ratio(self, first: Image.Image, second: Image.Image) -> float:
+        if self.method == "dhash":
+            return dhash_change_ratio(first, second)
+        return block_change_ratio(first, second, self.block_size, self.pixel_tolerance)
+
+    def differs(self, first: Image.Image, second: Image.Image) -> bool:
+        return self.change_ratio(first, second) > self.threshold
+
+    def is_new(self, image: Image.Image) -> bool:
+        """
+        True if image differs from the last new frame (which it then replaces); the first frame is always new
+        """
+        with self._lock:
+            reference = self.reference
+        changed = reference is None or self.differs(reference, image)
+        with self._lock:
+            self.stats["frames"] += 1
+            if changed:
+                self.reference = image
+                self.stats["changed"] += 1
+            else:
+                self.stats["skipped"] += 1
+        return changed
+
+    def reset(self) -> None:
+        with self._lock:
+            self.reference = None
+
+    def wait_for_settle(self, capture: Callable[[], Image.Image], timeout: float = 5.0, interval: float = 0.1,
+                        stable_frames: int = 2) -> Tuple[Image.Image, bool]:
+        """
+        Captures until stable_frames consecutive frames show no change (e.g. after a click while a dialog
+        animates). Returns (last frame, settled); settled is False if the timeout was reached first.
+        """
+        deadline = time.monotonic() + timeout
+        previous = capture()
+        stable = 0
+        while True:
+            if time.monotonic() >= deadline:
+                return previous, False
+            time.sleep(interval)
+            current = capture()
+            stable = 0 if self.differs(previous, current) else stable + 1
+            previous = current
+            if stable >= stable_frames:
+                return current, True
+
+    def wait_for_change(self, capture: Callable[[], Image.Image], reference: Optional[Image.Image] = None,
+                        timeout: float = 5.0, interval: float = 0.1) -> Tuple[Image.Image, bool]:
+        """
+        Captures until a frame differs from reference (default: the last new frame).
+        Returns (last frame, changed).
+        """
+        if reference is None:
+            with self._lock:
+                reference = self.reference
+        deadline = time.monotonic() + timeout
+        while True:
+            current = capture()
+            if reference is None or self.differs(reference, current):
+                return current, True
+            if time.monotonic() >= deadline:
+                return current, False
+            time.sleep(interval)
@@ -0,0 +1,246 @@
+"""
+Google Calendar API Backend
+Layer 2 executor that inserts events through the Calendar REST API
+(events.insert) instead of driving a browser. Requests share one pooled
+requests.Session, and many events go out as a single multipart/mixed batch
+request. Events the API path cannot express are left to the GUI executors.
+"""
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agent_s_interface import CalendarExecutor
+from event_parser import parse_duration_minutes
+from instruction_compiler import DEFAULT_DURATION, InstructionCompiler, UnsupportedEventError
+
+DEFAULT_BASE_URL = "https://www.googleapis.com"
+# Google allows up to 1000 calls per batch but recommends keeping batches small
+MAX_BATCH_SIZE = 50
+
+
+class GoogleCalendarAPIError(RuntimeError):
+    """
+    Raised when the Calendar API rejects a request
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Google Calendar API error {status}: {message}")
+        self.status = status
+
+
+def event_resource(event_details: Dict, time_zone: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Builds the events.insert body for an event dict; raises UnsupportedEventError like the compiler does
+    """
+    InstructionCompiler().build_context(event_details)
+    start = datetime.strptime(f"{event_details['date']} {event_details['time']}", "%Y-%m-%d %H:%M")
+    end = start + timedelta(minutes=parse_duration_minutes(event_details.get("duration") or DEFAULT_DURATION))
+
+    def moment(value: datetime) -> Dict[str, str]:
+        if time_zone:
+            return {"dateTime": value.isoformat(timespec="seconds"), "timeZone": time_zone}
+        # Without a configured zone, send the local UTC offset
+        return {"dateTime": value.astimezone().isoformat(timespec="seconds")}
+
+    resource = {"summary": event_details["title"].strip(), "start": moment(start), "end": moment(end)}
+    for field in ("location", "description"):
+        if event_details.get(field):
+            resource[field] = str(event_details[field]).strip()
+    return resource
+
+
+def _error_message(payload: Any, fallback: str) -> str:
+    if isinstance(payload, dict) and isinstance(payload.get("error"), dict):
+        return payload["error"].get("message", fallback)
+    return fallback
+
+
+class GoogleCalendarClient:
+    """
+    Thread-safe Calendar API client with pooled keep-alive connections
+    """
+
+    def __init__(self, access_token: Optional[str] = None, calendar_id: Optional[str] = None,
+                 base_url: Optional[str] = None, time_zone: Optional[str] = None,
+                 token_provider: Optional[Callable[[], str]] = None, pool_size: int = 4, timeout: float = 30.0):
+        """
+        Args:
+            access_token: OAuth access token with the calendar.events scope
+                (default: GOOGLE_CALENDAR_ACCESS_TOKEN)
+            calendar_id: Calendar to insert into (default: GOOGLE_CALENDAR_ID or "primary")
+            base_url: API root, overridable for tests (default: GOOGLE_CALENDAR_API_URL)
+            time_zone: IANA zone for event times (default: GOOGLE_CALENDAR_TIMEZONE, else the local offset)
+            token_provider: Called for a fresh token on every request, e.g. a google-auth refresh wrapper
+            pool_size: Keep-alive connections kept open to the API host
+        """
+        self.access_token = access_token or os.getenv("GOOGLE_CALENDAR_ACCESS_TOKEN")
+        self.calendar_id = calendar_id or os.getenv("GOOGLE_CALENDAR_ID") or "primary"
+        self.base_url = (base_url or os.getenv("GOOGLE_CALENDAR_API_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.time_zone = time_zone or os.getenv("GOOGLE_CALENDAR_TIMEZONE")
+        self.token_provider = token_provider
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "events_inserted": 0, "errors": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.access_token or self.token_provider)
+
+    def _headers(self) -> Dict[str, str]:
+        token = self.token_provider() if self.token_provider else self.access_token
+        if not token:
+            raise GoogleCalendarAPIError(401, "No access token configured (set GOOGLE_CALENDAR_ACCESS_TOKEN)")
+        return {"Authorization": f"Bearer {token}"}
+
+    def _events_path(self) -> str:
+        return f"/calendar/v3/calendars/{requests.utils.quote(self.calendar_id, safe='')}/events"
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def insert_event(self, event_details: Dict) -> Dict[str, Any]:
+        """
+        Inserts one event and returns the created event resource
+        """
+        body = event_resource(event_details, self.time_zone)
+        response = self.session.post(self.base_url + self._events_path(), json=body,
+                                     headers=self._headers(), timeout=self.timeout)
+        self._count(requests=1)
+        if response.status_code >= 400:
+            self._count(errors=1)
+            raise GoogleCalendarAPIError(response.status_code, _error_message(_json_or_none(response.text),
+                                                                             response.reason))
+        self._count(events_inserted=1)
+        return response.json()
+
+    def insert_events(self, events: List[Dict], batch_size: int = MAX_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """
+        Inserts many events with batch requests of up to batch_size calls each.
+        Returns one outcome per event in input order: {"ok": True, "event": resource}
+        or {"ok": False, "status": code, "error": message}. Only transport errors raise.
+        """
+        outcomes: List[Dict[str, Any]] = []
+        for start in range(0, len(events), batch_size):
+            outcomes.extend(self._insert_batch(events[start:start + batch_size]))
+        return outcomes
+
+    def _insert_batch(self, events: List[Dict]) -> List[Dict[str, Any]]:
+        outcomes: List[Optional[Dict[str, Any]]] = [None] * len(events)
+        parts = []
+        for index, event_details in enumerate(events):
+            try:
+                body = json.dumps(event_resource(event_details, self.time_zone))
+            except UnsupportedEventError as e:
+                outcomes[index] = {"ok": False, "status": 400, "error": str(e)}
+                continue
+            parts.append(
+                f"Content-Type: application/http\r\nContent-ID: <item{index}>\r\n\r\n"
+                f"POST {self._events_path()}\r\nContent-Type: application/json\r\n\r\n{body}\r\n"
+            )
+        if parts:
+            boundary = f"batch_{uuid.uuid4().hex}"
+            payload = "".join(f"--{boundary}\r\n{part}" for part in parts) + f"--{boundary}--\r\n"
+            headers = dict(self._headers(), **{"Content-Type": f"multipart/mixed; boundary={boundary}"})
+            response = self.session.post(f"{self.base_url}/batch/calendar/v3", data=payload.encode("utf-8"),
+                                         headers=headers, timeout=self.timeout)
+            self._count(requests=1, batches=1)
+            if response.status_code >= 400:
+                self._count(errors=1)
+                raise GoogleCalendarAPIError(response.status_code, _error_message(_json_or_none(response.text),
+                                                                                 response.reason))
+            for index, status, payload in parse_batch_response(response.headers.get("Content-Type", ""),
+                                                                response.text):
+                if 0 <= index < len(events):
+                    if status < 400:
+                        outcomes[index] = {"ok": True, "event": payload}
+                    else:
+                        outcomes[index] = {"ok": False, "status": status,
+                                           "error": _error_message(payload, f"HTTP {status}")}
+
+        results = [outcome or {"ok": False, "status": 0, "error": "Missing from batch response"}
+                   for outcome in outcomes]
+        inserted = sum(1 for outcome in results if outcome["ok"])
+        self._count(events_inserted=inserted, errors=len(results) - inserted)
+        return results
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _json_or_none(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def parse_batch_response(content_type: str, body: str) -> List[tuple]:
+    """
+    Splits a multipart/mixed batch response into (item index, HTTP status, JSON payload) tuples
+    """
+    boundary = None
+    for parameter in content_type.split(";")[1:]:
+        key, _, value = parameter.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise GoogleCalendarAPIError(502, "Batch response without a multipart boundary")
+
+    results = []
+    for part in body.split(f"--{boundary}")[1:]:
+        if part.startswith("--"):
+            break
+        outer, _, inner = part.strip("\r\n").partition("\r\n\r\n")
+        index = -1
+        for line in outer.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-id" and "item" in value:
+                index = int(value.strip().strip("<>").rsplit("item", 1)[1])
+        status_line, _, rest = inner.partition("\r\n")
+        _, _, payload = rest.partition("\r\n\r\n")
+        status = int(status_line.split()[1]) if len(status_line.split()) > 1 else 0
+        results.append((index, status, _json_or_none(payload.strip())))
+    return results
+
+
+class GoogleCalendarAPIExecutor(CalendarExecutor):
+    """
+    Creates events with the Calendar API; needs the structured event details
+    """
+
+    name = "google_calendar_api"
+
+    def __init__(self, client: Optional[GoogleCalendarClient] = None):
+        self.client = client or GoogleCalendarClient()
+
+    def available(self) -> bool:
+        return self.client.configured
+
+    def supports(self, event_details: Optional[Dict]) -> bool:
+        if not event_details:
+            return False
+        try:
+            InstructionCompiler().build_context(event_details)
+        except UnsupportedEventError:
+            return False
+        return True
+
+    def execute(self, instruction: str, event_details: Optional[Dict] = None) -> Any:
+        if not self.supports(event_details):
+            raise UnsupportedEventError("The Calendar API backend needs supported event details")
+        event = self.client.insert_event(event_details)
+        print(f"✅ Created via Google Calendar API: {event.get('htmlLink') or event.get('id')}")
+        return event
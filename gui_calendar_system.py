@@ -4,11 +4,16 @@ Provides a user-friendly interface for calendar event creation
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, simpledialog
 import threading
+import uuid
 import os
 from dotenv import load_dotenv
 from multi_layer_prompt_system import MultiLayerCalendarSystem
+from progress_events import ProgressBus
+
+# How often the Tk thread drains progress events (ms)
+POLL_INTERVAL_MS = 50
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,7 +32,12 @@ class CalendarGUI:
             return
             
         self.calendar_system = MultiLayerCalendarSystem(api_key)
+        # Workers publish here; only the Tk thread touches widgets
+        self.progress_bus = ProgressBus()
+        self.active_requests = {}
+        self.streaming_request = None
         self.setup_ui()
+        self.root.after(POLL_INTERVAL_MS, self.poll_progress)
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -162,9 +172,26 @@ class CalendarGUI:
         
     def log_output(self, message):
         """Add message to output text area"""
+        self.end_stream()
         self.output_text.insert(tk.END, f"{message}\n")
         self.output_text.see(tk.END)
-        self.root.update_idletasks()
+        
+    def append_token(self, request_id, text):
+        """Append streamed LLM output, starting a labelled line when another request was streaming"""
+        if self.streaming_request != request_id:
+            self.end_stream()
+            self.output_text.insert(tk.END, f"[{request_id}] 💬 ")
+            self.streaming_request = request_id
+        self.output_text.insert(tk.END, text)
+        self.output_text.see(tk.END)
+        if text.endswith("\n"):
+            self.streaming_request = None
+            
+    def end_stream(self):
+        """Finish a partially streamed line before writing anything else"""
+        if self.streaming_request is not None:
+            self.output_text.insert(tk.END, "\n")
+            self.streaming_request = None
         
     def create_event_threaded(self):
         """Run event creation in a separate thread to prevent UI freezing"""
@@ -174,64 +201,82 @@ class CalendarGUI:
             messagebox.showwarning("Warning", "Please enter a valid event description!")
             return
             
-        # Disable button and start progress
-        self.create_button.config(state=tk.DISABLED)
-        self.progress.start()
-        self.status_var.set("Processing your request...")
-        self.output_text.delete("1.0", tk.END)
+        # Several requests can run at once; each one reports under its own ID
+        request_id = uuid.uuid4().hex[:6]
+        if not self.active_requests:
+            self.output_text.delete("1.0", tk.END)
+            self.progress.start()
+        self.active_requests[request_id] = user_input
+        self.update_status()
         
         # Run in separate thread
-        thread = threading.Thread(target=self.create_event, args=(user_input,))
+        thread = threading.Thread(target=self.create_event, args=(user_input, request_id))
         thread.daemon = True
         thread.start()
         
-    def create_event(self, user_input):
-        """Create calendar event (runs in separate thread)"""
+    def create_event(self, user_input, request_id):
+        """Create calendar event (runs in separate thread, reports through the progress bus)"""
+        reporter = self.progress_bus.reporter(request_id)
         try:
-            self.log_output(f"🎯 Processing request: {user_input}")
-            self.log_output("=" * 50)
-            
-            # Redirect the calendar system output to our GUI
-            import sys
-            from io import StringIO
-            
-            # Capture stdout
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = StringIO()
+            self.calendar_system.create_calendar_event(
+                user_input, ask=self.ask_on_ui_thread, progress=reporter
+            )
+        except Exception as e:
+            reporter.log(f"❌ Error: {str(e)}")
+            reporter.finished(False, {"error": str(e)})
             
+    def ask_on_ui_thread(self, questions):
+        """Ask clarification questions with dialogs on the Tk thread; blocks the calling worker"""
+        answers = {}
+        done = threading.Event()
+        
+        def ask():
             try:
-                success = self.calendar_system.create_calendar_event(user_input)
-                
-                # Get captured output
-                output = captured_output.getvalue()
-                sys.stdout = old_stdout
-                
-                # Display output in GUI
-                for line in output.split('\n'):
-                    if line.strip():
-                        self.log_output(line)
+                for question in questions:
+                    answer = simpledialog.askstring("More details needed", question, parent=self.root)
+                    if answer and answer.strip():
+                        answers[question] = answer.strip()
+            finally:
+                done.set()
                 
-                if success:
-                    self.status_var.set("✅ Event created successfully!")
-                    messagebox.showinfo("Success", "Calendar event created successfully!")
-                else:
-                    self.status_var.set("❌ Event creation failed")
-                    messagebox.showerror("Error", "Failed to create calendar event. Check the output for details.")
-                    
-            except Exception as e:
-                sys.stdout = old_stdout
-                self.log_output(f"❌ Error: {str(e)}")
-                self.status_var.set("❌ Error occurred")
-                messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        self.root.after(0, ask)
+        done.wait()
+        return answers
+        
+    def poll_progress(self):
+        """Drain progress events on the Tk thread and reschedule"""
+        # Reschedule first so an error in a handler can't stop the polling
+        self.root.after(POLL_INTERVAL_MS, self.poll_progress)
+        for event in self.progress_bus.drain(max_events=500):
+            self.handle_event(event)
+        
+    def handle_event(self, event):
+        """Render one progress event"""
+        if event.kind == "token":
+            self.append_token(event.request_id, event.message)
+        elif event.kind == "log":
+            self.log_output(f"[{event.request_id}] {event.message}")
+        elif event.kind == "stage":
+            self.status_var.set(f"[{event.request_id}] {event.message}...")
+        elif event.kind == "finished":
+            self.active_requests.pop(event.request_id, None)
+            self.update_status()
+            if not self.active_requests:
+                self.progress.stop()
+            # No modal dialog here: it would stop the poll loop and every other request's output
+            if event.data.get("success"):
+                self.status_var.set(f"✅ [{event.request_id}] Event created successfully!")
+                self.log_output(f"[{event.request_id}] ✅ Calendar event created successfully!")
+            else:
+                self.status_var.set(f"❌ [{event.request_id}] Event creation failed")
+                self.log_output(f"[{event.request_id}] ❌ Failed to create calendar event. See the output above.")
                 
-        finally:
-            # Re-enable button and stop progress
-            self.root.after(0, self.reset_ui)
-            
-    def reset_ui(self):
-        """Reset UI elements after operation completes"""
-        self.create_button.config(state=tk.NORMAL)
-        self.progress.stop()
+    def update_status(self):
+        """Show how many requests are in flight"""
+        if self.active_requests:
+            self.status_var.set(f"Processing {len(self.active_requests)} request(s)...")
+        else:
+            self.status_var.set("Ready to create calendar events!")
 
 def main():
     """Main function to run the GUI"""
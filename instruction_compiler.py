@@ -0,0 +1,206 @@
+"""
+Instruction Compiler - Local Agent-S/Orgo instruction rendering
+Renders a versioned step template from an event dict, doing the date
+formatting, time typing ("08:32" -> "832") and end-time arithmetic locally
+instead of asking an LLM to do it.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from event_parser import parse_duration_minutes
+
+DEFAULT_TEMPLATE = "google-calendar-firefox/v1"
+DEFAULT_DURATION = "1 hour"
+
+SUPPORTED_FIELDS = {"title", "date", "time", "duration", "location", "description"}
+
+_MARKER_PATTERN = re.compile(r"EVENT\s+(\d+)\s*:\s*(DONE|FAILED)(?:\s*[-:]\s*([^\n]*))?", re.IGNORECASE)
+
+# Each step is rendered with str.format; steps whose required field is empty are skipped.
+# "once" steps (navigation) are only rendered for the first event of a multi-event instruction.
+# Bump the version when changing steps so cached/logged instructions stay comparable.
+TEMPLATES: Dict[str, List[Dict[str, str]]] = {
+    "google-calendar-firefox/v1": [
+        {"text": "Open Firefox and go to https://calendar.google.com (skip this if Google Calendar is already open). Wait for the calendar to finish loading.", "once": True},
+        {"text": "Click the \"Create\" button (or the \"+\" button) in the top-left corner. If a menu appears, choose \"Event\"."},
+        {"text": "If a small quick-event popup opens, click \"More options\" to open the full event editor."},
+        {"text": "Click the \"Add title\" field and type: {title}"},
+        {"text": "Click the start date input and type {date_numeric}, then press ENTER."},
+        {"text": "Click the start time input on the left, beside the date input, type {start_typed} and press ENTER."},
+        {"text": "Click the end time input, type {end_typed} and press ENTER. The end time should read {end_12h}."},
+        {"text": "Make sure the end date is {end_date_numeric}.", "requires": "crosses_midnight"},
+        {"text": "Click \"Add location\" and type: {location}", "requires": "location"},
+        {"text": "Click \"Add description\" and type: {description}", "requires": "description"},
+        {"text": "Click \"Save\"."},
+        {"text": "Confirm that \"{title}\" appears on {date_long} from {start_12h} to {end_12h}. If the day or time is wrong, open the event, correct it and save again."},
+    ],
+}
+
+
+class UnsupportedEventError(ValueError):
+    """
+    Raised when an event cannot be rendered by the local template
+    """
+
+
+def _format_12h(moment: datetime) -> str:
+    return moment.strftime("%I:%M %p").lstrip("0")
+
+
+def _format_typed(moment: datetime) -> str:
+    # Google Calendar accepts "832" for 08:32, "1600" for 16:00 and "0030" for 00:30
+    hour = "00" if moment.hour == 0 else str(moment.hour)
+    return f"{hour}{moment.minute:02d}"
+
+
+class InstructionCompiler:
+    """
+    Deterministic replacement for the LLM instruction-generation call
+    """
+
+    def __init__(self, template: str = DEFAULT_TEMPLATE):
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown instruction template: {template}")
+        self.template = template
+        self.steps = TEMPLATES[template]
+
+    @property
+    def version(self) -> str:
+        return self.template
+
+    def build_context(self, event_details: Dict) -> Dict:
+        """
+        Validates the event and computes every value the template needs
+        """
+        extra = {key for key, value in event_details.items() if value and key not in SUPPORTED_FIELDS}
+        if extra:
+            raise UnsupportedEventError(f"Unsupported fields: {', '.join(sorted(extra))}")
+
+        title = str(event_details.get("title") or "").strip()
+        if not title:
+            raise UnsupportedEventError("Missing title")
+
+        try:
+            start = datetime.strptime(
+                f"{event_details.get('date', '')} {event_details.get('time', '')}", "%Y-%m-%d %H:%M"
+            )
+        except ValueError:
+            raise UnsupportedEventError("Date must be YYYY-MM-DD and time must be HH:MM")
+
+        duration = str(event_details.get("duration") or DEFAULT_DURATION)
+        minutes = parse_duration_minutes(duration)
+        if not minutes or minutes >= 24 * 60:
+            raise UnsupportedEventError(f"Unsupported duration: {duration}")
+        end = start + timedelta(minutes=minutes)
+
+        return {
+            "title": title,
+            "location": str(event_details.get("location") or "").strip(),
+            "description": str(event_details.get("description") or "").strip(),
+            "date_long": f"{start.strftime('%B')} {start.day}, {start.year}",
+            "date_numeric": start.strftime("%m/%d/%Y"),
+            "end_date_numeric": end.strftime("%m/%d/%Y"),
+            "start_12h": _format_12h(start),
+            "end_12h": _format_12h(end),
+            "start_typed": _format_typed(start),
+            "end_typed": _format_typed(end),
+            "duration": duration,
+            "crosses_midnight": end.date() != start.date(),
+        }
+
+    def _render_steps(self, context: Dict, first: bool = True) -> List[str]:
+        lines = []
+        for step in self.steps:
+            requires = step.get("requires")
+            if requires and not context.get(requires):
+                continue
+            if step.get("once") and not first:
+                continue
+            lines.append(f"{len(lines) + 1}. {step['text'].format(**context)}")
+        return lines
+
+    @staticmethod
+    def _summary(context: Dict) -> str:
+        return (f"\"{context['title']}\" on {context['date_long']} "
+                f"from {context['start_12h']} to {context['end_12h']} ({context['duration']})")
+
+    def compile(self, event_details: Dict) -> str:
+        """
+        Renders the instruction for an event.
+        Raises UnsupportedEventError if the event needs the LLM fallback.
+        """
+        context = self.build_context(event_details)
+        lines = [f"Create a Google Calendar event titled {self._summary(context)}.", "", "Steps:"]
+        lines += self._render_steps(context)
+        return "\n".join(lines)
+
+    def compile_many(self, events: List[Dict]) -> str:
+        """
+        Renders one instruction that creates several events in the same browser session.
+        The agent is asked to report "EVENT <n>: DONE" or "EVENT <n>: FAILED" after each one
+        (see parse_event_markers). Raises UnsupportedEventError if any event is unsupported.
+        """
+        contexts = [self.build_context(event_details) for event_details in events]
+        lines = [
+            f"Create the following {len(contexts)} Google Calendar event{'s' if len(contexts) != 1 else ''} "
+            "one after another in the same "
+            "browser tab. Do not reload or reopen Google Calendar between events.",
+            "After each event, write \"EVENT <number>: DONE\" once it is saved and confirmed, or "
+            "\"EVENT <number>: FAILED - <reason>\" if it could not be created, then continue with the next one.",
+        ]
+        for number, context in enumerate(contexts, 1):
+            lines += ["", f"EVENT {number}: {self._summary(context)}"]
+            lines += self._render_steps(context, first=number == 1)
+            lines.append(f"Then write \"EVENT {number}: DONE\".")
+        return "\n".join(lines)
+
+
+def agent_reply_text(result: Any) -> str:
+    """
+    The agent's own words from a prompt result. Orgo returns the whole conversation, which starts
+    with our instruction (and its "EVENT n: DONE" examples), so only assistant text is kept.
+    """
+    if result is None:
+        return ""
+    if isinstance(result, str):
+        return result
+    if not isinstance(result, list):
+        return str(result)
+    parts = []
+    for message in result:
+        role = message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
+        if role != "assistant":
+            continue
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for block in content or []:
+            block_type = block.get("type") if isinstance(block, dict) else getattr(block, "type", None)
+            if block_type == "text":
+                parts.append(block.get("text", "") if isinstance(block, dict) else getattr(block, "text", ""))
+    return "\n".join(parts)
+
+
+def parse_event_markers(text: str) -> Dict[int, str]:
+    """
+    Reads "EVENT <n>: DONE" / "EVENT <n>: FAILED - reason" markers from an agent reply.
+    Returns {event number: "DONE" or the failure reason}; the last marker for an event wins.
+    """
+    outcomes = {}
+    for match in _MARKER_PATTERN.finditer(text or ""):
+        number = int(match.group(1))
+        outcomes[number] = "DONE" if match.group(2).upper() == "DONE" else (match.group(3) or "FAILED").strip()
+    return outcomes
+
+
+def compile_instruction(event_details: Dict, template: str = DEFAULT_TEMPLATE) -> Optional[str]:
+    """
+    Returns the compiled instruction, or None if the event needs the LLM fallback
+    """
+    try:
+        return InstructionCompiler(template).compile(event_details)
+    except UnsupportedEventError:
+        return None
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Durable Job Queue - crash-safe calendar requests
+SQLite (WAL) queue that records how far each request got: queued →
+analyzed → instruction_ready → executing → done. Workers lease jobs for a
+visibility timeout (renewed while they work), save each stage's output, and
+a job whose worker died is picked up again at the stage it reached, so
+completed LLM stages are not repeated. Executions go through the execution
+ledger under the job's ID: a job interrupted mid-execution is finished
+from the ledger's record, or marked "unknown" (check the calendar) rather
+than creating the event twice. Writes from all threads are group-committed
+by one writer thread, so the queue adds little per request at high rates.
+
+Usage:
+    python job_queue.py enqueue "Dentist on August 22nd at 8am for 1 hour"
+    python job_queue.py work --workers 4
+    python job_queue.py status
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from agent_s_interface import run_executor
+from execution_ledger import (COMPLETED as LEDGER_COMPLETED, FAILED as LEDGER_FAILED, DuplicateExecutionError,
+                              ExecutionLedger, get_default_ledger, is_ambiguous_failure)
+from executor_router import get_default_router
+from multi_layer_prompt_system import observe_stage_timings
+from resilience import classify_error
+
+DEFAULT_QUEUE_PATH = os.path.join(".cache", "jobs.sqlite3")
+DEFAULT_VISIBILITY_TIMEOUT = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 5.0
+# Group commit: wait this long for more writes before committing, and commit at most this many at once
+DEFAULT_COMMIT_INTERVAL = 0.002
+DEFAULT_COMMIT_BATCH = 500
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+QUEUED = "queued"
+ANALYZED = "analyzed"
+INSTRUCTION_READY = "instruction_ready"
+EXECUTING = "executing"
+DONE = "done"
+FAILED = "failed"
+# Interrupted or timed out during execution: the event may or may not exist
+UNKNOWN = "unknown"
+FINISHED_STATES = (DONE, FAILED, UNKNOWN)
+
+_COLUMNS = "id, text, answers, state, event_details, instruction, attempts, lease_owner"
+
+
+class LeaseLostError(RuntimeError):
+    """
+    Raised when a worker updates a job whose lease expired and was taken by another worker
+    """
+
+
+class QueuedJob(NamedTuple):
+    """
+    A leased job as of its last saved stage
+    """
+    id: str
+    text: str
+    answers: Dict[str, str]
+    state: str
+    event_details: Optional[Dict[str, Any]]
+    instruction: Optional[str]
+    attempts: int
+    lease_owner: Optional[str]
+
+
+def _job_from_row(row: Tuple) -> QueuedJob:
+    job_id, text, answers, state, details, instruction, attempts, owner = row
+    return QueuedJob(job_id, text, json.loads(answers) if answers else {}, state,
+                     json.loads(details) if details else None, instruction, attempts, owner)
+
+
+class _GroupCommitter:
+    """
+    Single writer thread: statements submitted by any thread are committed together in one
+    transaction; each submitter gets its statement's row count once the transaction is durable
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], interval: float, max_batch: int):
+        self._connect = connect
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, Tuple, Future]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {"commits": 0, "statements": 0}
+        self._thread = threading.Thread(target=self._run, name="job-queue-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, statements: Iterable[Tuple[str, Tuple]]) -> List[Future]:
+        futures = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is closed")
+            for sql, params in statements:
+                future = Future()
+                self._pending.append((sql, params, future))
+                futures.append(future)
+            self._cond.notify()
+        return futures
+
+    def _run(self) -> None:
+        conn = self._connect()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+            if self.interval > 0:
+                # Let concurrent writers join this transaction
+                time.sleep(self.interval)
+            with self._cond:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._commit(conn, batch)
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Tuple[str, Tuple, Future]]) -> None:
+        results: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, future in batch:
+                try:
+                    results.append((future, conn.execute(sql, params).rowcount, None))
+                except sqlite3.Error as e:
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats["commits"] += 1
+        self.stats["statements"] += len(batch)
+        for future, rowcount, error in results:
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                future.set_exception(error)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+class DurableJobQueue:
+    """
+    On-disk queue of calendar requests with per-stage state and leases; safe between threads and processes
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+                 commit_batch: int = DEFAULT_COMMIT_BATCH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            visibility_timeout: Seconds a claimed job stays hidden from other workers unless renewed
+            max_attempts: Claims per job before it is marked failed
+            commit_interval: How long the writer waits for more writes to commit together
+            commit_batch: Most writes per transaction
+            ttl_seconds: How long finished jobs are kept
+            clock: Wall clock; leases are compared between processes
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    answers TEXT,
+                    state TEXT NOT NULL,
+                    event_details TEXT,
+                    instruction TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    available_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs(available_at) "
+                         "WHERE state NOT IN ('done', 'failed', 'unknown')")
+            conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed', 'unknown') AND updated_at < ?",
+                         (self.clock() - ttl_seconds,))
+        self._writer = _GroupCommitter(self._connection, commit_interval, commit_batch)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        One connection per thread and process, as in ExecutionLedger
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements: List[Tuple[str, Tuple]]) -> List[int]:
+        return [future.result() for future in self._writer.submit(statements)]
+
+    def enqueue(self, text: str, answers: Optional[Dict[str, str]] = None) -> str:
+        """
+        Adds a request; returns its job ID once it is committed
+        """
+        return self.enqueue_many([text], answers)[0]
+
+    def enqueue_many(self, texts: Iterable[str], answers: Optional[Dict[str, str]] = None) -> List[str]:
+        now = self.clock()
+        ids, statements = [], []
+        for text in texts:
+            job_id = uuid.uuid4().hex[:12]
+            ids.append(job_id)
+            statements.append((
+                "INSERT INTO jobs (id, text, answers, state, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, text, json.dumps(answers) if answers else None, QUEUED, now, now, now),
+            ))
+        self._write(statements)
+        return ids
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[QueuedJob]:
+        """
+        Leases up to limit available jobs (new ones, retries that are due, and jobs whose lease expired),
+        oldest first. Jobs out of attempts are marked failed instead, or unknown if they were executing.
+        """
+        now = self.clock()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE state NOT IN ('done', 'failed', 'unknown') "
+                "AND available_at <= ? AND COALESCE(lease_expires, 0) <= ? ORDER BY created_at LIMIT ?",
+                (now, now, limit),
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                job = _job_from_row(row)
+                if job.attempts >= self.max_attempts:
+                    # A job left executing may have created its event, so it is not reported as failed
+                    state, note = ((UNKNOWN, f" (interrupted during execution after {job.attempts} attempts; "
+                                             "the event may exist)") if job.state == EXECUTING
+                                   else (FAILED, f" (gave up after {job.attempts} attempts)"))
+                    conn.execute("UPDATE jobs SET state = ?, error = COALESCE(error, '') || ?, lease_owner = NULL, "
+                                 "lease_expires = NULL, updated_at = ? WHERE id = ?", (state, note, now, job.id))
+                    continue
+                conn.execute("UPDATE jobs SET attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                             "updated_at = ? WHERE id = ?", (worker_id, now + self.visibility_timeout, now, job.id))
+                claimed.append(job._replace(attempts=job.attempts + 1, lease_owner=worker_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def advance(self, job: QueuedJob, state: str, event_details: Optional[Dict] = None,
+                instruction: Optional[str] = None, result: Any = None, error: Optional[str] = None) -> QueuedJob:
+        """
+        Saves a stage's output and moves the job to state; a finished state also ends the lease.
+        Raises LeaseLostError if another worker owns the job now.
+        """
+        finished = state in FINISHED_STATES
+        event_details = job.event_details if event_details is None else event_details
+        instruction = job.instruction if instruction is None else instruction
+        (updated,) = self._write([(
+            "UPDATE jobs SET state = ?, event_details = ?, instruction = ?, result = ?, error = ?, "
+            "lease_owner = CASE WHEN ? THEN NULL ELSE lease_owner END, "
+            "lease_expires = CASE WHEN ? THEN NULL ELSE lease_expires END, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            (state, json.dumps(event_details) if event_details is not None else None, instruction,
+             json.dumps(result, default=str) if result is not None else None, error, finished, finished,
+             self.clock(), job.id, job.lease_owner),
+        )])
+        if not updated:
+            raise LeaseLostError(f"Job {job.id} is no longer leased by {job.lease_owner}")
+        return job._replace(state=state, event_details=event_details, instruction=instruction,
+                            lease_owner=None if finished else job.lease_owner)
+
+    def release(self, job: QueuedJob, error: str, delay: float = DEFAULT_RETRY_DELAY,
+                state: Optional[str] = None) -> None:
+        """
+        Gives a job back after a failed attempt; it becomes available again after delay, at state
+        (default: the stage it reached)
+        """
+        now = self.clock()
+        self._write([(
+            "UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+            "updated_at = ? WHERE id = ? AND lease_owner = ?",
+            (state or job.state, error, now + delay, now, job.id, job.lease_owner),
+        )])
+
+    def heartbeat(self, jobs: Iterable[QueuedJob]) -> int:
+        """
+        Renews the leases of jobs still being worked on; returns how many were still held
+        """
+        expires = self.clock() + self.visibility_timeout
+        return sum(self._write([
+            ("UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?", (expires, job.id, job.lease_owner))
+            for job in jobs
+        ]))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT id, text, state, event_details, instruction, result, error, attempts, created_at, updated_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "text", "state", "event_details", "instruction", "result", "error", "attempts",
+                "created_at", "updated_at")
+        job = dict(zip(keys, row))
+        for key in ("event_details", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"states": self.counts(), "writer": dict(self._writer.stats)}
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class QueueWorker:
+    """
+    Takes jobs from a DurableJobQueue and runs each remaining stage on a MultiLayerCalendarSystem
+    """
+
+    def __init__(self, queue: DurableJobQueue, calendar_system, ledger: Optional[ExecutionLedger] = None,
+                 worker_id: Optional[str] = None, batch_size: int = 1, poll_interval: float = 0.5):
+        """
+        Args:
+            queue: Where jobs and their stage outputs are kept
+            calendar_system: MultiLayerCalendarSystem whose Layer 1 and executor are used
+            ledger: Records executions by job ID so an interrupted execution is not repeated blindly;
+                without one, a job interrupted mid-execution is marked unknown
+            worker_id: Lease owner name (default: host, pid and a random suffix)
+            batch_size: Jobs leased per claim
+            poll_interval: Wait between claims while the queue is empty
+        """
+        self.queue = queue
+        self.calendar_system = calendar_system
+        self.ledger = ledger
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._held: Dict[str, QueuedJob] = {}
+        self._held_lock = threading.Lock()
+        self.stats = {"processed": 0, "done": 0, "failed": 0, "unknown": 0, "released": 0, "lease_lost": 0}
+
+    def _hold(self, job: QueuedJob) -> None:
+        with self._held_lock:
+            self._held[job.id] = job
+
+    def _drop(self, job_id: str) -> None:
+        with self._held_lock:
+            self._held.pop(job_id, None)
+
+    def _keep_leases(self, stop: threading.Event) -> None:
+        while not stop.wait(self.queue.visibility_timeout / 3):
+            with self._held_lock:
+                held = list(self._held.values())
+            if held:
+                self.queue.heartbeat(held)
+
+    def run(self, stop: Optional[threading.Event] = None, until_empty: bool = False) -> int:
+        """
+        Processes jobs until stop is set (or, with until_empty, until none are available); returns the count
+        """
+        stop = stop or threading.Event()
+        keeper_stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_leases, args=(keeper_stop,), name="job-lease-keeper", daemon=True)
+        keeper.start()
+        processed = 0
+        try:
+            while not stop.is_set():
+                jobs = self.queue.claim(self.worker_id, self.batch_size)
+                if not jobs:
+                    if until_empty:
+                        break
+                    stop.wait(self.poll_interval)
+                    continue
+                for job in jobs:
+                    self._hold(job)
+                for job in jobs:
+                    self.process(job)
+                    processed += 1
+        finally:
+            keeper_stop.set()
+        return processed
+
+    def process(self, job: QueuedJob) -> None:
+        """
+        Runs the job from the stage it reached; saves each stage before starting the next
+        """
+        self.stats["processed"] += 1
+        resumed = job.state == EXECUTING
+        try:
+            if job.state == QUEUED:
+                job = self._analyze(job)
+            if job.state == ANALYZED:
+                job = self._generate(job)
+            if job.state == INSTRUCTION_READY:
+                # Durable before the event is touched, so a crash from here on is known to be mid-execution
+                job = self.queue.advance(job, EXECUTING)
+            if job.state == EXECUTING:
+                job = self._execute(job, resumed)
+            if job.state in FINISHED_STATES:
+                self.stats[job.state] += 1
+        except LeaseLostError as e:
+            self.stats["lease_lost"] += 1
+            print(f"[{job.id}] ⚠️ {e}")
+        except Exception as e:
+            classified = classify_error(e)
+            if not classified.retryable:
+                print(f"[{job.id}] ❌ {job.state} failed ({classified.reason}): {e}")
+                self._finish(job, FAILED, error=str(e))
+            else:
+                print(f"[{job.id}] ⚠️ {job.state} failed ({classified.reason}), will retry: {e}")
+                self.stats["released"] += 1
+                # A definite execution failure created nothing, so the retry may execute again
+                self.queue.release(job, str(e), delay=classified.retry_after or DEFAULT_RETRY_DELAY,
+                                   state=INSTRUCTION_READY if job.state == EXECUTING else None)
+        finally:
+            self._drop(job.id)
+
+    def _finish(self, job: QueuedJob, state: str, result: Any = None, error: Optional[str] = None) -> QueuedJob:
+        try:
+            return self.queue.advance(job, state, result=result, error=error)
+        except LeaseLostError:
+            self.stats["lease_lost"] += 1
+            return job
+
+    def _analyze(self, job: QueuedJob) -> QueuedJob:
+        print(f"[{job.id}] 🧠 Layer 1: Analyzing your request...")
+        prompt_engineer = self.calendar_system.prompt_engineer
+        start = time.perf_counter()
+        if self.calendar_system.pipeline_mode == "single_call":
+            analysis = prompt_engineer.analyze_and_instruct(job.text)
+        else:
+            analysis = prompt_engineer.analyze_user_input(job.text)
+        event_details = analysis["extracted_details"]
+        instruction = analysis.get("agent_s_instruction", "")
+        if analysis["confidence"] < 0.8 and analysis["clarification_questions"] and job.answers:
+            # Clarification can't be asked for here; the answers sent with the job are used
+            event_details = prompt_engineer.refine_event_details(event_details, job.answers)
+            instruction = ""
+        observe_stage_timings({"analyze": time.perf_counter() - start}, self.calendar_system.pipeline_mode)
+        return self.queue.advance(job, INSTRUCTION_READY if instruction else ANALYZED,
+                                  event_details=event_details, instruction=instruction or None)
+
+    def _generate(self, job: QueuedJob) -> QueuedJob:
+        print(f"[{job.id}] 🎨 Generating optimized instruction for Agent-S...")
+        start = time.perf_counter()
+        instruction = self.calendar_system.prompt_engineer.generate_agent_s_instruction(job.event_details)
+        observe_stage_timings({"generate": time.perf_counter() - start}, self.calendar_system.pipeline_mode)
+        return self.queue.advance(job, INSTRUCTION_READY, instruction=instruction)
+
+    def _execute(self, job: QueuedJob, resumed: bool) -> QueuedJob:
+        key = f"job:{job.id}"
+        if resumed:
+            # The previous worker stopped mid-execution; only the ledger knows whether the event exists
+            record = self.ledger.status(key) if self.ledger is not None else {"status": "unrecorded"}
+            if record is not None and record["status"] == LEDGER_COMPLETED:
+                print(f"[{job.id}] ♻️ Execution finished before the interruption; using its result")
+                return self._finish(job, DONE, result=record["result"])
+            if record is not None and record["status"] != LEDGER_FAILED:
+                print(f"[{job.id}] ❓ Interrupted during execution; check the calendar before resubmitting")
+                return self._finish(job, UNKNOWN, error="Interrupted during execution; the event may exist")
+
+        print(f"[{job.id}] 🚀 Layer 2: Executing with Agent-S...")
+        executor = self.calendar_system.executor
+
+        def execute() -> Any:
+            if executor is None:
+                # The default router raises when nothing created the event, and records the execution
+                # in the worker's ledger under the job's key, so each job has a single ledger record
+                return get_default_router().execute(job.instruction, job.event_details,
+                                                    key=key if self.ledger is not None else None, ledger=self.ledger)
+            if self.ledger is None:
+                return run_executor(executor, job.instruction, job.event_details)
+            return self.ledger.run_once(key, lambda: run_executor(executor, job.instruction, job.event_details),
+                                        details=job.event_details)
+
+        try:
+            result = execute()
+        except DuplicateExecutionError as e:
+            return self._finish(job, UNKNOWN, error=str(e))
+        except Exception as e:
+            if is_ambiguous_failure(e):
+                print(f"[{job.id}] ❓ Execution timed out; check the calendar before resubmitting")
+                return self._finish(job, UNKNOWN, error=str(e))
+            raise
+        print(f"[{job.id}] ✅ Calendar event creation completed!")
+        return self._finish(job, DONE, result=result)
+
+
+def get_default_queue() -> DurableJobQueue:
+    return DurableJobQueue(path=os.getenv("JOB_QUEUE_PATH", DEFAULT_QUEUE_PATH))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Durable queue for calendar event requests")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Add requests to the queue")
+    enqueue.add_argument("text", nargs="+", help="Event request(s)")
+    work = commands.add_parser("work", help="Process queued jobs (resumes interrupted ones)")
+    work.add_argument("--workers", type=int, default=1, help="Worker threads")
+    work.add_argument("--until-empty", action="store_true", help="Exit when no job is available")
+    status = commands.add_parser("status", help="Show job counts, or one job")
+    status.add_argument("job_id", nargs="?")
+    args = parser.parse_args()
+
+    queue = get_default_queue()
+    try:
+        if args.command == "enqueue":
+            for job_id, text in zip(queue.enqueue_many(args.text), args.text):
+                print(f"📥 {job_id}: {text}")
+        elif args.command == "status":
+            print(json.dumps(queue.get(args.job_id) if args.job_id else queue.counts(), indent=2, default=str))
+        else:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                print("❌ OPENAI_API_KEY not found in .env file")
+                raise SystemExit(1)
+            from multi_layer_prompt_system import MultiLayerCalendarSystem
+
+            system = MultiLayerCalendarSystem(api_key)
+            stop = threading.Event()
+            workers = [QueueWorker(queue, system, ledger=get_default_ledger()) for _ in range(args.workers)]
+            threads = [threading.Thread(target=worker.run, args=(stop, args.until_empty)) for worker in workers]
+            print(f"👷 {len(threads)} worker(s) on {queue.path}")
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(0.5)
+            except KeyboardInterrupt:
+                print("\n👋 Stopping after the current jobs...")
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            print(f"📊 {queue.counts()}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Calendar Job Service - HTTP front end for MultiLayerCalendarSystem
+POST /jobs queues an event request and returns its job ID at once; a fixed
+worker pool runs the jobs. Clients poll GET /jobs/<id> or follow
+GET /jobs/<id>/events (server-sent events) for the same progress the GUI
+shows. Workers, queued jobs, retained jobs, events per job, open event
+streams and request bodies are all bounded, so one process serves many
+users without growing with load.
+
+Usage:
+    python job_service.py --port 8080 --workers 4
+    curl -X POST localhost:8080/jobs -d '{"text": "Dentist on August 22nd at 8am for 1 hour"}'
+    curl -N localhost:8080/jobs/<id>/events
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from metrics import PROMETHEUS_CONTENT_TYPE, get_default_registry
+from progress_events import ProgressEvent, QueueReporter
+
+# Load environment variables from .env file
+load_dotenv()
+
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_MAX_RETAINED = 1000
+DEFAULT_MAX_STREAMS = 100
+# Oldest events (mostly streamed tokens) are dropped beyond this
+MAX_EVENTS_PER_JOB = 2000
+MAX_BODY_BYTES = 64 * 1024
+# Comment line sent on idle event streams so proxies and clients keep them open
+SSE_KEEPALIVE_SECONDS = 15.0
+RECENT_LOG_LINES = 20
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobQueueFullError(RuntimeError):
+    """
+    Raised by JobManager.submit when max_queued jobs are already waiting for a worker
+    """
+
+
+class Job:
+    """
+    One event request: its state, and a bounded, numbered log of its progress events.
+    Acts as the ProgressBus for its QueueReporter; readers wait on the condition.
+    """
+
+    def __init__(self, text: str, answers: Optional[Dict[str, str]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.text = text
+        self.answers = dict(answers or {})
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Dict[str, Any] = {}
+        self.clarification_questions: List[str] = []
+        self.events: "deque[Tuple[int, ProgressEvent]]" = deque(maxlen=MAX_EVENTS_PER_JOB)
+        self.next_seq = 1
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def publish(self, event: ProgressEvent) -> None:
+        with self.changed:
+            self.events.append((self.next_seq, event))
+            self.next_seq += 1
+            if event.kind == "stage":
+                self.stage = event.message
+            elif event.kind == "finished":
+                self.result = dict(event.data or {})
+                self.status = SUCCEEDED if self.result.get("success") else FAILED
+                self.finished_at = event.timestamp
+            self.changed.notify_all()
+
+    def reporter(self) -> QueueReporter:
+        return QueueReporter(self, self.id)
+
+    def ask(self, questions: List[str]) -> Dict[str, str]:
+        """
+        Clarification answers can't be asked for mid-run: the answers sent with the job are used,
+        and the questions are kept so the client can resubmit with answers
+        """
+        with self.changed:
+            self.clarification_questions = list(questions)
+        return dict(self.answers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.changed:
+            logs = [event.message for _, event in self.events if event.kind == "log"][-RECENT_LOG_LINES:]
+            return {
+                "id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "text": self.text,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "success": self.result.get("success") if self.done else None,
+                "event_details": self.result.get("event_details"),
+                "timings": self.result.get("timings"),
+                "error": self.result.get("error"),
+                "clarification_questions": list(self.clarification_questions),
+                "recent_logs": logs,
+            }
+
+
+class JobManager:
+    """
+    Runs calendar jobs on a fixed worker pool with a bounded queue; keeps the newest finished jobs
+    """
+
+    def __init__(self, calendar_system, max_workers: int = DEFAULT_WORKERS,
+                 max_queued: int = DEFAULT_MAX_QUEUED, max_retained: int = DEFAULT_MAX_RETAINED):
+        """
+        Args:
+            calendar_system: MultiLayerCalendarSystem (anything with its create_calendar_event)
+            max_workers: Jobs running at once
+            max_queued: Jobs waiting for a worker before submit raises JobQueueFullError
+            max_retained: Jobs kept for polling; the oldest finished ones are dropped first
+        """
+        self.calendar_system = calendar_system
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="calendar-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+
+    def submit(self, text: str, answers: Optional[Dict[str, str]] = None) -> Job:
+        job = Job(text, answers)
+        with self._lock:
+            if self._count(QUEUED) >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise JobQueueFullError(f"{self.max_queued} jobs are already queued")
+            self._jobs[job.id] = job
+            self.stats["submitted"] += 1
+            self._evict()
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _evict(self) -> None:
+        excess = len(self._jobs) - self.max_retained
+        if excess > 0:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:excess]:
+                del self._jobs[job_id]
+
+    def _run(self, job: Job) -> None:
+        with job.changed:
+            job.started_at = time.time()
+            job.status = RUNNING
+        reporter = job.reporter()
+        try:
+            self.calendar_system.create_calendar_event(job.text, ask=job.ask, progress=reporter)
+        except Exception as e:
+            reporter.log(f"❌ Error: {str(e)}")
+            reporter.finished(False, {"error": str(e)})
+        if not job.done:
+            reporter.finished(False, {"error": "Job ended without a result"})
+        with self._lock:
+            self.stats["succeeded" if job.status == SUCCEEDED else "failed"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, queued=self._count(QUEUED), running=self._count(RUNNING),
+                        retained=len(self._jobs), workers=self.max_workers)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+def _sse(seq: int, event: ProgressEvent) -> bytes:
+    payload = {"kind": event.kind, "message": event.message, "data": event.data, "timestamp": event.timestamp}
+    return f"id: {seq}\nevent: {event.kind}\ndata: {json.dumps(payload, default=str)}\n\n".encode("utf-8")
+
+
+class JobServer:
+    """
+    Serves a JobManager over HTTP on a background thread
+    """
+
+    def __init__(self, manager: JobManager, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 max_streams: int = DEFAULT_MAX_STREAMS, keepalive: float = SSE_KEEPALIVE_SECONDS):
+        self.manager = manager
+        self.keepalive = keepalive
+        self._streams = threading.BoundedSemaphore(max_streams)
+        self._closing = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Slow or stalled clients can't hold a connection thread forever
+            timeout = 30
+
+            def do_POST(self):
+                server._post(self)
+
+            def do_GET(self):
+                server._get(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="job-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server.server_address[0]}:{self.port}"
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, body: Any,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        if isinstance(body, str):
+            data, content_type = body.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+        else:
+            data, content_type = json.dumps(body, default=str).encode("utf-8"), "application/json"
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _post(self, handler: BaseHTTPRequestHandler) -> None:
+        if handler.path.split("?")[0].rstrip("/") != "/jobs":
+            self._send(handler, 404, {"error": "not found"})
+            return
+        try:
+            length = int(handler.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            handler.close_connection = True
+            self._send(handler, 413, {"error": f"body must be at most {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            request = json.loads(handler.rfile.read(length) or b"{}")
+            text = request.get("text", "").strip()
+            answers = request.get("answers") or {}
+            if not text or not isinstance(answers, dict):
+                raise ValueError
+        except (ValueError, AttributeError):
+            self._send(handler, 400, {"error": 'expected JSON {"text": "...", "answers": {...}}'})
+            return
+        try:
+            job = self.manager.submit(text, {str(k): str(v) for k, v in answers.items()})
+        except JobQueueFullError as e:
+            self._send(handler, 429, {"error": str(e)}, {"Retry-After": "5"})
+            return
+        self._send(handler, 202, {"id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}",
+                                  "events_url": f"/jobs/{job.id}/events"}, {"Location": f"/jobs/{job.id}"})
+
+    def _get(self, handler: BaseHTTPRequestHandler) -> None:
+        parts = handler.path.split("?")[0].strip("/").split("/")
+        if parts == ["health"]:
+            self._send(handler, 200, self.manager.metrics())
+        elif parts == ["metrics"]:
+            self._send(handler, 200, get_default_registry().render_prometheus())
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["events"]):
+            job = self.manager.get(parts[1])
+            if job is None:
+                self._send(handler, 404, {"error": "unknown job"})
+            elif len(parts) == 2:
+                self._send(handler, 200, job.to_dict())
+            else:
+                self._stream(handler, job)
+        else:
+            self._send(handler, 404, {"error": "not found"})
+
+    def _stream(self, handler: BaseHTTPRequestHandler, job: Job) -> None:
+        """
+        Server-sent events: replays what the client hasn't seen (Last-Event-ID) and follows
+        the job until its finished event
+        """
+        if not self._streams.acquire(blocking=False):
+            self._send(handler, 503, {"error": "too many open event streams"}, {"Retry-After": "5"})
+            return
+        try:
+            try:
+                last_seq = int(handler.headers.get("Last-Event-ID", 0))
+            except ValueError:
+                last_seq = 0
+            handler.close_connection = True
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.end_headers()
+            while not self._closing.is_set():
+                with job.changed:
+                    job.changed.wait_for(lambda: job.next_seq - 1 > last_seq or job.done, timeout=self.keepalive)
+                    pending = [(seq, event) for seq, event in job.events if seq > last_seq]
+                    finished = job.done
+                if pending:
+                    handler.wfile.write(b"".join(_sse(seq, event) for seq, event in pending))
+                    last_seq = pending[-1][0]
+                elif not finished:
+                    handler.wfile.write(b": keepalive\n\n")
+                handler.wfile.flush()
+                if finished and last_seq >= job.next_seq - 1:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self._streams.release()
+
+    def close(self) -> None:
+        self._closing.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP job service for calendar event requests")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=int(os.getenv("JOB_SERVICE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs running at once")
+    parser.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED,
+                        help="Jobs waiting for a worker before new ones are rejected (429)")
+    parser.add_argument("--pipeline-mode", default="multi_call", choices=["multi_call", "single_call"])
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("❌ OPENAI_API_KEY not found in .env file")
+        raise SystemExit(1)
+
+    from multi_layer_prompt_system import MultiLayerCalendarSystem
+
+    manager = JobManager(MultiLayerCalendarSystem(api_key, pipeline_mode=args.pipeline_mode),
+                         max_workers=args.workers, max_queued=args.max_queued)
+    server = JobServer(manager, args.host, args.port)
+    print(f"🌐 Calendar job service at {server.url} ({args.workers} workers)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down...")
+    finally:
+        server.close()
+        manager.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Local Agent-S Loop - multi-step perception/action execution
+Runs screenshot -> plan -> act steps until the planner reports DONE, the goal
+check passes or max_steps is reached. Agent-S actions (pyautogui code) are
+parsed into structured actions instead of exec'd; consecutive keystrokes are
+sent as a single write() call, the screen is only re-sent to the model once
+it has changed, and settling after an action is detected from frame diffs
+instead of fixed sleeps. A failed run returns a state it can resume from.
+"""
+
+import ast
+import io
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from PIL import Image
+
+from frame_diff import FrameChangeDetector
+
+DEFAULT_MAX_STEPS = 15
+DEFAULT_SETTLE_TIMEOUT = 3.0
+DEFAULT_CHANGE_TIMEOUT = 2.0
+
+# Keys pyautogui.write() can type as characters, so they can join a keystroke batch
+WRITE_KEYS = {"enter": "\n", "return": "\n", "tab": "\t", "space": " "}
+CONTROL_ACTIONS = {"done", "fail"}
+
+Action = Dict[str, Any]
+
+
+class UnsupportedActionError(ValueError):
+    """
+    Raised when planner output contains an action the loop cannot execute
+    """
+
+
+def _literal(node: ast.AST) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError as e:
+        raise UnsupportedActionError(f"Only literal arguments are allowed: {ast.unparse(node)[:80]}") from e
+
+
+def parse_actions(code: str) -> List[Action]:
+    """
+    Converts Agent-S output (pyautogui/time code, or DONE / FAIL / WAIT) into structured actions
+    """
+    text = (code or "").strip()
+    if text.upper() in ("DONE", "FAIL", "WAIT"):
+        return [{"type": text.lower()}]
+    try:
+        tree = ast.parse(text)
+    except SyntaxError as e:
+        raise UnsupportedActionError(f"Unparseable action code: {text[:80]}") from e
+
+    actions: List[Action] = []
+    for statement in tree.body:
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            continue
+        if not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call)
+                and isinstance(statement.value.func, ast.Attribute)
+                and isinstance(statement.value.func.value, ast.Name)):
+            raise UnsupportedActionError(f"Unsupported statement: {ast.unparse(statement)[:80]}")
+        call = statement.value
+        module, function = call.func.value.id, call.func.attr
+        args = [_literal(arg) for arg in call.args]
+        kwargs = {keyword.arg: _literal(keyword.value) for keyword in call.keywords}
+
+        if module == "time" and function == "sleep":
+            actions.append({"type": "wait", "seconds": float(args[0] if args else kwargs.get("secs", 0))})
+        elif module != "pyautogui":
+            raise UnsupportedActionError(f"Unsupported call: {module}.{function}")
+        elif function in ("click", "doubleClick", "tripleClick", "rightClick"):
+            x = args[0] if args else kwargs.get("x")
+            y = args[1] if len(args) > 1 else kwargs.get("y")
+            clicks = {"doubleClick": 2, "tripleClick": 3}.get(function, kwargs.get("clicks", 1))
+            button = "right" if function == "rightClick" else kwargs.get("button", "left")
+            actions.append({"type": "click", "x": x, "y": y, "clicks": clicks, "button": button})
+        elif function in ("moveTo", "dragTo"):
+            actions.append({"type": "drag" if function == "dragTo" else "move",
+                            "x": args[0] if args else kwargs.get("x"),
+                            "y": args[1] if len(args) > 1 else kwargs.get("y")})
+        elif function in ("write", "typewrite"):
+            value = args[0] if args else kwargs.get("message")
+            if isinstance(value, list):
+                actions.extend({"type": "press", "key": key} for key in value)
+            else:
+                actions.append({"type": "type", "text": str(value)})
+        elif function == "press":
+            keys = args[0] if args else kwargs.get("keys")
+            presses = kwargs.get("presses", 1)
+            for key in (keys if isinstance(keys, list) else [keys]) * presses:
+                actions.append({"type": "press", "key": str(key)})
+        elif function == "hotkey":
+            actions.append({"type": "hotkey", "keys": [str(key) for key in args]})
+        elif function == "scroll":
+            actions.append({"type": "scroll", "amount": int(args[0] if args else kwargs.get("clicks", 0))})
+        else:
+            raise UnsupportedActionError(f"Unsupported pyautogui call: {function}")
+    return actions
+
+
+def batch_keystrokes(actions: List[Action]) -> List[Action]:
+    """
+    Merges consecutive type actions and presses of typeable keys (enter, tab, space)
+    into one type action, so they go out as one write() instead of one call per key
+    """
+    batched: List[Action] = []
+    for action in actions:
+        text = action.get("text") if action["type"] == "type" else None
+        if action["type"] == "press" and action["key"].lower() in WRITE_KEYS:
+            text = WRITE_KEYS[action["key"].lower()]
+        if text is not None and batched and batched[-1]["type"] == "type":
+            batched[-1] = {"type": "type", "text": batched[-1]["text"] + text}
+        elif text is not None:
+            batched.append({"type": "type", "text": text})
+        else:
+            batched.append(action)
+    return batched
+
+
+class PyAutoGUIDriver:
+    """
+    Executes structured actions with pyautogui on the local desktop
+    """
+
+    def __init__(self, pause: float = 0.0):
+        import pyautogui
+        self.pyautogui = pyautogui
+        # pyautogui sleeps PAUSE (0.1 s by default) after every call; settling is detected from frames instead
+        pyautogui.PAUSE = pause
+
+    def execute(self, action: Action) -> None:
+        kind = action["type"]
+        if kind == "click":
+            self.pyautogui.click(action["x"], action["y"], clicks=action.get("clicks", 1),
+                                 button=action.get("button", "left"))
+        elif kind == "move":
+            self.pyautogui.moveTo(action["x"], action["y"])
+        elif kind == "drag":
+            self.pyautogui.dragTo(action["x"], action["y"])
+        elif kind == "type":
+            self.pyautogui.write(action["text"])
+        elif kind == "press":
+            self.pyautogui.press(action["key"])
+        elif kind == "hotkey":
+            self.pyautogui.hotkey(*action["keys"])
+        elif kind == "scroll":
+            self.pyautogui.scroll(action["amount"])
+        else:
+            raise UnsupportedActionError(f"Driver cannot execute {kind}")
+
+
+class AgentSPlanner:
+    """
+    Adapts an Agent-S agent to the loop's planner interface: (instruction, frame, history) -> actions
+    """
+
+    def __init__(self, agent: Any):
+        self.agent = agent
+
+    def __call__(self, instruction: str, frame: Image.Image, history: List[Dict[str, Any]]) -> List[Action]:
+        if hasattr(self.agent, "predict"):
+            # gui_agents AgentS2-style: predict(instruction, observation) -> (info, [code, ...])
+            buffer = io.BytesIO()
+            frame.save(buffer, "PNG", compress_level=1)
+            _, codes = self.agent.predict(instruction=instruction, observation={"screenshot": buffer.getvalue()})
+        else:
+            codes = self.agent.run(screenshot=frame, instruction=instruction)
+        if isinstance(codes, str):
+            codes = [codes]
+        actions: List[Action] = []
+        for code in codes or []:
+            actions.extend(parse_actions(code))
+        return actions
+
+
+class StepRecord(NamedTuple):
+    index: int
+    actions: List[Action]
+    capture_ms: float
+    plan_ms: float
+    act_ms: float
+    settle_ms: float
+    screen_changed: bool
+
+
+class LoopState:
+    """
+    Progress of a loop run; pass it back to run() to resume after the last good step
+    """
+
+    def __init__(self, instruction: str):
+        self.instruction = instruction
+        self.steps: List[StepRecord] = []
+        self.history: List[Dict[str, Any]] = []
+
+    @property
+    def last_good_step(self) -> int:
+        return self.steps[-1].index if self.steps else 0
+
+
+class LoopResult(NamedTuple):
+    success: bool
+    reason: str
+    state: LoopState
+    seconds: float
+    # True when a step raised, i.e. running again with resume=state may still finish
+    resumable: bool = False
+
+
+class LocalAgentLoop:
+    """
+    Bounded perception/action loop around a planner, a driver and a screen capture function
+    """
+
+    def __init__(self, planner: Callable[[str, Image.Image, List[Dict[str, Any]]], List[Action]],
+                 driver: Any, capture: Callable[[], Image.Image], max_steps: int = DEFAULT_MAX_STEPS,
+                 goal_check: Optional[Callable[[Image.Image], bool]] = None,
+                 detector: Optional[FrameChangeDetector] = None,
+                 settle_timeout: float = DEFAULT_SETTLE_TIMEOUT, change_timeout: float = DEFAULT_CHANGE_TIMEOUT,
+                 poll_interval: float = 0.1):
+        """
+        Args:
+            planner: Returns the next actions for a frame (see AgentSPlanner)
+            driver: Object with execute(action) (see PyAutoGUIDriver)
+            capture: Returns the current screen as a PIL image
+            max_steps: Upper bound on planner calls per run (including resumed runs)
+            goal_check: Optional check on a fresh frame that ends the run early when the goal is visible
+            settle_timeout: Longest wait for the screen to stop changing after acting
+            change_timeout: Longest wait for an action to change the screen before re-planning anyway
+        """
+        self.planner = planner
+        self.driver = driver
+        self.capture = capture
+        self.max_steps = max_steps
+        self.goal_check = goal_check
+        self.detector = detector or FrameChangeDetector()
+        self.settle_timeout = settle_timeout
+        self.change_timeout = change_timeout
+        self.poll_interval = poll_interval
+
+    def run(self, instruction: str, resume: Optional[LoopState] = None) -> LoopResult:
+        """
+        Runs until DONE, FAIL, goal detection or max_steps. Exceptions from the planner or
+        driver end the run with success False and a state that resume can continue from.
+        """
+        state = resume or LoopState(instruction)
+        start = time.perf_counter()
+        last_sent: Optional[Image.Image] = None
+
+        while len(state.steps) < self.max_steps:
+            index = state.last_good_step + 1
+            try:
+                step_start = time.perf_counter()
+                frame = self.capture()
+                if last_sent is not None and not self.detector.differs(last_sent, frame):
+                    # The last actions have not shown up yet; don't spend a model call on the same frame
+                    frame, _ = self.detector.wait_for_change(self.capture, last_sent, self.change_timeout,
+                                                             self.poll_interval)
+                capture_ms = (time.perf_counter() - step_start) * 1000
+
+                if self.goal_check is not None and self.goal_check(frame):
+                    return LoopResult(True, "goal detected", state, time.perf_counter() - start)
+
+                plan_start = time.perf_counter()
+                actions = self.planner(instruction, frame, state.history)
+                plan_ms = (time.perf_counter() - plan_start) * 1000
+                last_sent = frame
+
+                control = next((action["type"] for action in actions if action["type"] in CONTROL_ACTIONS), None)
+                if control == "done":
+                    return LoopResult(True, "planner reported DONE", state, time.perf_counter() - start)
+                if control == "fail":
+                    return LoopResult(False, "planner reported FAIL", state, time.perf_counter() - start)
+
+                act_start = time.perf_counter()
+                # Fixed waits are dropped: the settle check below waits exactly as long as the UI needs
+                batched = batch_keystrokes([action for action in actions if action["type"] != "wait"])
+                for action in batched:
+                    self.driver.execute(action)
+                act_ms = (time.perf_counter() - act_start) * 1000
+
+                settle_start = time.perf_counter()
+                settled_frame, _ = self.detector.wait_for_settle(self.capture, self.settle_timeout,
+                                                                 self.poll_interval, stable_frames=1)
+                settle_ms = (time.perf_counter() - settle_start) * 1000
+            except Exception as e:
+                return LoopResult(False, f"step {index} failed: {e}", state, time.perf_counter() - start, True)
+
+            changed = self.detector.differs(frame, settled_frame)
+            state.steps.append(StepRecord(index, batched, capture_ms, plan_ms, act_ms, settle_ms, changed))
+            state.history.append({"step": index, "actions": batched, "screen_changed": changed})
+            print(f"   step {index}: {len(batched)} action(s), plan {plan_ms:.0f} ms, act {act_ms:.0f} ms, "
+                  f"settle {settle_ms:.0f} ms{'' if changed else ' (no visible change)'}")
+
+        return LoopResult(False, f"no result after {self.max_steps} steps", state, time.perf_counter() - start)
@@ -0,0 +1,240 @@
+"""
+Metrics - constant-memory latency histograms and a Prometheus endpoint
+Values fall into log-linear buckets (HDR-style) whose width is a fixed
+fraction of their value, so percentiles have a bounded relative error (1%
+by default) and memory depends on the value range, not the sample count.
+Histograms are labelled (operation, stage, backend, ...) and the registry
+renders them as Prometheus summaries on a local HTTP port.
+"""
+
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+DEFAULT_PRECISION = 0.01
+# Smallest distinguishable value (seconds); anything below lands in the first bucket
+DEFAULT_MIN_VALUE = 1e-5
+QUANTILES = (0.5, 0.9, 0.99)
+DEFAULT_METRICS_PORT = 9464
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class StreamingHistogram:
+    """
+    Bucketed histogram with count, sum, min, max and quantiles (relative error <= precision)
+    """
+
+    def __init__(self, precision: float = DEFAULT_PRECISION, min_value: float = DEFAULT_MIN_VALUE):
+        self.precision = precision
+        self.min_value = min_value
+        # Bucket i covers [min_value * gamma^i, min_value * gamma^(i+1))
+        self._gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_gamma)
+
+    def _representative(self, index: int) -> float:
+        # The point with equal relative distance to both bucket edges
+        return self.min_value * self._gamma ** index * 2 * self._gamma / (1 + self._gamma)
+
+    def observe(self, value: float) -> None:
+        index = self._index(value)
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Nearest-rank quantile (0 <= q <= 1); 0.0 while empty
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, math.ceil(q * self.count))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= rank:
+                    return min(self.max, max(self.min, self._representative(index)))
+            return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            count, total = self.count, self.sum
+            low, high = (self.min, self.max) if count else (0.0, 0.0)
+        summary = {"count": count, "sum": total, "mean": total / count if count else 0.0, "min": low, "max": high}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        return summary
+
+    @property
+    def bucket_count(self) -> int:
+        return len(self._buckets)
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    Named, labelled histograms and counters
+    """
+
+    def __init__(self, precision: float = DEFAULT_PRECISION):
+        self.precision = precision
+        self._histograms: Dict[str, Dict[Labels, StreamingHistogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Labels:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def histogram(self, name: str, description: str = "", **labels: Any) -> StreamingHistogram:
+        """
+        Returns (creating on first use) the histogram for name and labels
+        """
+        key = self._labels(labels)
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            if description:
+                self._help.setdefault(name, description)
+            if key not in family:
+                family[key] = StreamingHistogram(self.precision)
+            return family[key]
+
+    def observe(self, name: str, value: float, description: str = "", **labels: Any) -> None:
+        self.histogram(name, description, **labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1, description: str = "", **labels: Any) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            if description:
+                self._help.setdefault(name, description)
+            family[key] = family.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        {name: {"label=value,...": summary}} for histograms and {name: {labels: value}} for counters
+        """
+        with self._lock:
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+            counters = {name: dict(family) for name, family in self._counters.items()}
+        result: Dict[str, Dict[str, Any]] = {}
+        for name, family in histograms.items():
+            result[name] = {",".join(f"{k}={v}" for k, v in key): h.snapshot() for key, h in family.items()}
+        for name, family in counters.items():
+            result[name] = {",".join(f"{k}={v}" for k, v in key): value for key, value in family.items()}
+        return result
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus text exposition: histograms as summaries (quantiles, _sum, _count), counters as counters
+        """
+        with self._lock:
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            help_texts = dict(self._help)
+        lines = []
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+            lines.append(f"# TYPE {name} summary")
+            for key, histogram in sorted(histograms[name].items()):
+                summary = histogram.snapshot()
+                for q in QUANTILES:
+                    lines.append(f"{name}{_format_labels(key + (('quantile', str(q)),))} "
+                                 f"{summary[f'p{round(q * 100)}']:.6g}")
+                lines.append(f"{name}_sum{_format_labels(key)} {summary['sum']:.6g}")
+                lines.append(f"{name}_count{_format_labels(key)} {summary['count']}")
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves GET /metrics from a registry on a background thread
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = DEFAULT_METRICS_PORT):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server.server_address[0]}:{self.port}/metrics"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+_default_registry = MetricsRegistry()
+_default_server: Optional[MetricsServer] = None
+_server_lock = threading.Lock()
+
+
+def get_default_registry() -> MetricsRegistry:
+    return _default_registry
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1") -> MetricsServer:
+    """
+    Starts (once per process) the /metrics endpoint for the default registry; port defaults to METRICS_PORT
+    """
+    global _default_server
+    with _server_lock:
+        if _default_server is None:
+            if port is None:
+                port = int(os.getenv("METRICS_PORT", DEFAULT_METRICS_PORT))
+            _default_server = MetricsServer(_default_registry, host, port)
+            print(f"📈 Metrics at {_default_server.url}")
+        return _default_server
@@ -6,82 +6,315 @@ Layer 2: Agent-S - Executes the refined prompt via GUI automation
 
 import os
 import json
-from typing import Dict, List, Optional, Tuple
+import time
+import queue
+import threading
+import contextvars
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import openai
 from dotenv import load_dotenv
-from agent_s_interface import create_calendar_event_with_agent_s
+from agent_s_interface import create_calendar_event_with_agent_s, run_executor
+from event_parser import LocalEventParser
+from llm_cache import LLMResponseCache, get_default_cache
+from metrics import get_default_registry
+from instruction_compiler import InstructionCompiler, UnsupportedEventError
+from progress_events import ProgressReporter
+from rate_limiter import DEFAULT_COMPLETION_TOKENS, get_default_rate_limiter, get_default_single_flight, request_key
+from resilience import classify_error, get_retry_engine, retry_budget
+from tracing import SPAN_KIND_CLIENT, current_span, get_tracer
+from token_accounting import TokenUsageTracker, count_message_tokens, usage_counts
 
 # Load environment variables from .env file
 load_dotenv()
 
-class PromptEngineeringLayer:
+_DETAIL_FIELDS = ["title", "date", "time", "duration", "location"]
+
+STAGE_METRIC_HELP = "Duration of calendar pipeline stages by stage and pipeline mode"
+
+
+def observe_stage_timings(timings: Dict[str, float], pipeline: str) -> None:
     """
-    Layer 1: Handles prompt refinement and detail gathering
+    Adds one request's stage timings to the calendar_stage_seconds histograms
+    """
+    registry = get_default_registry()
+    for stage, seconds in timings.items():
+        registry.observe("calendar_stage_seconds", seconds, STAGE_METRIC_HELP, stage=stage, pipeline=pipeline)
+
+_shared_clients: Dict[str, openai.OpenAI] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_openai_client(api_key: str) -> openai.OpenAI:
+    """
+    One OpenAI client (and connection pool) per API key for the whole process.
+    Retries are left to the retry engine, which also sees rate limits and the circuit state.
+    """
+    with _shared_clients_lock:
+        if api_key not in _shared_clients:
+            _shared_clients[api_key] = openai.OpenAI(api_key=api_key, max_retries=0)
+        return _shared_clients[api_key]
+
+# JSON schema for the single-call pipeline (strict structured outputs)
+SINGLE_CALL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "calendar_event_plan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "extracted_details": {
+                    "type": "object",
+                    "properties": {field: {"type": "string"} for field in _DETAIL_FIELDS},
+                    "required": _DETAIL_FIELDS,
+                    "additionalProperties": False
+                },
+                "missing_details": {"type": "array", "items": {"type": "string"}},
+                "confidence": {"type": "number"},
+                "clarification_questions": {"type": "array", "items": {"type": "string"}},
+                "agent_s_instruction": {"type": "string"}
+            },
+            "required": [
+                "extracted_details", "missing_details", "confidence",
+                "clarification_questions", "agent_s_instruction"
+            ],
+            "additionalProperties": False
+        }
+    }
+}
+
+PIPELINE_MODES = ("multi_call", "single_call")
+
+# Receives each piece of completion text as it arrives
+TokenCallback = Callable[[str], None]
+# json_schema response formats need a model with structured-output support
+STRUCTURED_OUTPUT_MODEL = "gpt-4o"
+
+# Layer 1 system prompts are constants: identical bytes on every call give a
+# stable prefix for provider-side prompt caching. Anything that changes per
+# call (the request, the current date) goes at the end of the user message.
+ANALYSIS_SYSTEM_PROMPT = """You are a calendar event analyzer. Extract event details from the user's request, identify missing information and return JSON.
+
+Fields:
+- title: event name
+- date: YYYY-MM-DD. Resolve relative dates ("tomorrow", "next Friday") from the current date given after the request; a date without a year is its next upcoming occurrence
+- time: start time, HH:MM 24-hour ("8am" -> "08:00", "2pm" -> "14:00", "8:30am" -> "08:30")
+- duration: e.g. "1 hour", "30 minutes"
+- location: optional
+
+Return JSON with:
+- "extracted_details": object with the fields found, formatted as above
+- "missing_details": list of missing required fields (title, date, time, duration)
+- "confidence": float 0-1 for how complete the information is
+- "clarification_questions": list of specific questions for the missing fields"""
+
+REFINE_SYSTEM_PROMPT = """You are a calendar event detail refiner. Combine the initial extracted details with the user's answers into a complete event.
+
+Return a JSON object with exactly these fields:
+- "title": string
+- "date": YYYY-MM-DD (resolve relative dates from the current date given at the end)
+- "time": HH:MM 24-hour ("8am" -> "08:00", "2:30 PM" -> "14:30")
+- "duration": like "1 hour", "30 minutes"
+- "location": string, empty if not provided"""
+
+INSTRUCTION_SYSTEM_PROMPT = """You write precise step-by-step instructions for Agent-S, a GUI automation agent, to create an event in Google Calendar via Firefox.
+
+Rules:
+- Google Calendar may already be open; otherwise go to https://calendar.google.com
+- Click "Create" (or "+"); if a quick-event popup opens, click "More options"
+- Enter the title in "Add title"
+- Type the date as MM/DD/YYYY ("2025-08-22" -> "08/22/2025") and press ENTER
+- Type times as digits and press ENTER ("08:32" -> "832", "16:00" -> "1600"). The start time input is on the left, beside the date input
+- Compute the end time from the duration (default 1 hour) and set it the same way
+- Add the location and description only if given
+- Click Save, then confirm the event shows on the right day and time; if not, open it, correct it and save again
+
+Reply with numbered steps that include the actual values."""
+
+PLAN_SYSTEM_PROMPT = """You are a calendar assistant that prepares events for a GUI automation agent (Agent-S).
+In ONE response you must:
+1. Extract event details from the user's request
+2. List missing required fields and the questions to ask about them
+3. Write the final step-by-step Agent-S instruction for creating the event in Google Calendar via Firefox
+
+DATE/TIME RULES:
+- Resolve relative dates ("tomorrow", "next Friday") from the current date after the request; a date without a year is the next upcoming occurrence
+- date is YYYY-MM-DD, time is HH:MM (24-hour), duration is like "1 hour", "30 minutes"
+- Use an empty string for any detail that was not given
+
+INSTRUCTION RULES:
+- Assume Google Calendar may already be open; click "Create" or "+", fill the title, date, start and end time, location, then Save and confirm
+- Type times as digits and press ENTER ("08:32" -> "832", "16:00" -> "1600")
+- Compute the end time from the duration (default 1 hour)
+- Leave agent_s_instruction empty if title, date or time is missing
+
+Required fields: title, date, time, duration. location is optional.
+confidence is a float between 0 and 1 for how complete the information is."""
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+class PromptEngineeringBase:
+    """
+    Shared Layer 1 configuration and prompt building for the sync and async layers
     """
     
-    def __init__(self, api_key: str, model: str = "gpt-4"):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self, model: str = "gpt-4", use_fast_path: bool = True,
+                 fast_path_threshold: float = 0.75, use_cache: bool = True,
+                 cache: Optional[LLMResponseCache] = None, use_local_compiler: bool = True):
         self.model = model
         self.conversation_history = []
-        
-    def analyze_user_input(self, user_input: str) -> Dict:
-        """
-        Analyzes user input to extract event details and identify missing information
-        """
-        system_prompt = """You are a calendar event analyzer. Your job is to:
-1. Extract any event details from user input
-2. Identify what information is missing for a complete calendar event
-3. Return a structured response
-
-IMPORTANT DATE/TIME PARSING RULES:
-- Current date is January 28, 2025 (use this as reference for relative dates)
-- "August 22nd" = "2025-08-22" (always use 2025 for future dates)
-- "8am" = "08:00", "2pm" = "14:00", "8:30am" = "08:30"
-- "tomorrow" = January 29, 2025 = "2025-01-29"
-- "next Friday" = calculate the next Friday from January 28, 2025
-
-Required fields for a calendar event:
-- title: Event name/description
-- date: Specific date (YYYY-MM-DD format, use 2025 for future dates)
-- time: Start time (HH:MM format, 24-hour)
-- duration: How long the event lasts (e.g., "1 hour", "2 hours", "30 minutes")
-- location: Where the event takes place (optional)
-
-Return your analysis as JSON with:
-- "extracted_details": {dict of found information with correct date/time formatting}
-- "missing_details": [list of missing required fields]
-- "confidence": float between 0-1 for how complete the information is
-- "clarification_questions": [list of specific questions to ask user]
-
-EXAMPLES:
-- "diving event August 22nd 8am" → date: "2025-08-22", time: "08:00"
-- "meeting tomorrow at 2pm" → date: "2025-01-29", time: "14:00"
-- "gym session at 8:30am" → time: "08:30"
-"""
-
+        self.use_fast_path = use_fast_path
+        self.fast_path_threshold = fast_path_threshold
+        self.event_parser = LocalEventParser()
+        self.cache = cache if cache is not None else (get_default_cache() if use_cache else None)
+        self.use_local_compiler = use_local_compiler
+        self.instruction_compiler = InstructionCompiler()
+        self.token_usage = TokenUsageTracker()
+        # OpenAI calls retry through the shared engine (one circuit breaker for the process)
+        self.retry_engine = get_retry_engine("openai")
+        # Process-wide request/token limits and coalescing of identical in-flight requests
+        self.rate_limiter = get_default_rate_limiter()
+        self.single_flight = get_default_single_flight()
+        self.fallbacks: Dict[str, int] = {}
+    
+    def _fast_path_analysis(self, user_input: str) -> Optional[Dict]:
+        """
+        Returns the local parser's analysis if it is confident enough, otherwise None
+        """
+        if not self.use_fast_path:
+            return None
+        analysis, certainty = self.event_parser.parse(user_input)
+        if certainty < self.fast_path_threshold:
+            return None
+        print(f"⚡ Parsed locally (certainty {certainty:.0%}), skipping LLM analysis")
+        return analysis
+    
+    def _compile_instruction(self, event_details: Dict) -> Optional[str]:
+        """
+        Renders the instruction locally, or returns None if the LLM is needed
+        """
+        if not self.use_local_compiler:
+            return None
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this calendar request: {user_input}"}
-                ],
-                temperature=0.3
-            )
-            
-            # Parse the JSON response
-            analysis = json.loads(response.choices[0].message.content)
-            return analysis
-            
-        except Exception as e:
-            print(f"Error analyzing user input: {e}")
-            return {
-                "extracted_details": {},
-                "missing_details": ["title", "date", "time", "duration"],
-                "confidence": 0.0,
-                "clarification_questions": ["Could you provide more details about your calendar event?"]
-            }
+            instruction = self.instruction_compiler.compile(event_details)
+            print(f"⚡ Compiled instruction locally ({self.instruction_compiler.version})")
+            return instruction
+        except UnsupportedEventError as e:
+            print(f"↪️ Local instruction template not applicable ({e}), using LLM")
+            return None
+    
+    def _start_llm_span(self, span, stage: str, temperature: float, response_format: Optional[Dict],
+                        streamed: bool) -> None:
+        if span.recording:
+            span.set_attributes({
+                "llm.stage": stage,
+                "llm.model": self.model,
+                "llm.temperature": temperature,
+                "llm.streamed": streamed,
+                "llm.cache_hit": False,
+                "llm.structured_output": bool(response_format),
+            })
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Tokens reserved from the rate limiter before a completion is sent
+        """
+        return count_message_tokens(messages, self.model) + DEFAULT_COMPLETION_TOKENS
+
+    def _account_tokens(self, span, stage: str, messages: List[Dict[str, str]], content: str, usage: Any,
+                        reserved: int = 0) -> None:
+        """
+        Records prompt/completion tokens for a stage (API usage if reported, else counted locally)
+        and settles the rate limiter reservation against them
+        """
+        counts = usage_counts(usage, messages, content, self.model)
+        self.token_usage.record(stage, counts["prompt_tokens"], counts["completion_tokens"])
+        if reserved:
+            self.rate_limiter.adjust_tokens(counts["prompt_tokens"] + counts["completion_tokens"] - reserved)
+        if span.recording:
+            span.set_attribute("llm.prompt_tokens", counts["prompt_tokens"])
+            span.set_attribute("llm.completion_tokens", counts["completion_tokens"])
+
+    def _record_shared(self, span, stage: str) -> None:
+        """
+        Accounts a completion that was shared from a concurrent identical request (no tokens spent)
+        """
+        span.set_attribute("llm.coalesced", True)
+        self.token_usage.record(stage, 0, 0, cache_hit=True)
+
+    def _use_fallback(self, stage: str, error: Exception) -> None:
+        """
+        Reports a Layer 1 stage that failed after retries before its fallback is used.
+        Errors no fallback can fix (rejected API key) are re-raised.
+        """
+        reason = classify_error(error).reason
+        if reason == "auth":
+            raise error
+        self.fallbacks[stage] = self.fallbacks.get(stage, 0) + 1
+        current_span().set_attribute("llm.fallback", reason)
+        print(f"⚠️ Layer 1 {stage} failed ({reason}), using fallback: {error}")
+
+    @staticmethod
+    def _date_context() -> str:
+        """
+        The only per-day part of the prompts; it goes last so the prefix stays identical between calls
+        """
+        today = datetime.now().date()
+        tomorrow = today + timedelta(days=1)
+        return f"Current date: {today.strftime('%A')} {today.isoformat()} (tomorrow: {tomorrow.isoformat()})"
+    
+    def _analysis_messages(self, user_input: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Analyze this calendar request: {user_input}\n\n{self._date_context()}"}
+        ]
+    
+    def _refine_messages(self, initial_details: Dict, user_answers: Dict[str, str]) -> List[Dict[str, str]]:
+        prompt = (
+            f"Initial extracted details: {_compact_json(initial_details)}\n"
+            f"User answers to clarification questions: {_compact_json(user_answers)}\n\n"
+            f"{self._date_context()}"
+        )
+        return [
+            {"role": "system", "content": REFINE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _instruction_messages(self, event_details: Dict) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": INSTRUCTION_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Create this calendar event: {_compact_json(event_details)}"}
+        ]
+    
+    def _plan_messages(self, user_input: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Calendar request: {user_input}\n\n{self._date_context()}"}
+        ]
+    
+    @staticmethod
+    def _fallback_analysis() -> Dict:
+        return {
+            "extracted_details": {},
+            "missing_details": ["title", "date", "time", "duration"],
+            "confidence": 0.0,
+            "clarification_questions": ["Could you provide more details about your calendar event?"]
+        }
+    
+    @staticmethod
+    def _fallback_instruction(event_details: Dict) -> str:
+        return f"Create a calendar event titled '{event_details.get('title', 'New Event')}' on {event_details.get('date', 'today')} at {event_details.get('time', '12:00')}."
+    
+    @staticmethod
+    def _clean_plan(plan: Dict) -> Dict:
+        # Drop empty strings so the details look like analyze_user_input's output
+        plan["extracted_details"] = {
+            key: value for key, value in plan.get("extracted_details", {}).items() if value
+        }
+        return plan
     
     def ask_clarification_questions(self, questions: List[str]) -> Dict[str, str]:
         """
@@ -96,163 +329,434 @@ EXAMPLES:
                 answers[question] = answer.strip()
         
         return answers
+
+class PromptEngineeringLayer(PromptEngineeringBase):
+    """
+    Layer 1: Handles prompt refinement and detail gathering
+    """
     
-    def refine_event_details(self, initial_details: Dict, user_answers: Dict[str, str]) -> Dict:
+    def __init__(self, api_key: str, model: str = "gpt-4", use_fast_path: bool = True,
+                 fast_path_threshold: float = 0.75, use_cache: bool = True,
+                 cache: Optional[LLMResponseCache] = None, use_local_compiler: bool = True,
+                 on_token: Optional[TokenCallback] = None):
         """
-        Uses LLM to combine initial details with user answers into complete event info
+        on_token: If set, completions are streamed and every text delta is passed to it
         """
-        system_prompt = """You are a calendar event detail refiner. Take the initial extracted details and user answers to create a complete event specification.
+        super().__init__(model=model, use_fast_path=use_fast_path, fast_path_threshold=fast_path_threshold,
+                         use_cache=use_cache, cache=cache, use_local_compiler=use_local_compiler)
+        self.client = get_shared_openai_client(api_key)
+        self.on_token = on_token
+        
+    def stream_completion(self, messages: List[Dict[str, str]], temperature: float,
+                          response_format: Optional[Dict] = None, stage: str = "llm") -> Iterator[str]:
+        """
+        Yields the completion text incrementally. The completion runs through _chat_completion on a
+        worker thread, so the cache, rate limiter, single-flight, retries, token accounting and
+        tracing all apply; a cache hit yields the whole cached text at once.
+        """
+        pieces: "queue.Queue[Any]" = queue.Queue()
+        finished = object()
+        errors = []
 
-Return a JSON object with these exact fields:
-- "title": string
-- "date": string in YYYY-MM-DD format
-- "time": string in HH:MM format (24-hour)
-- "duration": string like "1 hour", "30 minutes", "2 hours"
-- "location": string (can be empty if not provided)
+        def run() -> None:
+            try:
+                self._chat_completion(messages, temperature, response_format=response_format,
+                                      on_token=pieces.put, stage=stage)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                pieces.put(finished)
 
-Be smart about parsing dates and times. Convert relative dates like "tomorrow", "next Friday" to actual dates.
-Convert times like "8am", "2:30 PM" to 24-hour format.
-"""
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), name="llm-stream",
+                         daemon=True).start()
+        # Held back one piece so the closing newline _chat_completion sends to callbacks is not yielded
+        pending = None
+        while True:
+            piece = pieces.get()
+            if piece is finished:
+                break
+            if pending is not None:
+                yield pending
+            pending = piece
+        if pending is not None and not (pending == "\n" and not errors):
+            yield pending
+        if errors:
+            raise errors[0]
+        
+    def _chat_completion(self, messages: List[Dict[str, str]], temperature: float,
+                         parse: Optional[Callable[[str], Any]] = None,
+                         response_format: Optional[Dict] = None,
+                         on_token: Optional[TokenCallback] = None, stage: str = "llm") -> Any:
+        """
+        Runs a chat completion through the response cache.
+        If parse is given, only responses that parse are cached, and the parsed value is returned.
+        With a token callback (on_token, else self.on_token) the completion is streamed to it,
+        followed by a closing newline. Token usage is recorded under stage.
+        """
+        on_token = on_token or self.on_token
+        with get_tracer().span("llm.chat_completion", kind=SPAN_KIND_CLIENT) as span:
+            self._start_llm_span(span, stage, temperature, response_format, streamed=on_token is not None)
+            cache_extra = {"response_format": response_format} if response_format else None
+            if self.cache is not None:
+                cached = self.cache.get(self.model, messages, temperature, cache_extra)
+                if cached is not None:
+                    try:
+                        result = parse(cached) if parse else cached
+                        span.set_attribute("llm.cache_hit", True)
+                        self.token_usage.record(stage, 0, 0, cache_hit=True)
+                        if on_token is not None:
+                            on_token(cached)
+                            on_token("\n")
+                        return result
+                    except ValueError:
+                        self.cache.invalidate(self.model, messages, temperature, cache_extra)
+            
+            request = {"model": self.model, "messages": messages, "temperature": temperature}
+            if response_format:
+                request["response_format"] = response_format
+            reserved = self._estimate_tokens(messages)
 
-        prompt = f"""
-Initial extracted details: {json.dumps(initial_details)}
-User answers to clarification questions: {json.dumps(user_answers)}
+            def call_upstream() -> Tuple[str, Any]:
+                if on_token is None:
+                    response = self.retry_engine.call(
+                        lambda: self._rate_limited(reserved, lambda: self.client.chat.completions.create(**request)))
+                    return response.choices[0].message.content, getattr(response, "usage", None)
+                usage = {}
+                emitted = []
 
-Please create a complete event specification.
-"""
+                def relay(delta: str) -> None:
+                    emitted.append(delta)
+                    on_token(delta)
+
+                # Once text reached the callback a retry would repeat it, so only retry before that
+                content = self.retry_engine.call(
+                    lambda: self._rate_limited(reserved, lambda: self._stream_to_callback(request, relay, usage)),
+                    retry_if=lambda e: not emitted)
+                return content, usage.get("usage")
+
+            (content, usage), shared = self.single_flight.do(request_key(request), call_upstream)
+            if shared:
+                self._record_shared(span, stage)
+                if on_token is not None:
+                    on_token(content)
+                    on_token("\n")
+            else:
+                self._account_tokens(span, stage, messages, content, usage, reserved)
+            result = parse(content) if parse else content
+            
+            if self.cache is not None:
+                self.cache.set(self.model, messages, temperature, content, cache_extra)
+            return result
+        
+    def _rate_limited(self, tokens: int, operation: Callable[[], Any]) -> Any:
+        """
+        Runs one attempt under the rate limiter. Every attempt reserves its own request, but only the
+        attempt that returns is settled against the reported usage, so a failed one gives its tokens back.
+        """
+        waited = self.rate_limiter.acquire(tokens)
+        if waited:
+            current_span().set_attribute("llm.rate_limit_wait_ms", waited * 1000)
+        try:
+            return operation()
+        except BaseException:
+            self.rate_limiter.adjust_tokens(-tokens)
+            raise
+        
+    def _iter_deltas(self, request: Dict, usage: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Yields streamed text; with a usage dict, asks for and stores the final token usage
+        """
+        options = {"stream_options": {"include_usage": True}} if usage is not None else {}
+        for chunk in self.client.chat.completions.create(stream=True, **options, **request):
+            if getattr(chunk, "usage", None) is not None and usage is not None:
+                usage["usage"] = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        
+    def _stream_to_callback(self, request: Dict, on_token: TokenCallback, usage: Optional[Dict] = None) -> str:
+        parts = []
+        for delta in self._iter_deltas(request, usage):
+            parts.append(delta)
+            on_token(delta)
+        on_token("\n")
+        return "".join(parts)
+        
+    def analyze_user_input(self, user_input: str, on_token: Optional[TokenCallback] = None) -> Dict:
+        """
+        Analyzes user input to extract event details and identify missing information.
+        Well-formed requests are handled by the local parser; the LLM is only
+        called when the parser is not confident in its result.
+        """
+        analysis = self._fast_path_analysis(user_input)
+        if analysis is not None:
+            return analysis
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2
+            # Parse the JSON response
+            analysis = self._chat_completion(
+                messages=self._analysis_messages(user_input),
+                temperature=0.3,
+                parse=json.loads,
+                on_token=on_token,
+                stage="analyze"
             )
+            return analysis
             
-            refined_details = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            self._use_fallback("analyze", e)
+            return self._fallback_analysis()
+    
+    def refine_event_details(self, initial_details: Dict, user_answers: Dict[str, str],
+                             on_token: Optional[TokenCallback] = None) -> Dict:
+        """
+        Uses LLM to combine initial details with user answers into complete event info
+        """
+        try:
+            refined_details = self._chat_completion(
+                messages=self._refine_messages(initial_details, user_answers),
+                temperature=0.2,
+                parse=json.loads,
+                on_token=on_token,
+                stage="refine"
+            )
             return refined_details
             
         except Exception as e:
-            print(f"Error refining event details: {e}")
+            self._use_fallback("refine", e)
             return initial_details
     
-    def generate_agent_s_instruction(self, event_details: Dict) -> str:
+    def generate_agent_s_instruction(self, event_details: Dict, on_token: Optional[TokenCallback] = None) -> str:
         """
-        Generates optimized instruction for Agent-S based on complete event details
+        Generates optimized instruction for Agent-S based on complete event details.
+        Events the local template can render skip the LLM; unusual events fall back to it.
         """
-        system_prompt = """You are an expert at creating precise instructions for GUI automation agents. 
-Create a detailed, step-by-step instruction for Agent-S to create a calendar event in Google Calendar via Firefox.
-
-CRITICAL: Pay special attention to date and time formatting:
-- Date format: If date is "2025-08-22", enter it as "August 22, 2025" or "08/22/2025"
-- Time format: If time is "08:32", type in as "832" and press ENTER. If the time is "16:00", type in "1600" and press ENTER.
-- Detials on setting the time: The start time can be set by clicking on the input box on the left, beside the day indicating input.
-- Duration: If duration is "2 hours", set end time accordingly (e.g., 8:00 AM to 10:00 AM)
-
-The instruction should be:
-1. Specific and actionable
-2. Include all necessary details with correct date/time formatting
-3. Handle potential UI variations
-4. Include confirmation steps
-
-Format: Clear, sequential steps that a GUI automation agent can follow.
-"""
-
-        prompt = f"""
-Create an Agent-S instruction to create this calendar event:
-{json.dumps(event_details, indent=2)}
-
-IMPORTANT: Make sure to format the date and time correctly for Google Calendar:
-- Convert date from YYYY-MM-DD to a human-readable format
-- Convert time from 24-hour to 12-hour format if needed
-- Calculate end time based on duration
-
-The agent should:
-1. Navigate to Google Calendar (assume already open)
-2. Click "Create" or "+" button
-3. Enter the title: "{event_details.get('title', 'New Event')}"
-4. Set the date correctly: {event_details.get('date', 'today')}
-5. Set the time correctly: {event_details.get('time', '12:00')}
-6. Set duration: {event_details.get('duration', '1 hour')}
-7. Add location if provided: {event_details.get('location', '')}
-8. Save the event
-9. Confirm the event was created successfully
-"""
+        instruction = self._compile_instruction(event_details)
+        if instruction is not None:
+            return instruction
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
+            return self._chat_completion(
+                messages=self._instruction_messages(event_details),
+                temperature=0.1,
+                on_token=on_token,
+                stage="generate"
             )
             
-            return response.choices[0].message.content
+        except Exception as e:
+            self._use_fallback("generate", e)
+            return self._fallback_instruction(event_details)
+
+    def analyze_and_instruct(self, user_input: str, on_token: Optional[TokenCallback] = None) -> Dict:
+        """
+        Single structured-output call that returns the analysis and the Agent-S instruction together.
+        The result has the analyze_user_input keys plus "agent_s_instruction".
+        """
+        analysis = self._fast_path_analysis(user_input)
+        if analysis is not None:
+            # The instruction is compiled later from the final details
+            return dict(analysis, agent_s_instruction="")
+        
+        try:
+            plan = self._chat_completion(
+                messages=self._plan_messages(user_input),
+                temperature=0.2,
+                parse=json.loads,
+                response_format=SINGLE_CALL_RESPONSE_FORMAT,
+                on_token=on_token,
+                stage="plan"
+            )
+            return self._clean_plan(plan)
             
         except Exception as e:
-            print(f"Error generating Agent-S instruction: {e}")
-            return f"Create a calendar event titled '{event_details.get('title', 'New Event')}' on {event_details.get('date', 'today')} at {event_details.get('time', '12:00')}."
+            self._use_fallback("plan", e)
+            return dict(self._fallback_analysis(), agent_s_instruction="")
 
 class MultiLayerCalendarSystem:
     """
     Main system that orchestrates the two-layer approach
     """
     
-    def __init__(self, openai_api_key: str):
-        self.prompt_engineer = PromptEngineeringLayer(openai_api_key)
+    def __init__(self, openai_api_key: str, pipeline_mode: str = "multi_call", model: Optional[str] = None,
+                 on_token: Optional[TokenCallback] = None, executor: Optional[Callable[[str], Any]] = None,
+                 use_cache: bool = True):
+        """
+        Args:
+            openai_api_key: OpenAI API key for Layer 1
+            pipeline_mode: "multi_call" (analyze → refine → generate) or
+                "single_call" (one structured-output request for the whole of Layer 1)
+            model: Layer 1 model; defaults to gpt-4, or gpt-4o in single_call mode
+            on_token: Receives Layer 1 LLM output as it streams (e.g. to print it live)
+            executor: Layer 2 function that takes the Agent-S instruction, or a
+                CalendarExecutor (which also gets the event details);
+                defaults to create_calendar_event_with_agent_s
+            use_cache: Whether Layer 1 uses the shared LLM response cache
+        """
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"pipeline_mode must be one of {PIPELINE_MODES}")
+        if model is None:
+            model = STRUCTURED_OUTPUT_MODEL if pipeline_mode == "single_call" else "gpt-4"
+        self.prompt_engineer = PromptEngineeringLayer(openai_api_key, model=model, on_token=on_token,
+                                                      use_cache=use_cache)
+        self.pipeline_mode = pipeline_mode
+        self.executor = executor
+        self.last_timings: Dict[str, float] = {}
         
-    def create_calendar_event(self, user_input: str) -> bool:
+    def prepare_event(self, user_input: str,
+                      ask: Optional[Callable[[List[str]], Dict[str, str]]] = None,
+                      progress: Optional[ProgressReporter] = None) -> Tuple[Dict, str]:
         """
-        Main method that handles the complete flow from user input to event creation
+        Runs Layer 1 and returns (event_details, agent_s_instruction).
+        ask answers clarification questions; defaults to asking on the terminal.
+        progress receives log lines, stages and streamed tokens; defaults to printing.
         """
-        print(f"🎯 Processing request: {user_input}")
-        print("=" * 50)
+        progress = progress or ProgressReporter()
+        with get_tracer().span("calendar.prepare_event") as span, retry_budget():
+            self._start_request_span(span, progress)
+            event_details, agent_s_instruction, self.last_timings = self._run_layer1(user_input, ask, progress)
+        return event_details, agent_s_instruction
+        
+    def _start_request_span(self, span, progress: ProgressReporter) -> None:
+        if span.recording:
+            span.set_attribute("pipeline.mode", self.pipeline_mode)
+            # Ties the trace to the front end's request ID (e.g. the GUI's) when there is one
+            span.set_attribute("request.id", getattr(progress, "request_id", None) or span.trace_id)
+        
+    def _run_layer1(self, user_input: str, ask: Optional[Callable[[List[str]], Dict[str, str]]],
+                    progress: ProgressReporter) -> Tuple[Dict, str, Dict[str, float]]:
+        ask = ask or self.prompt_engineer.ask_clarification_questions
+        on_token = progress.token
+        tracer = get_tracer()
+        timings: Dict[str, float] = {}
+        layer_start = time.perf_counter()
         
         # Layer 1: Analyze and refine the prompt
-        print("🧠 Layer 1: Analyzing your request...")
-        analysis = self.prompt_engineer.analyze_user_input(user_input)
+        progress.stage("analyze")
+        progress.log("🧠 Layer 1: Analyzing your request...")
+        stage_start = time.perf_counter()
+        with tracer.span("layer1.analyze") as span:
+            if self.pipeline_mode == "single_call":
+                analysis = self.prompt_engineer.analyze_and_instruct(user_input, on_token=on_token)
+            else:
+                analysis = self.prompt_engineer.analyze_user_input(user_input, on_token=on_token)
+            span.set_attribute("analysis.confidence", float(analysis['confidence']))
+        timings["analyze"] = time.perf_counter() - stage_start
         
-        print(f"📊 Confidence level: {analysis['confidence']:.1%}")
-        print(f"📝 Extracted details: {analysis['extracted_details']}")
+        progress.log(f"📊 Confidence level: {analysis['confidence']:.1%}")
+        progress.log(f"📝 Extracted details: {analysis['extracted_details']}")
         
         # If we need more information, ask for it
+        agent_s_instruction = analysis.get("agent_s_instruction", "")
         if analysis['confidence'] < 0.8 and analysis['clarification_questions']:
-            print(f"❓ Missing information: {analysis['missing_details']}")
-            user_answers = self.prompt_engineer.ask_clarification_questions(
-                analysis['clarification_questions']
-            )
+            progress.log(f"❓ Missing information: {analysis['missing_details']}")
+            user_answers = ask(analysis['clarification_questions'])
             
             # Refine the details with user answers
-            print("🔄 Refining event details...")
-            event_details = self.prompt_engineer.refine_event_details(
-                analysis['extracted_details'], 
-                user_answers
-            )
+            progress.stage("refine")
+            progress.log("🔄 Refining event details...")
+            stage_start = time.perf_counter()
+            with tracer.span("layer1.refine"):
+                event_details = self.prompt_engineer.refine_event_details(
+                    analysis['extracted_details'], 
+                    user_answers,
+                    on_token=on_token
+                )
+            timings["refine"] = time.perf_counter() - stage_start
+            # The single-call instruction was written before the answers, so regenerate it
+            agent_s_instruction = ""
         else:
             event_details = analysis['extracted_details']
         
-        print(f"✅ Final event details: {json.dumps(event_details, indent=2)}")
+        progress.log(f"✅ Final event details: {json.dumps(event_details, indent=2)}")
         
         # Generate optimized instruction for Agent-S
-        print("🎨 Generating optimized instruction for Agent-S...")
-        agent_s_instruction = self.prompt_engineer.generate_agent_s_instruction(event_details)
+        if not agent_s_instruction:
+            progress.stage("generate")
+            progress.log("🎨 Generating optimized instruction for Agent-S...")
+            stage_start = time.perf_counter()
+            with tracer.span("layer1.generate"):
+                agent_s_instruction = self.prompt_engineer.generate_agent_s_instruction(event_details, on_token=on_token)
+            timings["generate"] = time.perf_counter() - stage_start
         
-        print(f"🤖 Agent-S Instruction:\n{agent_s_instruction}")
-        print("=" * 50)
+        timings["layer1_total"] = time.perf_counter() - layer_start
+        observe_stage_timings(timings, self.pipeline_mode)
+        progress.log(f"🤖 Agent-S Instruction:\n{agent_s_instruction}")
+        return event_details, agent_s_instruction, timings
         
-        # Layer 2: Execute with Agent-S
-        print("🚀 Layer 2: Executing with Agent-S...")
-        try:
-            create_calendar_event_with_agent_s(agent_s_instruction)
-            print("✅ Calendar event creation completed!")
-            return True
-        except Exception as e:
-            print(f"❌ Error during Agent-S execution: {e}")
-            return False
+    def create_calendar_event(self, user_input: str,
+                              ask: Optional[Callable[[List[str]], Dict[str, str]]] = None,
+                              progress: Optional[ProgressReporter] = None) -> bool:
+        """
+        Main method that handles the complete flow from user input to event creation.
+        Safe to call from several threads at once when each call has its own progress reporter.
+        """
+        progress = progress or ProgressReporter()
+        tracer = get_tracer()
+        # All Layer 1 calls of one request share a retry budget
+        with tracer.span("calendar.create_event") as request_span, retry_budget():
+            self._start_request_span(request_span, progress)
+            progress.log(f"🎯 Processing request: {user_input}")
+            progress.log("=" * 50)
+            
+            # Timings stay local until the end so concurrent requests don't overwrite each other's
+            event_details, agent_s_instruction, timings = self._run_layer1(user_input, ask, progress)
+            progress.log("=" * 50)
+            
+            # Layer 2: Execute with Agent-S
+            progress.stage("execute")
+            progress.log("🚀 Layer 2: Executing with Agent-S...")
+            stage_start = time.perf_counter()
+            success = False
+            with tracer.span("layer2.execute") as span:
+                try:
+                    executor = self.executor or create_calendar_event_with_agent_s
+                    run_executor(executor, agent_s_instruction, event_details)
+                    progress.log("✅ Calendar event creation completed!")
+                    success = True
+                except Exception as e:
+                    span.record_exception(e)
+                    progress.log(f"❌ Error during Agent-S execution: {e}")
+                finally:
+                    timings["execute"] = time.perf_counter() - stage_start
+                    observe_stage_timings({"execute": timings["execute"]}, self.pipeline_mode)
+                    self.last_timings = timings
+                    progress.finished(success, {"event_details": event_details, "timings": timings})
+            request_span.set_status(success)
+            return success
+
+def compare_pipeline_modes(openai_api_key: str, test_inputs: List[str], runs: int = 1) -> Dict[str, Dict[str, float]]:
+    """
+    Measures Layer 1 latency and prompt/completion tokens per request of the multi-call
+    and single-call pipelines on the same inputs.
+    Clarification questions are left unanswered and nothing is sent to Layer 2.
+    The response cache is disabled so every run reaches the API.
+    """
+    results = {}
+    for mode in PIPELINE_MODES:
+        system = MultiLayerCalendarSystem(openai_api_key, pipeline_mode=mode)
+        system.prompt_engineer.cache = None
+        latencies = []
+        for _ in range(runs):
+            for user_input in test_inputs:
+                system.prepare_event(user_input, ask=lambda questions: {})
+                latencies.append(system.last_timings["layer1_total"])
+        latencies.sort()
+        tokens = system.prompt_engineer.token_usage.report()["all"]
+        results[mode] = {
+            "requests": len(latencies),
+            "mean_seconds": sum(latencies) / len(latencies) if latencies else 0.0,
+            "median_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+            "max_seconds": latencies[-1] if latencies else 0.0,
+            "prompt_tokens_per_request": tokens["prompt_tokens"] / len(latencies) if latencies else 0.0,
+            "completion_tokens_per_request": tokens["completion_tokens"] / len(latencies) if latencies else 0.0,
+        }
+    
+    print("\n⏱️ Layer 1 latency by pipeline mode:")
+    for mode, stats in results.items():
+        print(f"   {mode:12s} mean {stats['mean_seconds']:.2f}s  median {stats['median_seconds']:.2f}s  "
+              f"max {stats['max_seconds']:.2f}s  ({stats['requests']} requests)  "
+              f"tokens/request {stats['prompt_tokens_per_request']:.0f} in / "
+              f"{stats['completion_tokens_per_request']:.0f} out")
+    return results
 
 def main():
     """
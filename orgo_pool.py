@@ -0,0 +1,358 @@
+"""
+Orgo Computer Pool
+Keeps Orgo computers connected and warm between requests instead of
+building a new Computer (and paying the connect/boot cost) every time.
+Computers are leased per request, health-checked before reuse and stopped
+after sitting idle.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from orgo import Computer
+    ORGO_AVAILABLE = True
+except ImportError:
+    ORGO_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROJECT_ID = "computer-ppgg5d6j"
+UNHEALTHY_STATUSES = {"stopped", "error", "terminated", "deleted", "failed"}
+
+
+class PoolExhaustedError(TimeoutError):
+    """
+    Raised when no computer becomes available before the lease timeout
+    """
+
+
+def load_project_id(config_path: str = os.path.join(".orgo", "project.json")) -> str:
+    """
+    Reads the Orgo project ID from .orgo/project.json, falling back to the default project
+    """
+    try:
+        with open(config_path, "r") as f:
+            return json.load(f).get("project_id") or DEFAULT_PROJECT_ID
+    except (FileNotFoundError, json.JSONDecodeError):
+        return DEFAULT_PROJECT_ID
+
+
+class PooledComputer:
+    """
+    Bookkeeping for one computer in the pool
+    """
+
+    def __init__(self, computer: Any, project_id: Optional[str]):
+        self.computer = computer
+        self.project_id = project_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.last_health_check = self.created_at
+        self.lease_count = 0
+        self.leased = False
+
+
+class ComputerPool:
+    """
+    Thread-safe pool of warm Orgo computers
+    """
+
+    def __init__(self, project_ids: Optional[List[str]] = None, min_size: int = 1, max_size: int = 1,
+                 idle_timeout: float = 600.0, health_check_interval: float = 60.0,
+                 lease_timeout: float = 300.0, api_key: Optional[str] = None,
+                 factory: Optional[Callable[[Optional[str]], Any]] = None):
+        """
+        Args:
+            project_ids: Existing Orgo projects to connect to; they are used before new computers are created
+            min_size: Computers kept warm even when idle (pre-started by warm_up)
+            max_size: Upper bound on computers; beyond len(project_ids) new computers are created
+            idle_timeout: Seconds an idle computer above min_size is kept before it is stopped and evicted
+            health_check_interval: Seconds between status checks of an idle computer
+            lease_timeout: Default seconds lease() waits for a free computer
+            api_key: Orgo API key (defaults to ORGO_API_KEY)
+            factory: Builds a computer for a project ID (None means a new computer); defaults to orgo.Computer
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 1 <= max_size and min_size <= max_size")
+        self.project_ids = list(project_ids or [])
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.lease_timeout = lease_timeout
+        self.api_key = api_key
+        self.factory = factory or self._default_factory
+
+        self._entries: List[PooledComputer] = []
+        self._creating = 0
+        self._reserved_project_ids = set()
+        self._condition = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {
+            "created": 0, "evicted": 0, "health_failures": 0,
+            "leases": 0, "lease_wait_seconds": 0.0,
+        }
+
+    def _default_factory(self, project_id: Optional[str]) -> Any:
+        if not ORGO_AVAILABLE:
+            raise RuntimeError("Orgo is not installed. Install it with: pip install orgo")
+        if project_id:
+            return Computer(project_id=project_id, api_key=self.api_key)
+        return Computer(api_key=self.api_key)
+
+    def _next_project_id(self) -> Optional[str]:
+        in_use = {entry.project_id for entry in self._entries} | self._reserved_project_ids
+        for project_id in self.project_ids:
+            if project_id not in in_use:
+                return project_id
+        return None
+
+    def _create_entry(self, leased: bool) -> PooledComputer:
+        """
+        Creates a computer outside the lock and adds it to the pool.
+        The caller must already have reserved a slot by incrementing _creating.
+        """
+        with self._condition:
+            project_id = self._next_project_id()
+            self._reserved_project_ids.add(project_id)
+        try:
+            computer = self.factory(project_id)
+            entry = PooledComputer(computer, project_id)
+            entry.leased = leased
+        finally:
+            with self._condition:
+                self._reserved_project_ids.discard(project_id)
+                self._creating -= 1
+                self._condition.notify()
+        with self._condition:
+            self._entries.append(entry)
+            self._stats["created"] += 1
+            self._condition.notify()
+        logger.info(f"Pool created computer for {project_id or 'a new project'}")
+        return entry
+
+    def warm_up(self, count: Optional[int] = None, start: bool = True) -> None:
+        """
+        Pre-creates computers (min_size by default) so the first requests don't pay for connecting
+        """
+        target = min(self.max_size, count if count is not None else self.min_size)
+        while True:
+            with self._condition:
+                if len(self._entries) + self._creating >= target:
+                    break
+                self._creating += 1
+            entry = self._create_entry(leased=True)
+            if start and hasattr(entry.computer, "start"):
+                try:
+                    entry.computer.start()
+                except Exception as e:
+                    logger.warning(f"Could not start computer during warm-up: {e}")
+            self.release(entry)
+
+    def _is_healthy(self, entry: PooledComputer) -> bool:
+        if time.time() - entry.last_health_check < self.health_check_interval:
+            return True
+        entry.last_health_check = time.time()
+        if not hasattr(entry.computer, "status"):
+            return True
+        try:
+            status = entry.computer.status()
+        except Exception as e:
+            logger.warning(f"Health check failed for {entry.project_id}: {e}")
+            return False
+        state = str(status.get("status", "")).lower() if isinstance(status, dict) else ""
+        if state in UNHEALTHY_STATUSES:
+            # A stopped computer can usually be started again instead of replaced
+            try:
+                entry.computer.start()
+                return True
+            except Exception as e:
+                logger.warning(f"Could not restart {entry.project_id}: {e}")
+                return False
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledComputer:
+        """
+        Takes a healthy idle computer, creating one if the pool has room.
+        Prefer the lease() context manager, which always releases.
+        """
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        wait_start = time.time()
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Computer pool is closed")
+                idle = [entry for entry in self._entries if not entry.leased]
+                entry = max(idle, key=lambda e: e.last_used) if idle else None
+                if entry is not None:
+                    entry.leased = True
+                elif len(self._entries) + self._creating < self.max_size:
+                    self._creating += 1
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(f"No Orgo computer available after {timeout:.0f}s")
+                    self._condition.wait(remaining)
+                    continue
+
+            if entry is None:
+                entry = self._create_entry(leased=True)
+            elif not self._is_healthy(entry):
+                self._discard(entry)
+                continue
+
+            with self._condition:
+                entry.lease_count += 1
+                self._stats["leases"] += 1
+                self._stats["lease_wait_seconds"] += time.time() - wait_start
+            return entry
+
+    def release(self, entry: PooledComputer, healthy: bool = True) -> None:
+        """
+        Returns a computer to the pool; unhealthy computers are dropped
+        """
+        if not healthy:
+            self._discard(entry)
+            return
+        with self._condition:
+            entry.leased = False
+            entry.last_used = time.time()
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Context manager yielding a warm computer for the duration of one request
+        """
+        entry = self.acquire(timeout)
+        try:
+            yield entry.computer
+        except Exception:
+            # Force a status check before the computer is handed out again
+            entry.last_health_check = 0
+            raise
+        finally:
+            self.release(entry)
+
+    def _discard(self, entry: PooledComputer) -> None:
+        with self._condition:
+            if entry in self._entries:
+                self._entries.remove(entry)
+            self._stats["health_failures"] += 1
+            self._condition.notify()
+        logger.info(f"Pool discarded unhealthy computer {entry.project_id}")
+        # Best effort: an unreachable computer may still be running and billing
+        if hasattr(entry.computer, "stop"):
+            try:
+                entry.computer.stop()
+            except Exception as e:
+                logger.warning(f"Could not stop discarded computer {entry.project_id}: {e}")
+
+    def evict_idle(self) -> int:
+        """
+        Stops and removes computers above min_size that have been idle longer than idle_timeout
+        """
+        now = time.time()
+        with self._condition:
+            idle = sorted(
+                (e for e in self._entries if not e.leased and now - e.last_used > self.idle_timeout),
+                key=lambda e: e.last_used,
+            )
+            removable = max(0, len(self._entries) - self.min_size)
+            victims = idle[:removable]
+            for entry in victims:
+                self._entries.remove(entry)
+            self._stats["evicted"] += len(victims)
+
+        for entry in victims:
+            if hasattr(entry.computer, "stop"):
+                try:
+                    entry.computer.stop()
+                except Exception as e:
+                    logger.warning(f"Could not stop idle computer {entry.project_id}: {e}")
+        return len(victims)
+
+    def start_reaper(self, interval: float = 30.0) -> None:
+        """
+        Starts a daemon thread that periodically evicts idle computers
+        """
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while not self._closed:
+                time.sleep(interval)
+                if not self._closed:
+                    self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="orgo-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns pool size, utilisation and lifetime counters
+        """
+        with self._condition:
+            leased = sum(1 for e in self._entries if e.leased)
+            leases = self._stats["leases"]
+            return {
+                "size": len(self._entries),
+                "leased": leased,
+                "idle": len(self._entries) - leased,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "created": self._stats["created"],
+                "evicted": self._stats["evicted"],
+                "health_failures": self._stats["health_failures"],
+                "leases": leases,
+                "average_lease_wait": self._stats["lease_wait_seconds"] / leases if leases else 0.0,
+            }
+
+    def close(self, stop_computers: bool = False) -> None:
+        """
+        Closes the pool; optionally stops every computer it holds
+        """
+        with self._condition:
+            self._closed = True
+            entries = list(self._entries)
+            self._entries.clear()
+            self._condition.notify_all()
+        if stop_computers:
+            for entry in entries:
+                try:
+                    entry.computer.stop()
+                except Exception as e:
+                    logger.warning(f"Could not stop computer {entry.project_id}: {e}")
+
+
+_default_pool: Optional[ComputerPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool(api_key: Optional[str] = None) -> ComputerPool:
+    """
+    Returns the process-wide pool for the project in .orgo/project.json.
+    Sizes come from ORGO_POOL_MIN_SIZE / ORGO_POOL_MAX_SIZE / ORGO_POOL_IDLE_TIMEOUT.
+    api_key only applies when the pool is first created.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ComputerPool(
+                project_ids=[load_project_id()],
+                min_size=int(os.getenv("ORGO_POOL_MIN_SIZE", "1")),
+                max_size=int(os.getenv("ORGO_POOL_MAX_SIZE", "1")),
+                idle_timeout=float(os.getenv("ORGO_POOL_IDLE_TIMEOUT", "600")),
+                api_key=api_key,
+            )
+            _default_pool.start_reaper()
+        return _default_pool
@@ -5,22 +5,36 @@ This script implements various optimizations to improve the agent's performance.
 
 import os
 import time
+import queue
 import logging
-from typing import Optional, Dict, Any
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator, List
 from functools import lru_cache
 from dotenv import load_dotenv
-from orgo import Computer
+from orgo_pool import ComputerPool, PooledComputer, PoolExhaustedError, get_default_pool, load_project_id
+from frame_diff import FrameChangeDetector
+from metrics import StreamingHistogram, get_default_registry, start_metrics_server
+from execution_ledger import ExecutionLedger, canonical_event_key, get_default_ledger
+from resilience import RetryEngine
+from tracing import get_tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+OPERATION_METRIC_HELP = "Duration of Orgo operations by operation, backend and outcome"
+
 class OptimizedCalendarAgent:
     """
     Optimized version of the calendar agent with performance improvements.
     """
     
-    def __init__(self, project_id: str, use_cache: bool = True, max_retries: int = 3):
+    def __init__(self, project_id: str, use_cache: bool = True, max_retries: int = 3,
+                 num_computers: int = 1, project_ids: Optional[List[str]] = None,
+                 computers: Optional[List[Any]] = None, ledger: Optional[ExecutionLedger] = None,
+                 pool: Optional[ComputerPool] = None):
         """
         Initialize the optimized agent.
         
@@ -28,20 +42,84 @@ class OptimizedCalendarAgent:
             project_id: Orgo project ID
             use_cache: Whether to use caching for repeated operations
             max_retries: Maximum number of retries for failed operations
+            num_computers: Number of Orgo computers used by batch_operations. The first
+                one is project_id; the others are new computers unless project_ids is given.
+            project_ids: Explicit Orgo project IDs, one computer each (overrides num_computers)
+            computers: Ready-made Computer-like objects (overrides both of the above)
+            pool: Shared pool to lease computers from for each prompt or batch, so other users of
+                the pool aren't blocked between calls; defaults to the process-wide pool for a single
+                computer of the default project, else the agent creates its own pool and holds its
+                computers until close()
+            ledger: Execution ledger; when set, optimized_prompt runs each event (given by its
+                event_details) at most once
         """
         load_dotenv()
         self.project_id = project_id
         self.use_cache = use_cache
         self.max_retries = max_retries
-        self.computer = Computer(project_id=project_id)
+        self.pool = pool
+        self._owns_pool = False
+        self._leases: List[PooledComputer] = []
+        if computers is None:
+            size = len(project_ids) if project_ids else num_computers
+            if self.pool is None and size == 1 and project_id == load_project_id():
+                self.pool = get_default_pool()
+            elif self.pool is None:
+                self.pool = ComputerPool(project_ids=project_ids or [project_id], max_size=size)
+                self._owns_pool = True
+                self._leases = [self.pool.acquire() for _ in range(size)]
+            computers = [entry.computer for entry in self._leases]
+        # Empty when computers are leased from a shared pool per call
+        self.computers = computers
+        self.computer = self.computers[0] if self.computers else None
         self.last_screenshot_time = 0
-        self.screenshot_cooldown = 1.0  # Minimum time between screenshots
+        self.screenshot_cooldown = 0.0  # Minimum time between screenshots; change detection does the filtering
+        self.change_detector = FrameChangeDetector()
+        self.ledger = ledger
+        # Shares the process-wide Orgo circuit breaker
+        self.retry_engine = RetryEngine("orgo", max_attempts=max_retries)
         
-        # Performance metrics
-        self.operation_times = []
+        # Performance metrics (updated from batch worker threads)
+        self._metrics_lock = threading.Lock()
+        # Constant-memory latency distribution of successful operations (seconds)
+        self.operation_latency = StreamingHistogram()
         self.success_count = 0
         self.failure_count = 0
         
+    @contextmanager
+    def _leased_computers(self, count: int) -> Iterator[List[Any]]:
+        """
+        Yields up to count computers: the agent's own, or ones leased from the shared pool for this
+        call only. Only the first lease waits; the rest are taken if the pool has them free.
+        """
+        if self.computers:
+            yield self.computers[:count]
+            return
+        leases = [self.pool.acquire()]
+        try:
+            while len(leases) < min(count, self.pool.max_size):
+                try:
+                    leases.append(self.pool.acquire(timeout=0))
+                except PoolExhaustedError:
+                    break
+            yield [entry.computer for entry in leases]
+        except Exception:
+            # Force a status check before the computers are handed out again, like ComputerPool.lease
+            for entry in leases:
+                entry.last_health_check = 0
+            raise
+        finally:
+            for entry in leases:
+                self.pool.release(entry)
+
+    @contextmanager
+    def _computer(self, computer: Optional[Any] = None) -> Iterator[Any]:
+        if computer is not None:
+            yield computer
+            return
+        with self._leased_computers(1) as computers:
+            yield computers[0]
+
     @lru_cache(maxsize=100)
     def cached_prompt(self, prompt: str) -> str:
         """
@@ -49,50 +127,81 @@ class OptimizedCalendarAgent:
         """
         return prompt
     
-    def smart_screenshot(self) -> None:
+    def smart_screenshot(self, computer: Optional[Any] = None) -> Optional[Any]:
         """
-        Take screenshots only when necessary to reduce overhead.
+        Take a screenshot and return it only if the screen changed since the last
+        returned one, so an unchanged frame is not sent to the model again.
+        Returns None when nothing changed (or within screenshot_cooldown).
         """
         current_time = time.time()
-        if current_time - self.last_screenshot_time >= self.screenshot_cooldown:
-            # Take screenshot logic here
-            self.last_screenshot_time = current_time
-            logger.info("Screenshot taken")
-        else:
+        if current_time - self.last_screenshot_time < self.screenshot_cooldown:
             logger.info("Skipping screenshot - too soon since last one")
+            return None
+        self.last_screenshot_time = current_time
+        with self._computer(computer) as computer:
+            image = computer.screenshot()
+        if self.change_detector.is_new(image):
+            logger.info("Screenshot taken - screen changed")
+            return image
+        logger.info("Skipping screenshot - screen unchanged")
+        return None
+
+    def wait_for_settle(self, computer: Optional[Any] = None, timeout: float = 5.0) -> Any:
+        """
+        Wait until consecutive screenshots stop changing (e.g. after a click) instead of a fixed sleep.
+        """
+        with self._computer(computer) as computer:
+            image, settled = self.change_detector.wait_for_settle(computer.screenshot, timeout=timeout)
+        if not settled:
+            logger.warning(f"Screen still changing after {timeout:.1f}s")
+        return image
     
-    def retry_operation(self, operation_func, *args, **kwargs) -> Any:
+    def retry_operation(self, operation_func, *args, retry_if=None, idempotent=True, **kwargs) -> Any:
         """
-        Retry failed operations with exponential backoff.
+        Retry failed operations through the agent's retry engine: fatal errors are not retried,
+        waits use decorrelated jitter and honour Retry-After, and the Orgo circuit breaker applies.
+        retry_if(exception) -> bool can veto a retry; idempotent=False stops retries after timeouts.
         """
-        for attempt in range(self.max_retries):
-            try:
+        name = getattr(operation_func, "__name__", "operation")
+        with get_tracer().span("orgo.operation", {"operation": name}) as span:
+            attempts = 0
+
+            def attempt() -> Any:
+                nonlocal attempts
+                attempts += 1
+                span.set_attribute("retries", attempts - 1)
                 start_time = time.time()
-                result = operation_func(*args, **kwargs)
+                try:
+                    result = operation_func(*args, **kwargs)
+                except Exception as e:
+                    with self._metrics_lock:
+                        self.failure_count += 1
+                    get_default_registry().observe("calendar_operation_seconds", time.time() - start_time,
+                                                   OPERATION_METRIC_HELP, operation=name, backend="orgo",
+                                                   outcome="failure")
+                    logger.warning(f"Operation failed on attempt {attempts}: {e}")
+                    raise
                 operation_time = time.time() - start_time
-                
-                self.operation_times.append(operation_time)
-                self.success_count += 1
-                
-                logger.info(f"Operation successful on attempt {attempt + 1} in {operation_time:.2f}s")
+                self.operation_latency.observe(operation_time)
+                get_default_registry().observe("calendar_operation_seconds", operation_time, OPERATION_METRIC_HELP,
+                                               operation=name, backend="orgo", outcome="success")
+                with self._metrics_lock:
+                    self.success_count += 1
+                logger.info(f"Operation successful on attempt {attempts} in {operation_time:.2f}s")
                 return result
-                
-            except Exception as e:
-                self.failure_count += 1
-                wait_time = 2 ** attempt  # Exponential backoff
-                
-                logger.warning(f"Operation failed on attempt {attempt + 1}: {e}")
-                logger.info(f"Retrying in {wait_time} seconds...")
-                
-                if attempt < self.max_retries - 1:
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"Operation failed after {self.max_retries} attempts")
-                    raise
+
+            try:
+                return self.retry_engine.call(attempt, idempotent=idempotent, retry_if=retry_if)
+            except Exception:
+                logger.error(f"Operation failed after {attempts} attempt(s)")
+                raise
     
-    def optimized_prompt(self, prompt: str) -> str:
+    def optimized_prompt(self, prompt: str, computer: Optional[Any] = None,
+                         event_details: Optional[Dict[str, Any]] = None) -> str:
         """
         Optimized prompt with caching and retry logic.
+        With a ledger, a prompt that creates an event (event_details given) returns the earlier
+        result when that event was already created; other prompts (reads, checks) always run.
         """
         if self.use_cache:
             cached_prompt = self.cached_prompt(prompt)
@@ -100,50 +209,133 @@ class OptimizedCalendarAgent:
                 logger.info("Using cached prompt")
                 return cached_prompt
         
-        return self.retry_operation(self.computer.prompt, prompt)
+        with self._computer(computer) as computer:
+            # A prompt creates the event, so a timed-out one is not re-run (it may have saved it)
+            if self.ledger is None or not event_details:
+                return self.retry_operation(computer.prompt, prompt, idempotent=False)
+            key = canonical_event_key(event_details)
+            return self.ledger.run_once(key, lambda: self.retry_operation(computer.prompt, prompt, idempotent=False),
+                                        details=event_details)
     
-    def batch_operations(self, operations: list) -> list:
+    def batch_operations(self, operations: list, max_concurrency: Optional[int] = None) -> list:
         """
-        Batch multiple calendar operations for efficiency.
+        Run multiple calendar operations in parallel across the agent's computers.
+        
+        Each computer gets its own work queue (filled round-robin) and one worker
+        thread; a worker whose queue is empty steals from the others. Results come
+        back in input order with the original keys plus "duration" and "computer".
+        
+        Args:
+            operations: Prompts to execute
+            max_concurrency: Maximum number of computers used at once (default: all)
         """
-        results = []
-        for operation in operations:
-            try:
-                result = self.optimized_prompt(operation)
-                results.append({"operation": operation, "result": result, "status": "success"})
-            except Exception as e:
-                results.append({"operation": operation, "result": str(e), "status": "failed"})
+        if not operations:
+            return []
+        
+        with self._leased_computers(min(len(operations), max_concurrency or len(operations))) as computers:
+            return self._run_batch(operations, computers)
+
+    def _run_batch(self, operations: list, computers: List[Any]) -> list:
+        worker_count = min(len(computers), len(operations))
+        work_queues = [queue.Queue() for _ in range(worker_count)]
+        for index, operation in enumerate(operations):
+            work_queues[index % worker_count].put((index, operation))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        
+        def next_item(worker_index: int):
+            # Own queue first, then steal from the others so a slow VM doesn't hold up the batch
+            for offset in range(worker_count):
+                try:
+                    return work_queues[(worker_index + offset) % worker_count].get_nowait()
+                except queue.Empty:
+                    continue
+            return None
+        
+        def worker(worker_index: int):
+            computer = computers[worker_index]
+            while True:
+                item = next_item(worker_index)
+                if item is None:
+                    return
+                index, operation = item
+                start_time = time.time()
+                try:
+                    result = self.optimized_prompt(operation, computer=computer)
+                    entry = {"operation": operation, "result": result, "status": "success"}
+                except Exception as e:
+                    entry = {"operation": operation, "result": str(e), "status": "failed"}
+                entry["duration"] = time.time() - start_time
+                entry["computer"] = worker_index
+                results[index] = entry
+        
+        logger.info(f"Running {len(operations)} operations on {worker_count} computer(s)")
+        # New threads start with empty contextvars; give each worker a copy of the caller's so its
+        # spans join the caller's trace and the retry budget applies
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(worker, i), name=f"batch-worker-{i}",
+                             daemon=True)
+            for i in range(worker_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
         
         return results
     
+    def close(self) -> None:
+        """
+        Closes a pool the agent created itself and stops the computers it started for new projects
+        (num_computers > 1). Computers from a shared pool are already back in it after each call.
+        """
+        leases, self._leases = self._leases, []
+        if not self._owns_pool:
+            return
+        for entry in leases:
+            if entry.project_id is None:
+                try:
+                    entry.computer.stop()
+                except Exception as e:
+                    logger.warning(f"Could not stop computer: {e}")
+        self.pool.close()
+
     def get_performance_metrics(self) -> Dict[str, Any]:
         """
-        Get performance metrics for monitoring.
+        Get performance metrics for monitoring, including p50/p90/p99 operation latency.
         """
-        if not self.operation_times:
+        with self._metrics_lock:
+            success_count = self.success_count
+            failure_count = self.failure_count
+        latency = self.operation_latency.snapshot()
+        
+        if not latency["count"]:
             return {
                 "total_operations": 0,
                 "success_rate": 0,
                 "average_time": 0,
                 "success_count": 0,
-                "failure_count": 0
+                "failure_count": 0,
+                "retries": self.retry_engine.metrics()
             }
         
-        total_operations = self.success_count + self.failure_count
-        success_rate = self.success_count / total_operations if total_operations > 0 else 0
-        average_time = sum(self.operation_times) / len(self.operation_times)
+        total_operations = success_count + failure_count
+        success_rate = success_count / total_operations if total_operations > 0 else 0
         
         return {
             "total_operations": total_operations,
             "success_rate": success_rate,
-            "average_time": average_time,
-            "success_count": self.success_count,
-            "failure_count": self.failure_count,
-            "min_time": min(self.operation_times),
-            "max_time": max(self.operation_times)
+            "average_time": latency["mean"],
+            "success_count": success_count,
+            "failure_count": failure_count,
+            "min_time": latency["min"],
+            "max_time": latency["max"],
+            "p50_time": latency["p50"],
+            "p90_time": latency["p90"],
+            "p99_time": latency["p99"],
+            "retries": self.retry_engine.metrics()
         }
 
-def create_optimized_agent(project_id: Optional[str] = None) -> OptimizedCalendarAgent:
+def create_optimized_agent(project_id: Optional[str] = None, num_computers: int = 1) -> OptimizedCalendarAgent:
     """
     Factory function to create an optimized agent.
     """
@@ -157,37 +349,42 @@ def create_optimized_agent(project_id: Optional[str] = None) -> OptimizedCalenda
         except FileNotFoundError:
             raise ValueError("Could not find .orgo/project.json. Please provide project_id manually.")
     
-    return OptimizedCalendarAgent(project_id=project_id)
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server()
+    return OptimizedCalendarAgent(project_id=project_id, num_computers=num_computers, ledger=get_default_ledger())
 
 # Example usage
 if __name__ == "__main__":
     # Create optimized agent
     agent = create_optimized_agent()
     
-    # Test single operation
-    print("Testing single operation...")
     try:
-        result = agent.optimized_prompt("Create a test event for tomorrow at 2pm")
-        print(f"Result: {result}")
-    except Exception as e:
-        print(f"Error: {e}")
+        # Test single operation
+        print("Testing single operation...")
+        try:
+            result = agent.optimized_prompt("Create a test event for tomorrow at 2pm")
+            print(f"Result: {result}")
+        except Exception as e:
+            print(f"Error: {e}")
     
-    # Test batch operations
-    print("\nTesting batch operations...")
-    operations = [
-        "Create a meeting with John tomorrow at 10am",
-        "Find my next event",
-        "Schedule a lunch meeting on Friday at 12pm"
-    ]
+        # Test batch operations
+        print("\nTesting batch operations...")
+        operations = [
+            "Create a meeting with John tomorrow at 10am",
+            "Find my next event",
+            "Schedule a lunch meeting on Friday at 12pm"
+        ]
     
-    results = agent.batch_operations(operations)
-    for result in results:
-        print(f"Operation: {result['operation']}")
-        print(f"Status: {result['status']}")
-        print(f"Result: {result['result']}\n")
+        results = agent.batch_operations(operations)
+        for result in results:
+            print(f"Operation: {result['operation']}")
+            print(f"Status: {result['status']} ({result['duration']:.1f}s on computer {result['computer']})")
+            print(f"Result: {result['result']}\n")
     
-    # Print performance metrics
-    metrics = agent.get_performance_metrics()
-    print("Performance Metrics:")
-    for key, value in metrics.items():
-        print(f"  {key}: {value}") 
\ No newline at end of file
+        # Print performance metrics
+        metrics = agent.get_performance_metrics()
+        print("Performance Metrics:")
+        for key, value in metrics.items():
+            print(f"  {key}: {value}") 
+    finally:
+        agent.close()
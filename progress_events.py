@@ -0,0 +1,93 @@
+"""
+Progress Events
+Structured progress channel between the calendar system and its front ends.
+Workers publish events to a thread-safe queue; the GUI drains it on the Tk
+thread, so output is live and concurrent requests stay separate without
+redirecting sys.stdout.
+"""
+
+import queue
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class ProgressEvent(NamedTuple):
+    """
+    One progress update for a request
+    kind is "log", "token", "stage" or "finished"
+    """
+    request_id: str
+    kind: str
+    message: str = ""
+    data: Optional[Dict[str, Any]] = None
+    timestamp: float = 0.0
+
+
+class ProgressReporter:
+    """
+    Default reporter: prints log lines to the terminal, ignores the rest.
+    token is None so the LLM layer keeps its own streaming setting.
+    """
+
+    token = None
+
+    def log(self, message: str) -> None:
+        print(message)
+
+    def stage(self, name: str) -> None:
+        pass
+
+    def finished(self, success: bool, data: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+
+class QueueReporter(ProgressReporter):
+    """
+    Publishes a single request's progress to a ProgressBus
+    """
+
+    def __init__(self, bus: "ProgressBus", request_id: str):
+        self.bus = bus
+        self.request_id = request_id
+
+    def _publish(self, kind: str, message: str = "", data: Optional[Dict[str, Any]] = None) -> None:
+        self.bus.publish(ProgressEvent(self.request_id, kind, message, data, time.time()))
+
+    def log(self, message: str) -> None:
+        self._publish("log", message)
+
+    def token(self, text: str) -> None:
+        self._publish("token", text)
+
+    def stage(self, name: str) -> None:
+        self._publish("stage", name)
+
+    def finished(self, success: bool, data: Optional[Dict[str, Any]] = None) -> None:
+        self._publish("finished", "success" if success else "failure", dict(data or {}, success=success))
+
+
+class ProgressBus:
+    """
+    Thread-safe event queue; any thread publishes, one consumer drains
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[ProgressEvent]" = queue.Queue()
+
+    def publish(self, event: ProgressEvent) -> None:
+        self._queue.put(event)
+
+    def reporter(self, request_id: str) -> QueueReporter:
+        return QueueReporter(self, request_id)
+
+    def drain(self, max_events: Optional[int] = None) -> List[ProgressEvent]:
+        """
+        Returns the queued events without blocking (at most max_events)
+        """
+        events = []
+        while max_events is None or len(events) < max_events:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
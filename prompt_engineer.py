@@ -6,7 +6,7 @@ This file is kept for backward compatibility
 
 import datetime
 import os
-from agent_s_interface import create_calendar_event_with_agent_s
+from agent_s_interface import create_calendar_event_or_none
 from multi_layer_prompt_system import MultiLayerCalendarSystem
 
 def get_event_details_from_user():
@@ -86,7 +86,7 @@ if __name__ == "__main__":
         if title and date and time and duration:
             agent_s_instruction = generate_agent_s_instruction(title, date, time, duration, location)
             if agent_s_instruction:
-                create_calendar_event_with_agent_s(agent_s_instruction)
+                create_calendar_event_or_none(agent_s_instruction)
             else:
                 print("Could not generate Agent-S instruction. Please provide all required details.")
         else:
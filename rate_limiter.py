@@ -0,0 +1,290 @@
+"""
+Rate Limiter - shared OpenAI request/token budgets and single-flight calls
+Every Layer 1 completion reserves one request and its estimated tokens from
+token buckets refilled at the configured requests / tokens per minute, and
+waits until the reservation is covered, so bursts from the GUI, terminal
+runners and batch jobs are smoothed out instead of hitting 429s. With a
+state file the buckets are shared between processes (file-locked).
+SingleFlight lets concurrent identical requests share one upstream call.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 150000
+# Completions have no max_tokens, so this much is reserved up front and settled from the reported usage
+DEFAULT_COMPLETION_TOKENS = 300
+
+
+class RateLimitTimeout(RuntimeError):
+    """
+    Raised when a reservation would have to wait longer than max_wait
+    """
+
+
+class TokenBucket:
+    """
+    Bucket holding up to one minute of capacity. Reservations may drive it negative;
+    the debt is the wait before the reservation is covered, which keeps callers in order.
+    """
+
+    def __init__(self, per_minute: float, level: Optional[float] = None, updated: float = 0.0):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity if level is None else level
+        self.updated = updated
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Takes amount (capped at the capacity) and returns the seconds until it is covered
+        """
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level) / self.rate
+
+    def adjust(self, amount: float, now: float) -> None:
+        """
+        Takes (positive) or returns (negative) tokens, e.g. estimated vs. reported usage
+        """
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits (0 disables a limit)
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE, state_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            requests_per_minute: Request limit (bucket size and refill per minute)
+            tokens_per_minute: Prompt + completion token limit
+            state_path: JSON file for sharing the buckets between processes (needs fcntl; without
+                it the limiter is per process)
+            clock: Wall clock; shared state needs a clock that agrees between processes
+        """
+        self.limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.state_path = state_path if FCNTL_AVAILABLE else None
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {name: TokenBucket(limit, updated=clock()) for name, limit in self.limits.items() if limit > 0}
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "timeouts": 0}
+        if self.state_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, TokenBucket]]:
+        """
+        Buckets under the process lock, or loaded from and saved to the state file under an flock
+        """
+        with self._lock:
+            if not self.state_path:
+                yield self._buckets
+                return
+            with open(self.state_path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    try:
+                        with open(self.state_path) as f:
+                            saved = json.load(f)
+                    except (FileNotFoundError, ValueError):
+                        saved = {}
+                    buckets = {}
+                    for name, limit in self.limits.items():
+                        if limit <= 0:
+                            continue
+                        level, updated = saved.get(name, (None, self.clock()))
+                        buckets[name] = TokenBucket(limit, level, updated)
+                    yield buckets
+                    temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+                    with open(temp_path, "w") as f:
+                        json.dump({name: [bucket.level, bucket.updated] for name, bucket in buckets.items()}, f)
+                    os.replace(temp_path, self.state_path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reserve(self, tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """
+        Reserves one request and tokens; returns how long the caller must wait before sending.
+        Raises RateLimitTimeout (and releases the reservation) if that is longer than max_wait.
+        """
+        amounts = {"requests": 1, "tokens": tokens}
+        with self._state() as buckets:
+            now = self.clock()
+            wait = max((bucket.reserve(amounts[name], now) for name, bucket in buckets.items()), default=0.0)
+            if max_wait is not None and wait > max_wait:
+                for name, bucket in buckets.items():
+                    bucket.adjust(-min(amounts[name], bucket.capacity), now)
+        with self._lock:
+            if max_wait is not None and wait > max_wait:
+                self.stats["timeouts"] += 1
+                raise RateLimitTimeout(f"OpenAI rate limit: would wait {wait:.1f}s (max {max_wait:.1f}s)")
+            self.stats["acquired"] += 1
+            if wait > 0:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += wait
+        return wait
+
+    def acquire(self, tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """
+        Blocks until one request and tokens are available; returns the seconds waited
+        """
+        wait = self.reserve(tokens, max_wait)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """
+        acquire() for coroutines; waits with asyncio.sleep
+        """
+        # reserve() takes a thread lock and, with a state file, an flock, so it runs off the event loop
+        wait = await asyncio.to_thread(self.reserve, tokens, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def adjust_tokens(self, tokens: int) -> None:
+        """
+        Settles a reservation: positive if the call used more tokens than reserved, negative if fewer
+        """
+        if tokens and "tokens" in self.limits and self.limits["tokens"] > 0:
+            with self._state() as buckets:
+                buckets["tokens"].adjust(tokens, self.clock())
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, limits=dict(self.limits))
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """
+    Identity of a completion request for single-flight coalescing
+    """
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# Result a cancelled ado() leader hands its followers so that one of them re-runs the call
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; concurrent callers with the same key wait for it and share
+    its result (or its exception)
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[Tuple[int, str], "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def do(self, key: str, operation: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns (result, shared); shared is True if another caller's call produced the result
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self.stats["leaders" if leader else "shared"] += 1
+        if not leader:
+            return future.result(), True
+        try:
+            result = operation()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False
+
+    async def ado(self, key: str, operation: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        do() for coroutine functions; calls are shared between tasks of the same event loop.
+        If the leading task is cancelled its followers are not: one of them runs the call instead.
+        """
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._async_calls.get(slot)
+                leader = future is None
+                if leader:
+                    future = self._async_calls[slot] = loop.create_future()
+                self.stats["leaders" if leader else "shared"] += 1
+            if leader:
+                break
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result, True
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            # The cancellation belongs to the leading task only; wake the followers to take over
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an exception nobody else waited for is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._async_calls[slot]
+        return result, False
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_single_flight = SingleFlight()
+_default_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """
+    Process-wide OpenAI limiter from OPENAI_REQUESTS_PER_MINUTE / OPENAI_TOKENS_PER_MINUTE
+    (0 disables a limit); OPENAI_RATE_LIMIT_STATE shares it between processes
+    """
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+                float(os.getenv("OPENAI_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE)),
+                state_path=os.getenv("OPENAI_RATE_LIMIT_STATE") or None,
+            )
+        return _default_limiter
+
+
+def get_default_single_flight() -> SingleFlight:
+    return _default_single_flight
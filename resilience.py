@@ -0,0 +1,484 @@
+"""
+Resilience - shared retry engine for upstream calls (OpenAI, Orgo)
+Classifies errors as retryable or fatal, honours rate-limit / Retry-After
+hints, waits with decorrelated jitter, draws retries from a per-request
+budget and trips a circuit breaker per upstream after repeated failures.
+Calls can block (call), be awaited (acall) or run in the background with
+retries scheduled on a timer instead of a sleeping thread (submit).
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, NamedTuple, Optional
+
+from execution_ledger import is_ambiguous_failure
+from tracing import current_span
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+DEFAULT_BUDGET_SECONDS = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Orgo wraps HTTP errors as Exception("API error: <status> ...")
+_STATUS_PATTERN = re.compile(r"\b(?:API error|status|HTTP)[: ]+(\d{3})\b", re.I)
+FATAL_TYPES = (ValueError, TypeError, KeyError, NotImplementedError, PermissionError)
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open
+    """
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} is unavailable (circuit open, next probe in {retry_in:.0f}s)")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+class ErrorClass(NamedTuple):
+    retryable: bool
+    reason: str
+    status: Optional[int] = None
+    retry_after: Optional[float] = None
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    seen = set()
+    while error is not None and id(error) not in seen and len(seen) < 5:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    for candidate in _error_chain(error):
+        for value in (getattr(candidate, "status_code", None), getattr(candidate, "status", None),
+                      getattr(getattr(candidate, "response", None), "status_code", None)):
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        match = _STATUS_PATTERN.search(str(candidate))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Server wait hint from the error: a retry_after attribute, or Retry-After / retry-after-ms headers
+    """
+    for candidate in _error_chain(error):
+        value = getattr(candidate, "retry_after", None)
+        if isinstance(value, (int, float)):
+            return max(0.0, float(value))
+        headers = getattr(getattr(candidate, "response", None), "headers", None)
+        if not headers:
+            continue
+        try:
+            if headers.get("retry-after-ms"):
+                return max(0.0, float(headers["retry-after-ms"]) / 1000)
+            header = headers.get("retry-after")
+            if header:
+                try:
+                    return max(0.0, float(header))
+                except ValueError:
+                    moment = email.utils.parsedate_to_datetime(header)
+                    return max(0.0, moment.timestamp() - time.time())
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def classify_error(error: BaseException, idempotent: bool = True) -> ErrorClass:
+    """
+    Decides whether an error is worth retrying. Non-idempotent calls (e.g. an Orgo prompt that
+    creates an event) are not retried after ambiguous failures such as timeouts.
+    """
+    if isinstance(error, CircuitOpenError):
+        return ErrorClass(False, "circuit_open", retry_after=error.retry_in)
+    status = _status_of(error)
+    if status is not None:
+        if status == 429:
+            return ErrorClass(True, "rate_limited", status, retry_after_seconds(error))
+        if status in RETRYABLE_STATUSES or status >= 500:
+            return ErrorClass(True, "server_error", status, retry_after_seconds(error))
+        return ErrorClass(False, "auth" if status in (401, 403) else "client_error", status)
+    if is_ambiguous_failure(error):
+        return ErrorClass(idempotent, "timeout" if idempotent else "ambiguous")
+    names = " ".join(type(candidate).__name__ for candidate in _error_chain(error))
+    if isinstance(error, ConnectionError) or "Connection" in names:
+        return ErrorClass(True, "connection")
+    if isinstance(error, FATAL_TYPES):
+        return ErrorClass(False, "invalid")
+    return ErrorClass(True, "unknown")
+
+
+class RetryBudget:
+    """
+    Retries and seconds one request may spend across all of its upstream calls
+    """
+
+    def __init__(self, max_retries: int = 4, max_seconds: float = DEFAULT_BUDGET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_retries = max_retries
+        self.deadline = clock() + max_seconds
+        self.clock = clock
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.deadline - self.clock())
+
+    def try_spend(self, delay: float) -> bool:
+        """
+        Takes one retry if one is left and the wait still ends before the deadline
+        """
+        with self._lock:
+            if self.retries >= self.max_retries or self.clock() + delay > self.deadline:
+                return False
+            self.retries += 1
+            return True
+
+
+_current_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(max_retries: int = 4, max_seconds: float = DEFAULT_BUDGET_SECONDS) -> Iterator[RetryBudget]:
+    """
+    Shares one RetryBudget between every retried call inside the block (threads and tasks started
+    from it inherit the context)
+    """
+    budget = RetryBudget(max_retries, max_seconds)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive retryable failures; after reset_timeout
+    one probe call is let through (half-open) and its outcome closes or re-opens the circuit
+    """
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raises CircuitOpenError while the circuit is open (or a half-open probe is already running).
+        Returns True when this call is the half-open probe; the caller must then record its outcome
+        or release_probe().
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            retry_in = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == "open" and retry_in <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            raise CircuitOpenError(self.name, max(0.0, retry_in))
+
+    def release_probe(self) -> None:
+        """
+        Ends a probe that finished without an outcome (cancelled or interrupted), so the next call probes
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = self.clock()
+            self._probe_in_flight = False
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures, "trips": self.trips}
+
+
+class _RetryScheduler:
+    """
+    One timer thread for the delayed attempts of submit(), so waiting retries don't hold threads
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retry-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            callback()
+
+
+_scheduler = _RetryScheduler()
+
+
+class RetryEngine:
+    """
+    Runs calls to one upstream with classification, jittered backoff, budgets and a circuit breaker
+    """
+
+    def __init__(self, upstream: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 budget_seconds: float = DEFAULT_BUDGET_SECONDS, breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        """
+        Args:
+            upstream: Name used for the circuit breaker and in metrics ("openai", "orgo")
+            max_attempts: Attempts per call, including the first
+            base_delay: Smallest wait between attempts, in seconds
+            max_delay: Largest jittered wait (a longer Retry-After is still honoured within the budget)
+            budget_seconds: Time budget for a call made outside a retry_budget block
+            breaker: Circuit breaker (default: the process-wide one for upstream)
+            sleep: Blocking sleep used by call()
+        """
+        self.upstream = upstream
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_seconds = budget_seconds
+        self.breaker = breaker or get_circuit_breaker(upstream)
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.decisions = {"calls": 0, "success": 0, "retry": 0, "retry_after": 0, "fatal": 0,
+                          "attempts_exhausted": 0, "budget_exhausted": 0, "circuit_open": 0}
+
+    def _count(self, decision: str) -> None:
+        with self._lock:
+            self.decisions[decision] += 1
+
+    def _next_delay(self, previous: float, hint: Optional[float]) -> float:
+        # Decorrelated jitter: spreads out callers that failed together
+        delay = min(self.max_delay, self.rng.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+        if hint is not None and hint > delay:
+            self._count("retry_after")
+            return hint
+        return delay
+
+    def _decide(self, error: BaseException, attempt: int, previous_delay: float, budget: RetryBudget,
+                idempotent: bool, retry_if: Optional[Callable[[BaseException], bool]]) -> Optional[float]:
+        """
+        Records the failed attempt and returns the wait before the next one, or None to give up
+        """
+        error_class = classify_error(error, idempotent)
+        if error_class.reason == "circuit_open":
+            self._count("circuit_open")
+            return None
+        if error_class.retryable:
+            self.breaker.record_failure()
+        else:
+            # The upstream answered; a bad request says nothing about its health
+            self.breaker.record_success()
+        current_span().set_attributes({"retry.upstream": self.upstream, "retry.attempts": attempt,
+                                       "retry.last_error": error_class.reason})
+        if not error_class.retryable or (retry_if is not None and not retry_if(error)):
+            self._count("fatal")
+            return None
+        if attempt >= self.max_attempts:
+            self._count("attempts_exhausted")
+            return None
+        delay = self._next_delay(previous_delay, error_class.retry_after)
+        if not budget.try_spend(delay):
+            self._count("budget_exhausted")
+            return None
+        self._count("retry")
+        return delay
+
+    def _budget(self) -> RetryBudget:
+        return _current_budget.get() or RetryBudget(self.max_attempts, self.budget_seconds)
+
+    def call(self, operation: Callable[[], Any], idempotent: bool = True,
+             retry_if: Optional[Callable[[BaseException], bool]] = None) -> Any:
+        """
+        Calls operation() until it succeeds or the error is fatal / attempts or budget run out,
+        then re-raises the last error. retry_if can veto retrying a particular error.
+        """
+        self._count("calls")
+        budget = self._budget()
+        delay = self.base_delay
+        for attempt in itertools.count(1):
+            probe = False
+            try:
+                probe = self.breaker.before_call()
+                result = operation()
+            except Exception as e:
+                probe = False  # _decide records the outcome, which ends the probe
+                delay = self._decide(e, attempt, delay, budget, idempotent, retry_if)
+                if delay is None:
+                    raise
+                self.sleep(delay)
+                continue
+            else:
+                probe = False
+                self.breaker.record_success()
+            finally:
+                if probe:
+                    # Interrupted mid-probe: nothing was learned, so don't leave the circuit stuck half-open
+                    self.breaker.release_probe()
+            self._count("success")
+            return result
+
+    async def acall(self, operation: Callable[[], Awaitable[Any]], idempotent: bool = True,
+                    retry_if: Optional[Callable[[BaseException], bool]] = None) -> Any:
+        """
+        call() for coroutine functions; waits with asyncio.sleep so the event loop keeps running
+        """
+        self._count("calls")
+        budget = self._budget()
+        delay = self.base_delay
+        for attempt in itertools.count(1):
+            probe = False
+            try:
+                probe = self.breaker.before_call()
+                result = await operation()
+            except Exception as e:
+                probe = False  # _decide records the outcome, which ends the probe
+                delay = self._decide(e, attempt, delay, budget, idempotent, retry_if)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            else:
+                probe = False
+                self.breaker.record_success()
+            finally:
+                if probe:
+                    # Cancelled mid-probe: nothing was learned, so don't leave the circuit stuck half-open
+                    self.breaker.release_probe()
+            self._count("success")
+            return result
+
+    def submit(self, operation: Callable[[], Any], executor: Optional[ThreadPoolExecutor] = None,
+               idempotent: bool = True, retry_if: Optional[Callable[[BaseException], bool]] = None) -> Future:
+        """
+        Non-blocking call(): attempts run on executor (default: a new thread each) and waits between
+        them are timers, so no thread sleeps. Returns a Future with the result or the last error.
+        """
+        self._count("calls")
+        future: Future = Future()
+        context = contextvars.copy_context()
+        budget = context.run(self._budget)
+        state = {"attempt": 0, "delay": self.base_delay}
+
+        def attempt() -> None:
+            state["attempt"] += 1
+            probe = False
+            try:
+                probe = self.breaker.before_call()
+                result = context.copy().run(operation)
+            except Exception as e:
+                delay = self._decide(e, state["attempt"], state["delay"], budget, idempotent, retry_if)
+                if delay is None:
+                    future.set_exception(e)
+                else:
+                    state["delay"] = delay
+                    _scheduler.call_later(delay, start)
+                return
+            except BaseException as e:
+                if probe:
+                    self.breaker.release_probe()
+                future.set_exception(e)
+                raise
+            self.breaker.record_success()
+            self._count("success")
+            future.set_result(result)
+
+        def start() -> None:
+            if executor is not None:
+                executor.submit(attempt)
+            else:
+                threading.Thread(target=attempt, name=f"{self.upstream}-attempt", daemon=True).start()
+
+        start()
+        return future
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            decisions = dict(self.decisions)
+        return {"decisions": decisions, "circuit": self.breaker.metrics()}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_engines: Dict[str, RetryEngine] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    """
+    Process-wide circuit breaker for an upstream
+    """
+    with _registry_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream)
+        return _breakers[upstream]
+
+
+def get_retry_engine(upstream: str) -> RetryEngine:
+    """
+    Process-wide retry engine for an upstream (shares its circuit breaker)
+    """
+    breaker = get_circuit_breaker(upstream)
+    with _registry_lock:
+        if upstream not in _engines:
+            _engines[upstream] = RetryEngine(upstream, breaker=breaker)
+        return _engines[upstream]
+
+
+def resilience_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Retry decisions and circuit state of the process-wide engines, by upstream
+    """
+    with _registry_lock:
+        engines = dict(_engines)
+    return {upstream: engine.metrics() for upstream, engine in engines.items()}
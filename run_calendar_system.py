@@ -48,7 +48,10 @@ def run_terminal_version():
     from multi_layer_prompt_system import MultiLayerCalendarSystem
     
     api_key = os.getenv("OPENAI_API_KEY")
-    calendar_system = MultiLayerCalendarSystem(api_key)
+    # Print Layer 1 output as it streams instead of waiting for whole completions
+    calendar_system = MultiLayerCalendarSystem(
+        api_key, on_token=lambda token: print(token, end="", flush=True)
+    )
     
     print("🎉 Multi-Layer Calendar System Ready!")
     print("Type 'quit' to exit\n")
@@ -5,9 +5,8 @@ This script runs the complete system on your Orgo virtual desktop
 """
 
 import os
-import json
 from dotenv import load_dotenv
-from orgo import Computer
+from orgo_pool import get_default_pool, load_project_id
 
 # Load environment variables
 load_dotenv()
@@ -20,21 +19,15 @@ def setup_orgo_computer():
         return None
     
     # Read project ID from .orgo/project.json if it exists
-    project_id = None
-    try:
-        with open('.orgo/project.json', 'r') as f:
-            config = json.load(f)
-            project_id = config.get('project_id')
-    except FileNotFoundError:
-        # Use the project ID from your URL
-        project_id = "computer-ppgg5d6j"
-    
+    project_id = load_project_id()
     print(f"🌐 Connecting to Orgo project: {project_id}")
     
     try:
-        computer = Computer(project_id=project_id)
+        # Warm the shared pool so the demo and Layer 2 reuse the same connected computer
+        pool = get_default_pool(api_key=orgo_api_key)
+        pool.warm_up(start=False)
         print("✅ Connected to Orgo successfully!")
-        return computer
+        return pool
     except Exception as e:
         print(f"❌ Failed to connect to Orgo: {e}")
         return None
@@ -45,8 +38,8 @@ def run_complete_demo_on_orgo():
     print("=" * 50)
     
     # Setup Orgo
-    computer = setup_orgo_computer()
-    if not computer:
+    pool = setup_orgo_computer()
+    if not pool:
         return False
     
     # Import our multi-layer system
@@ -100,7 +93,8 @@ def run_complete_demo_on_orgo():
         print("🌐 You can watch the automation at: https://www.orgo.ai/projects/computer-ppgg5d6j")
         
         try:
-            result = computer.prompt(orgo_instruction)
+            with pool.lease() as computer:
+                result = computer.prompt(orgo_instruction)
             print(f"✅ Orgo Execution Result: {result}")
             return True
         except Exception as e:
@@ -116,8 +110,8 @@ def run_interactive_orgo_session():
     print("=" * 40)
     
     # Setup
-    computer = setup_orgo_computer()
-    if not computer:
+    pool = setup_orgo_computer()
+    if not pool:
         return
     
     from multi_layer_prompt_system import MultiLayerCalendarSystem
@@ -164,7 +158,8 @@ def run_interactive_orgo_session():
                 
                 # Layer 2: Execute
                 print("🚀 Executing on Orgo...")
-                result = computer.prompt(orgo_instruction)
+                with pool.lease() as computer:
+                    result = computer.prompt(orgo_instruction)
                 print(f"✅ Result: {result}")
                 print()
                 
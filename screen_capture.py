@@ -0,0 +1,192 @@
+"""
+Screen Capture Service for the local Agent-S path
+Keeps one mss grabber per thread instead of opening mss() for every
+screenshot, grabs only the configured region (e.g. the browser window),
+converts BGRA straight into a PIL image without the per-pixel RGB copy,
+downscales it for the vision model and encodes PNG/JPEG on a background
+worker that reuses its output buffer.
+"""
+
+import base64
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from PIL import Image
+
+try:
+    from mss import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+
+DEFAULT_MAX_WIDTH = 1280
+DEFAULT_FORMAT = "PNG"
+DEFAULT_JPEG_QUALITY = 80
+
+
+class Frame:
+    """
+    One captured screenshot; the encoded bytes are produced in the background
+    """
+
+    def __init__(self, image: Image.Image, captured_at: float, grab_seconds: float,
+                 source_size: tuple, encoded: Optional[Future] = None):
+        self.image = image
+        self.captured_at = captured_at
+        self.grab_seconds = grab_seconds
+        self.source_size = source_size
+        self._encoded = encoded
+
+    @property
+    def size(self) -> tuple:
+        return self.image.size
+
+    def encoded(self, timeout: Optional[float] = None) -> bytes:
+        """
+        PNG/JPEG bytes of the frame (waits for the encoder if it is still running)
+        """
+        if self._encoded is None:
+            raise ValueError("Frame was captured without encoding")
+        return self._encoded.result(timeout)
+
+    def to_base64(self, timeout: Optional[float] = None) -> str:
+        return base64.b64encode(self.encoded(timeout)).decode("ascii")
+
+
+class ScreenCaptureService:
+    """
+    Low-latency screenshots: persistent grabber, region crop, downscale and background encoding
+    """
+
+    def __init__(self, monitor: int = 1, region: Optional[Dict[str, int]] = None,
+                 max_width: Optional[int] = DEFAULT_MAX_WIDTH, image_format: str = DEFAULT_FORMAT,
+                 jpeg_quality: int = DEFAULT_JPEG_QUALITY, grabber_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            monitor: mss monitor index used when no region is set (1 = primary)
+            region: {"left", "top", "width", "height"} to grab instead of the whole monitor,
+                e.g. the browser window (default: SCREEN_CAPTURE_REGION="left,top,width,height")
+            max_width: Frames wider than this are downscaled, keeping the aspect ratio (None keeps full size)
+            image_format: "PNG" or "JPEG" for the encoded bytes
+            grabber_factory: Builds the grabber (default: mss.mss); one is kept per thread
+        """
+        if grabber_factory is None and not MSS_AVAILABLE:
+            raise ImportError("Screen capture needs mss (pip install mss)")
+        self.monitor = monitor
+        self.region = region or _region_from_env()
+        self.max_width = max_width
+        self.image_format = image_format.upper()
+        self.jpeg_quality = jpeg_quality
+        self.grabber_factory = grabber_factory or mss
+        # mss handles are not shareable across threads, so each thread keeps its own
+        self._local = threading.local()
+        self._encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen-encode")
+        # Only the encoder thread touches this buffer
+        self._encode_buffer = io.BytesIO()
+        self._stats_lock = threading.Lock()
+        self.stats = {"frames": 0, "grab_seconds": 0.0, "encode_seconds": 0.0, "encoded_bytes": 0}
+
+    def _grabber(self) -> Any:
+        grabber = getattr(self._local, "grabber", None)
+        if grabber is None:
+            grabber = self.grabber_factory()
+            self._local.grabber = grabber
+        return grabber
+
+    def set_region(self, left: int, top: int, width: int, height: int) -> None:
+        """
+        Restricts capture to a screen rectangle (e.g. the browser window showing Google Calendar)
+        """
+        self.region = {"left": left, "top": top, "width": width, "height": height}
+
+    def _target_size(self, width: int, height: int) -> tuple:
+        if not self.max_width or width <= self.max_width:
+            return width, height
+        return self.max_width, max(1, round(height * self.max_width / width))
+
+    def grab(self, encode: bool = True) -> Frame:
+        """
+        Captures the region (or monitor) and returns a downscaled RGB frame;
+        with encode the PNG/JPEG bytes are produced on the encoder thread
+        """
+        start = time.perf_counter()
+        grabber = self._grabber()
+        area = self.region or grabber.monitors[self.monitor]
+        shot = grabber.grab(area)
+        # BGRX raw decoding reads mss's buffer directly instead of building an RGB copy first
+        image = Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+        target = self._target_size(*shot.size)
+        if target != shot.size:
+            image = image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+        else:
+            # frombuffer shares mss's buffer; detach it before the grabber reuses it
+            image = image.copy()
+        grab_seconds = time.perf_counter() - start
+
+        encoded = self._encoder.submit(self._encode, image) if encode else None
+        with self._stats_lock:
+            self.stats["frames"] += 1
+            self.stats["grab_seconds"] += grab_seconds
+        return Frame(image, time.time(), grab_seconds, tuple(shot.size), encoded)
+
+    def _encode(self, image: Image.Image) -> bytes:
+        start = time.perf_counter()
+        buffer = self._encode_buffer
+        buffer.seek(0)
+        buffer.truncate()
+        if self.image_format == "JPEG":
+            image.save(buffer, "JPEG", quality=self.jpeg_quality, optimize=False)
+        else:
+            # compress_level 1 is several times faster than the default and still lossless
+            image.save(buffer, "PNG", compress_level=1)
+        data = buffer.getvalue()
+        with self._stats_lock:
+            self.stats["encode_seconds"] += time.perf_counter() - start
+            self.stats["encoded_bytes"] += len(data)
+        return data
+
+    def metrics(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        frames = stats["frames"] or 1
+        return {
+            "frames": stats["frames"],
+            "avg_grab_ms": stats["grab_seconds"] / frames * 1000,
+            "avg_encode_ms": stats["encode_seconds"] / frames * 1000,
+            "avg_encoded_bytes": stats["encoded_bytes"] / frames,
+        }
+
+    def close(self) -> None:
+        self._encoder.shutdown(wait=True)
+        grabber = getattr(self._local, "grabber", None)
+        if grabber is not None and hasattr(grabber, "close"):
+            grabber.close()
+        self._local = threading.local()
+
+
+def _region_from_env() -> Optional[Dict[str, int]]:
+    value = os.getenv("SCREEN_CAPTURE_REGION")
+    if not value:
+        return None
+    left, top, width, height = (int(part) for part in value.split(","))
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+_default_service: Optional[ScreenCaptureService] = None
+_default_service_lock = threading.Lock()
+
+
+def get_capture_service() -> ScreenCaptureService:
+    """
+    Process-wide capture service (max width from SCREEN_CAPTURE_MAX_WIDTH, 0 for full size)
+    """
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            max_width = int(os.getenv("SCREEN_CAPTURE_MAX_WIDTH", str(DEFAULT_MAX_WIDTH))) or None
+            _default_service = ScreenCaptureService(max_width=max_width)
+        return _default_service
@@ -66,14 +66,16 @@ def run_system_demo():
     try:
         # Import and run
         from multi_layer_prompt_system import MultiLayerCalendarSystem
-        from orgo import Computer
+        from orgo_pool import get_default_pool
         
         # Setup
         openai_key = os.getenv("OPENAI_API_KEY")
         orgo_key = os.getenv("ORGO_API_KEY")
         
         print("🌐 Connecting to Orgo...")
-        computer = Computer(project_id="computer-ppgg5d6j")
+        # Warm the shared pool so Layer 2 leases an already connected computer
+        pool = get_default_pool(api_key=orgo_key)
+        pool.warm_up(start=False)
         print("✅ Connected to Orgo successfully!")
         
         print("🧠 Initializing AI system...")
@@ -122,7 +124,8 @@ def run_system_demo():
         print(f"🌐 Watch the automation at: https://www.orgo.ai/projects/computer-ppgg5d6j")
         print("⏳ This may take a few moments...")
         
-        result = computer.prompt(orgo_instruction)
+        with pool.lease() as computer:
+            result = computer.prompt(orgo_instruction)
         
         print(f"\n✅ Orgo Execution Complete!")
         print(f"📋 Result: {result}")
@@ -0,0 +1,136 @@
+"""
+Test the asyncio multi-layer system with fake clients (no API calls)
+"""
+
+import asyncio
+import json
+import threading
+import time
+from async_multi_layer_system import AsyncMultiLayerCalendarSystem
+from rate_limiter import RateLimiter
+
+ANALYSIS = {
+    "extracted_details": {"title": "Standup", "date": "2025-02-03", "time": "09:00", "duration": "30 minutes"},
+    "missing_details": [],
+    "confidence": 0.95,
+    "clarification_questions": []
+}
+
+
+class _SlowAsyncClient:
+    """Stands in for openai.AsyncOpenAI and tracks concurrent requests"""
+
+    def __init__(self, delay=0.01):
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        client = self
+
+        class _Completions:
+            @staticmethod
+            async def create(**kwargs):
+                client.calls += 1
+                client.in_flight += 1
+                client.peak = max(client.peak, client.in_flight)
+                await asyncio.sleep(delay)
+                client.in_flight -= 1
+                message = type("Message", (), {"content": json.dumps(ANALYSIS)})
+                choice = type("Choice", (), {"message": message})
+                return type("Response", (), {"choices": [choice]})
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+    async def close(self):
+        pass
+
+
+class _CountingExecutor:
+    """Blocking Layer 2 stand-in that records peak parallelism"""
+
+    def __init__(self, delay=0.005):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.instructions = []
+
+    def __call__(self, instruction):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.instructions.append(instruction)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return "done"
+
+
+def make_system(max_llm=8, max_exec=3):
+    executor = _CountingExecutor()
+    system = AsyncMultiLayerCalendarSystem(
+        "test-key", max_concurrent_llm_calls=max_llm, max_concurrent_executions=max_exec, executor=executor,
+        use_cache=False
+    )
+    system.prompt_engineer.client = _SlowAsyncClient()
+    system.prompt_engineer.rate_limiter = RateLimiter(0, 0)
+    return system, executor
+
+
+def test_many_requests_with_bounded_concurrency():
+    """Hundreds of requests share one loop without exceeding the limits"""
+    system, executor = make_system(max_llm=8, max_exec=3)
+    # Recurring requests skip the local fast path, so each one reaches the fake LLM
+    inputs = [f"standup every Monday number {i}" for i in range(300)]
+
+    async def run():
+        try:
+            return await system.acreate_many(inputs)
+        finally:
+            await system.aclose()
+
+    results = asyncio.run(run())
+    client = system.prompt_engineer.client
+    assert results == [True] * len(inputs)
+    assert client.calls == len(inputs)
+    assert client.peak <= 8
+    assert executor.peak <= 3
+    assert len(executor.instructions) == len(inputs)
+
+
+def test_async_answer_provider():
+    """Clarification answers can come from an async callback"""
+    system, _ = make_system()
+    incomplete = dict(ANALYSIS, confidence=0.5, clarification_questions=["How long?"])
+    asked = []
+
+    async def ask(questions):
+        asked.extend(questions)
+        return {"How long?": "30 minutes"}
+
+    async def run():
+        system.prompt_engineer.analyze_user_input = _return(incomplete)
+        try:
+            return await system.aprepare_event("standup every Monday", ask=ask)
+        finally:
+            await system.aclose()
+
+    details, instruction, timings = asyncio.run(run())
+    assert asked == ["How long?"]
+    assert "refine" in timings
+    assert "Standup" in instruction
+
+
+def _return(value):
+    async def coroutine(*args, **kwargs):
+        return value
+    return coroutine
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Async Multi-Layer System")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All async system tests passed!")
@@ -0,0 +1,94 @@
+"""
+Test the offline benchmark harness and its local OpenAI stand-in (no API calls)
+"""
+
+import json
+import openai
+import multi_layer_prompt_system
+from benchmark import (FakeComputer, FakeOpenAIServer, LatencyModel, bench_multi_layer, percentile, run_benchmark,
+                       summarize)
+from multi_layer_prompt_system import PromptEngineeringLayer
+from resilience import CircuitBreaker, RetryEngine
+
+
+def test_percentile_nearest_rank():
+    """Percentiles use the nearest-rank method"""
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    assert percentile([], 95) == 0.0
+    assert summarize(values)["p95_ms"] == 95.0
+
+
+def test_fake_server_speaks_openai_protocol():
+    """The real OpenAI client works against the fake server, plain and streamed"""
+    with FakeOpenAIServer() as server:
+        layer = PromptEngineeringLayer("bench-key", use_cache=False)
+        layer.client = openai.OpenAI(api_key="bench-key", base_url=server.base_url, max_retries=0)
+        analysis = layer.analyze_user_input("Team standup every Monday at 9am for 30 minutes")
+        assert analysis["extracted_details"]["title"] == "Team standup"
+
+        tokens = []
+        layer.on_token = tokens.append
+        layer.analyze_user_input("Team standup every Monday at 9am for 30 minutes")
+        assert len(tokens) > 2
+        assert json.loads("".join(tokens))["confidence"] == 0.9
+        assert server.requests == 2
+
+
+def test_injected_failures_are_counted():
+    """A failure rate of 1 makes every completion fail; after the retries the pipeline falls back"""
+    with FakeOpenAIServer(LatencyModel(failure_rate=1.0, seed=1)) as server:
+        layer = PromptEngineeringLayer("bench-key", use_cache=False)
+        layer.client = openai.OpenAI(api_key="bench-key", base_url=server.base_url, max_retries=0)
+        layer.retry_engine = RetryEngine("bench", base_delay=0.001, max_delay=0.01, breaker=CircuitBreaker("bench"))
+        analysis = layer.analyze_user_input("Team standup every Monday at 9am for 30 minutes")
+        assert analysis["confidence"] == 0.0
+        assert server.failures == 3
+        assert layer.retry_engine.decisions["attempts_exhausted"] == 1
+        assert layer.fallbacks == {"analyze": 1}
+
+
+def test_report_is_machine_readable():
+    """run_benchmark returns a JSON-serialisable report with per-stage percentiles"""
+    report = run_benchmark(
+        requests=6, concurrency_levels=[1, 3],
+        llm_latency=LatencyModel(), computer_latency=LatencyModel(),
+    )
+    json.dumps(report)
+    assert report["config"]["concurrency_levels"] == [1, 3]
+    assert report["llm_requests"] > 0
+    scenarios = {(result["scenario"], result["concurrency"]) for result in report["results"]}
+    assert scenarios == {
+        ("multi_layer/multi_call", 1), ("multi_layer/multi_call", 3),
+        ("optimized_agent/batch_operations", 1), ("optimized_agent/batch_operations", 3),
+    }
+    for result in report["results"]:
+        assert result["success_rate"] == 1.0
+        assert result["fallbacks"] == {} and result["errors"] == {}
+        for stats in result["stages"].values():
+            assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+    multi_layer = report["results"][0]["stages"]
+    assert {"analyze", "generate", "execute", "total"} <= set(multi_layer)
+
+
+
+def test_fallbacks_and_errors_are_reported_per_stage(monkeypatch):
+    """Layer 1 fallbacks show up even though those requests succeed; failed requests count by stage"""
+    engine = RetryEngine("bench", max_attempts=1, breaker=CircuitBreaker("bench"))
+    monkeypatch.setattr(multi_layer_prompt_system, "get_retry_engine", lambda upstream: engine)
+    with FakeOpenAIServer(LatencyModel(failure_rate=1.0, seed=1)) as server:
+        result = bench_multi_layer(server.base_url, 4, 2, FakeComputer(LatencyModel()), llm_fraction=1.0)
+    assert result["success_rate"] == 1.0
+    assert result["fallbacks"]["analyze"] > 0 and result["errors"] == {}
+
+    with FakeOpenAIServer(LatencyModel()) as server:
+        result = bench_multi_layer(server.base_url, 4, 2, FakeComputer(LatencyModel(failure_rate=1.0, seed=1)),
+                                   llm_fraction=0.0)
+    assert result["success_rate"] == 0.0
+    assert result["fallbacks"] == {} and result["errors"] == {"execute": 4}
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
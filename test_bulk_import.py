@@ -0,0 +1,226 @@
+"""
+Test bulk ICS/CSV import with a scripted fake computer (no Orgo calls)
+"""
+
+import json
+import os
+import re
+import tempfile
+from bulk_import import BulkImporter, load_events
+from types import SimpleNamespace
+
+from instruction_compiler import InstructionCompiler, agent_reply_text, parse_event_markers
+from orgo_pool import ComputerPool
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:standup-1@example.com
+SUMMARY:Team standup
+DTSTART:20250203T090000
+DTEND:20250203T093000
+LOCATION:Room 4\\, second floor
+END:VEVENT
+BEGIN:VEVENT
+UID:review-1@example.com
+SUMMARY:Quarterly review with a very long title that is folded
+  across two lines
+DTSTART;TZID=Europe/Berlin:20250204T140000
+DURATION:PT1H30M
+BEGIN:VALARM
+TRIGGER:-PT15M
+DESCRIPTION:Reminder
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+UID:holiday-1@example.com
+SUMMARY:Company holiday
+DTSTART;VALUE=DATE:20250205
+END:VEVENT
+BEGIN:VEVENT
+UID:weekly-1@example.com
+SUMMARY:Weekly sync
+DTSTART:20250206T100000
+RRULE:FREQ=WEEKLY
+END:VEVENT
+END:VCALENDAR
+"""
+
+CSV = """Subject,Start Date,Start Time,End Time,Location,Notes
+Dentist,08/22/2025,8:00 AM,9:00 AM,Main St,
+Lunch with Sam,2025-08-23,12:30,,Cafe,Bring the slides
+Gym,2025-08-24,6:30 PM,7:45 PM,,
+Broken,someday,10:00,,,
+"""
+
+
+class ScriptedComputer:
+    """Confirms events according to a script of {event number: outcome} per prompt"""
+
+    def __init__(self, script=None):
+        self.script = list(script or [])
+        self.instructions = []
+
+    def prompt(self, instruction):
+        self.instructions.append(instruction)
+        count = len(re.findall(r"^EVENT \d+: ", instruction, re.MULTILINE))
+        outcomes = self.script.pop(0) if self.script else {n: "DONE" for n in range(1, count + 1)}
+        if isinstance(outcomes, Exception):
+            raise outcomes
+        return "\n".join(f"EVENT {n}: {outcome}" for n, outcome in sorted(outcomes.items()))
+
+    def status(self):
+        return {"status": "running"}
+
+
+def write(tmp, name, content):
+    path = os.path.join(tmp, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def make_importer(computer, **kwargs):
+    pool = ComputerPool(project_ids=["fake"], factory=lambda project_id: computer, health_check_interval=3600)
+    return BulkImporter(pool=pool, **kwargs)
+
+
+def test_ics_events_are_streamed_and_normalized():
+    """Folded lines, escapes, DURATION and nested components are handled; unsupported events carry an error"""
+    with tempfile.TemporaryDirectory() as tmp:
+        events = list(load_events(write(tmp, "team.ics", ICS)))
+
+    assert [event.details.get("title") for event in events][:2] == [
+        "Team standup", "Quarterly review with a very long title that is folded across two lines"]
+    assert events[0].details == {"title": "Team standup", "date": "2025-02-03", "time": "09:00",
+                                 "duration": "30 minutes", "location": "Room 4, second floor"}
+    assert events[1].details["duration"] == "1 hour 30 minutes"
+    assert "description" not in events[1].details  # the alarm's DESCRIPTION is not the event's
+    assert events[2].error == "All-day events are not supported"
+    assert events[3].error == "Recurring events are not supported"
+    assert events[0].error is None and events[0].line == 3
+
+
+def test_csv_columns_and_formats():
+    """Header aliases, US dates, 12-hour times and end times are normalized"""
+    with tempfile.TemporaryDirectory() as tmp:
+        events = list(load_events(write(tmp, "team.csv", CSV)))
+
+    assert events[0].details == {"title": "Dentist", "date": "2025-08-22", "time": "08:00",
+                                 "duration": "1 hour", "location": "Main St"}
+    assert events[1].details["description"] == "Bring the slides"
+    assert "duration" not in events[1].details
+    assert events[2].details["time"] == "18:30" and events[2].details["duration"] == "1 hour 15 minutes"
+    assert events[3].error.startswith("Unreadable date")
+
+
+def test_multi_event_instruction_navigates_once():
+    """Only the first event opens Google Calendar; markers are parsed per event"""
+    instruction = InstructionCompiler().compile_many([
+        {"title": "A", "date": "2025-02-03", "time": "09:00"},
+        {"title": "B", "date": "2025-02-04", "time": "10:00"},
+    ])
+    assert instruction.count("calendar.google.com") == 1
+    assert "EVENT 2: \"B\" on February 4, 2025" in instruction
+    assert parse_event_markers("EVENT 1: DONE\nevent 2: failed - no save button") == {
+        1: "DONE", 2: "no save button"}
+
+
+def test_import_runs_chunks_and_tracks_outcomes():
+    """Valid events go out in chunks, one prompt per chunk, and outcomes are saved"""
+    computer = ScriptedComputer()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "team.csv", CSV)
+        summary = make_importer(computer, chunk_size=2).import_file(path)
+        with open(f"{path}.import-state.json", encoding="utf-8") as f:
+            saved = json.load(f)["events"]
+
+    assert summary["total"] == 4
+    assert summary["created"] == 3 and summary["invalid"] == 1 and summary["chunks"] == 2
+    assert len(computer.instructions) == 2
+    statuses = sorted(entry["status"] for entry in saved.values())
+    assert statuses == ["created", "created", "created", "invalid"]
+
+
+def test_partially_failed_chunk_resumes_where_it_stopped():
+    """Unconfirmed events are retried first; a rerun skips what was already created"""
+    computer = ScriptedComputer([
+        {1: "DONE"},                      # stopped after the first event
+        {1: "DONE", 2: "FAILED - busy"},  # retry: Lunch created, Gym failed again
+    ])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "team.csv", CSV)
+        summary = make_importer(computer, chunk_size=3, max_attempts=2).import_file(path)
+
+        assert summary["created"] == 2 and summary["failed"] == 1
+        assert "Lunch with Sam" in computer.instructions[1].split("EVENT 1:")[1]
+        assert "Dentist" not in computer.instructions[1]
+        gym = next(entry for entry in summary["events"].values() if entry["title"] == "Gym")
+        assert gym["status"] == "failed" and gym["error"] == "busy" and gym["attempts"] == 2
+
+        rerun = ScriptedComputer()
+        summary = make_importer(rerun).import_file(path)
+        assert summary["skipped"] == 2 and summary["created"] == 1
+        assert len(rerun.instructions) == 1 and "Gym" in rerun.instructions[0]
+        assert "EVENT 2:" not in rerun.instructions[0]
+
+
+def test_session_errors_are_retried():
+    """A failing prompt leaves the whole chunk pending for the next attempt"""
+    computer = ScriptedComputer([ConnectionError("session lost")])
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = make_importer(computer, chunk_size=5).import_file(write(tmp, "team.ics", ICS))
+
+    assert summary["created"] == 2 and summary["invalid"] == 2
+    assert len(computer.instructions) == 2
+
+
+def test_timed_out_chunk_is_unknown_not_retried():
+    """After a timeout the chunk's events may exist, so they are neither resent nor resent on a rerun"""
+    computer = ScriptedComputer([TimeoutError("prompt timed out")])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "team.ics", ICS)
+        summary = make_importer(computer, chunk_size=5).import_file(path)
+        assert summary["unknown"] == 2 and summary["created"] == 0 and summary["failed"] == 0
+        assert len(computer.instructions) == 1
+        assert sorted(entry["status"] for entry in summary["events"].values()) == [
+            "invalid", "invalid", "unknown", "unknown"]
+
+        rerun = ScriptedComputer()
+        summary = make_importer(rerun).import_file(path)
+        assert summary["unknown"] == 2 and rerun.instructions == []
+        summary = make_importer(rerun).import_file(path, retry_unknown=True)
+        assert summary["created"] == 2 and len(rerun.instructions) == 1
+
+
+
+class TranscriptComputer(ScriptedComputer):
+    """Returns Orgo's message list: our instruction first, then the assistant's content blocks"""
+
+    def __init__(self, reply):
+        super().__init__()
+        self.reply = reply
+
+    def prompt(self, instruction):
+        self.instructions.append(instruction)
+        return [{"role": "user", "content": instruction},
+                {"role": "assistant", "content": [SimpleNamespace(type="text", text=self.reply)]}]
+
+
+def test_markers_in_the_echoed_instruction_are_ignored():
+    """Only the agent's reply counts; the instruction's own "EVENT n: DONE" lines don't confirm anything"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write(tmp, "team.csv", CSV)
+        summary = make_importer(TranscriptComputer("could not open the browser"), chunk_size=3,
+                                max_attempts=1).import_file(path)
+        assert summary["created"] == 0 and summary["failed"] == 3
+
+        summary = make_importer(TranscriptComputer("EVENT 1: DONE\nEVENT 2: DONE\nEVENT 3: DONE"),
+                                chunk_size=3).import_file(path)
+        assert summary["created"] == 3
+    assert agent_reply_text([{"role": "assistant", "content": "EVENT 1: DONE"}]) == "EVENT 1: DONE"
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,63 @@
+"""
+Test the bounded conversation state: slot merging, turn window, summary cap and flat context size
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from conversation_state import ConversationState, describe_turn
+
+
+def turn(i):
+    return [{"role": "user", "content": f"message {i} " + "detail " * 20},
+            {"role": "assistant", "content": f"reply {i}"}]
+
+
+def test_slots_merge_without_erasing():
+    state = ConversationState()
+    assert state.update_slots({"title": "Dinner", "date": "2030-05-01", "participants": ["Sam"]}) == {
+        "title": "Dinner", "date": "2030-05-01", "participants": ["Sam"]}
+    changed = state.update_slots({"title": "", "time": "19:00", "participants": ["Sam", "Alex"]})
+    assert changed == {"time": "19:00", "participants": ["Sam", "Alex"]}
+    assert state.slots["title"] == "Dinner"
+    assert state.missing_slots() == ["duration"]
+    assert "Still missing: duration" in state.state_prompt()
+
+
+def test_context_stays_flat_in_long_sessions():
+    """After the window fills, the context sent per turn stops growing"""
+    state = ConversationState(max_turns=3, max_summary_chars=500)
+    sizes = []
+    for i in range(200):
+        state.add_turn(turn(i))
+        sizes.append(sum(len(m["content"]) for m in state.context_messages("system prompt")))
+    assert len(state.turns) == 3 and state.stats == {"turns": 200, "summarized": 197}
+    assert len(state.summary) <= 500 and "message 196" in state.summary
+    assert max(sizes[20:]) - min(sizes[20:]) < 50
+    assert [m["content"] for m in state.recent_messages()][-1] == "reply 199"
+
+
+def test_turns_stay_whole_and_langchain_messages_render():
+    """Tool calls and their results leave the window together; LangChain-style messages are summarized"""
+    state = ConversationState(max_turns=1)
+    ai = SimpleNamespace(type="ai", content="", tool_calls=[{"name": "update_local_event"}])
+    tool = SimpleNamespace(type="tool", content="eventDetails has been updated")
+    state.add_turn([SimpleNamespace(type="human", content="lunch friday"), ai, tool])
+    state.add_turn([SimpleNamespace(type="human", content="at noon"), SimpleNamespace(type="ai", content="ok")])
+    assert state.summary == ("user: lunch friday | assistant: called update_local_event | "
+                             "tool: eventDetails has been updated")
+    assert describe_turn(state.recent_messages()) == "user: at noon | assistant: ok"
+
+
+def test_snapshot_round_trip_and_custom_summarizer():
+    state = ConversationState(max_turns=2, summarizer=lambda summary, turns: f"{len(turns)} more turn(s)")
+    state.update_slots({"title": "Standup"})
+    for i in range(3):
+        state.add_turn(turn(i))
+    assert state.summary == "1 more turn(s)"
+    restored = ConversationState.from_dict(state.to_dict(), max_turns=2)
+    assert restored.context_messages() == state.context_messages()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
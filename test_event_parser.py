@@ -0,0 +1,131 @@
+"""
+Test the local event parser fast path (no API calls)
+"""
+
+from datetime import date
+from event_parser import LocalEventParser, format_duration, parse_duration_minutes
+from multi_layer_prompt_system import PromptEngineeringLayer
+
+TODAY = date(2025, 1, 28)  # a Tuesday
+
+
+def parse(text):
+    return LocalEventParser().parse(text, today=TODAY)
+
+
+def test_absolute_dates_and_times():
+    """Absolute dates and 12h/24h times are normalized"""
+    analysis, certainty = parse("SMU GYM on August 22nd at 8am for 2 hours")
+    assert certainty == 1.0
+    assert analysis["extracted_details"] == {
+        "title": "SMU GYM", "date": "2025-08-22", "time": "08:00", "duration": "2 hours"
+    }
+    assert analysis["missing_details"] == []
+    assert analysis["confidence"] == 1.0
+
+    analysis, _ = parse("standup 2025-03-04 14:30 for 1.5 hours")
+    assert analysis["extracted_details"]["time"] == "14:30"
+    assert analysis["extracted_details"]["duration"] == "1 hour 30 minutes"
+
+
+def test_relative_dates():
+    """Relative dates resolve against the supplied current date"""
+    assert parse("meeting tomorrow at 2pm")[0]["extracted_details"]["date"] == "2025-01-29"
+    assert parse("gym session next Friday at 8:30am")[0]["extracted_details"]["date"] == "2025-01-31"
+    assert parse("sync next Tuesday at 9am")[0]["extracted_details"]["date"] == "2025-02-04"
+    assert parse("dentist in 3 days at 10am")[0]["extracted_details"]["date"] == "2025-01-31"
+    # Dates that already passed this year roll over to next year
+    assert parse("party January 2nd at 7pm")[0]["extracted_details"]["date"] == "2026-01-02"
+
+
+def test_missing_fields_and_questions():
+    """Missing required fields are reported with clarification questions"""
+    analysis, certainty = parse("diving event August 22nd 8am")
+    assert certainty >= 0.75
+    assert analysis["extracted_details"]["title"] == "Diving event"
+    assert analysis["missing_details"] == ["duration"]
+    assert analysis["confidence"] == 0.75
+    assert len(analysis["clarification_questions"]) == 1
+
+
+def test_time_range_and_location():
+    """Time ranges give a duration and capitalized places become the location"""
+    analysis, _ = parse("Lunch with Sarah at Cafe Nero tomorrow from 1 to 2:30pm")
+    details = analysis["extracted_details"]
+    assert details["time"] == "13:00"
+    assert details["duration"] == "1 hour 30 minutes"
+    assert details["location"] == "Cafe Nero"
+    assert details["title"] == "Lunch with Sarah"
+
+    analysis, certainty = parse("meeting at 2pm in Room 5 tomorrow")
+    assert analysis["extracted_details"]["location"] == "Room 5"
+    assert analysis["extracted_details"]["title"] == "Meeting" and certainty == 1.0
+    analysis, certainty = parse("Standup tomorrow at 9am in Building 4 for 15 minutes")
+    assert analysis["extracted_details"]["location"] == "Building 4"
+    assert analysis["extracted_details"]["duration"] == "15 minutes" and certainty == 1.0
+
+
+def test_low_certainty_requests():
+    """Requests the parser cannot handle reliably get a low certainty"""
+    assert parse("Team standup every Monday at 9am for 30 minutes")[1] < 0.75
+    assert parse("dinner tomorrow evening")[1] < 0.75
+    assert parse("remind me about the thing")[1] < 0.75
+
+
+def test_ambiguous_times_titles_and_dates_go_to_the_llm():
+    """Guesses that could book the wrong event are not trusted by the fast path"""
+    analysis, certainty = parse("meeting tomorrow at 2:30 for 1 hour")
+    assert analysis["extracted_details"]["time"] == "02:30" and certainty < 0.75
+    assert parse("call at 5:15 on Friday for 30 minutes")[1] < 0.75
+    assert parse("standup tomorrow at 09:30 for 15 minutes")[1] == 1.0
+
+    assert parse("Book club on the 3rd of March at 7pm for 2 hours")[1] < 0.75
+    assert parse("Book a dentist appointment on March 3rd at 7pm for 1 hour")[1] == 1.0
+    assert parse("Plan review tomorrow at 10am for 1 hour")[1] < 0.75
+
+    analysis, certainty = parse("Dentist 2/30 at 10am for 1 hour")
+    assert "date" not in analysis["extracted_details"] and certainty < 0.75
+
+    # "in 2 hours" may be when dinner starts rather than how long it lasts
+    assert parse("Dinner at 8pm in 2 hours")[1] < 0.75
+    # Words left on both sides of an extracted part are joined into the title
+    analysis, certainty = parse("Team meeting tomorrow 5 at 3pm for 1 hour")
+    assert analysis["extracted_details"]["title"] == "Team meeting 5" and certainty < 0.75
+
+
+def test_duration_helpers():
+    """Duration strings round-trip through minutes"""
+    assert parse_duration_minutes("2 hours") == 120
+    assert parse_duration_minutes("1 hour 30 minutes") == 90
+    assert parse_duration_minutes("half an hour") == 30
+    assert format_duration(45) == "45 minutes"
+    assert format_duration(60) == "1 hour"
+
+
+class _FailingClient:
+    """Stands in for openai.OpenAI and fails if the LLM is reached"""
+
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                raise AssertionError("LLM should not be called for well-formed requests")
+
+
+def test_fast_path_skips_llm():
+    """analyze_user_input answers simple requests without calling the LLM"""
+    layer = PromptEngineeringLayer("test-key", use_cache=False)
+    layer.client = _FailingClient()
+    analysis = layer.analyze_user_input("Create a diving event on August 22nd at 8am")
+    assert analysis["extracted_details"]["time"] == "08:00"
+    assert analysis["missing_details"] == ["duration"]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Local Event Parser")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All local parser tests passed!")
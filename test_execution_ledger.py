@@ -0,0 +1,215 @@
+"""
+Test the execution ledger: canonical keys, at-most-once execution across threads and processes,
+and that retries after ambiguous failures (timeouts) do not create duplicates
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+from execution_ledger import DuplicateExecutionError, ExecutionLedger, canonical_event_key
+from executor_router import ExecutorRouter
+from performance_optimizer import OptimizedCalendarAgent
+
+DETAILS = {"title": "Dentist", "date": "2025-08-22", "time": "08:00", "duration": "1 hour", "location": "Main St"}
+
+
+def make_ledger(tmp_path, **kwargs):
+    return ExecutionLedger(str(tmp_path / "executions.sqlite3"), **kwargs)
+
+
+def test_canonical_key_ignores_formatting():
+    """Case, whitespace and duration spelling don't change the key; the date does"""
+    same = dict(DETAILS, title="  dentist ", duration="60 minutes", location="main  st")
+    assert canonical_event_key(DETAILS) == canonical_event_key(same)
+    assert canonical_event_key(DETAILS) != canonical_event_key(dict(DETAILS, date="2025-08-23"))
+    assert canonical_event_key(None, "Create  Dentist") == canonical_event_key(None, "create dentist")
+
+
+def test_run_once_returns_the_earlier_result(tmp_path):
+    """A completed execution is not repeated; a plain failure can be retried"""
+    ledger = make_ledger(tmp_path)
+    key = canonical_event_key(DETAILS)
+    calls = []
+
+    def fail_then_succeed():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("VM error")
+        return {"id": "evt1"}
+
+    with pytest.raises(RuntimeError):
+        ledger.run_once(key, fail_then_succeed)
+    assert ledger.status(key)["status"] == "failed"
+    assert ledger.run_once(key, fail_then_succeed) == {"id": "evt1"}
+    assert ledger.run_once(key, fail_then_succeed) == {"id": "evt1"}
+    assert len(calls) == 2
+    assert ledger.status(key)["attempts"] == 2
+
+
+def test_timeout_blocks_automatic_rerun(tmp_path):
+    """After a timeout the event may exist, so a repeat is refused until explicitly allowed"""
+    ledger = make_ledger(tmp_path)
+    key = canonical_event_key(DETAILS)
+
+    def timeout():
+        raise TimeoutError("prompt timed out")
+
+    with pytest.raises(TimeoutError):
+        ledger.run_once(key, timeout)
+    with pytest.raises(DuplicateExecutionError) as error:
+        ledger.run_once(key, lambda: "created")
+    assert error.value.status == "unknown"
+    assert ledger.run_once(key, lambda: "created", retry_unknown=True) == "created"
+
+
+def test_interrupt_is_recorded_as_unknown(tmp_path):
+    """Ctrl-C or cancellation mid-execution may leave a saved event, so it is not a retryable failure"""
+    ledger = make_ledger(tmp_path)
+    key = canonical_event_key(DETAILS)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        ledger.run_once(key, interrupted)
+    assert ledger.status(key)["status"] == "unknown"
+    with pytest.raises(DuplicateExecutionError):
+        ledger.run_once(key, lambda: "created")
+
+
+def test_concurrent_claims_and_stale_takeover(tmp_path):
+    """Only one thread runs an in-flight event; an abandoned claim is taken over after the timeout"""
+    ledger = make_ledger(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "created"
+
+    runner = threading.Thread(target=ledger.run_once, args=("k", slow))
+    runner.start()
+    started.wait(5)
+    with pytest.raises(DuplicateExecutionError) as error:
+        ledger.run_once("k", lambda: "again")
+    assert error.value.status == "in_flight"
+    release.set()
+    runner.join()
+
+    abandoned = make_ledger(tmp_path, in_flight_timeout=0.05)
+    assert abandoned.claim("crashed").status == "acquired"
+    assert abandoned.claim("crashed").status == "in_flight"
+    time.sleep(0.1)
+    assert abandoned.run_once("crashed", lambda: "recovered") == "recovered"
+    assert abandoned.stats["takeovers"] == 1
+
+
+def _create_in_process(path, marker_dir):
+    ledger = ExecutionLedger(path)
+
+    def create():
+        open(os.path.join(marker_dir, str(os.getpid())), "w").close()
+        time.sleep(0.2)
+        return "created"
+
+    try:
+        ledger.run_once(canonical_event_key(DETAILS), create, wait_timeout=5)
+    except DuplicateExecutionError:
+        pass
+
+
+def test_at_most_once_across_processes(tmp_path):
+    """Several processes submitting the same event create it once"""
+    path = str(tmp_path / "executions.sqlite3")
+    ExecutionLedger(path)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_create_in_process, args=(path, str(tmp_path))) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert len([name for name in os.listdir(tmp_path) if name.isdigit()]) == 1
+    assert ExecutionLedger(path).status(canonical_event_key(DETAILS))["status"] == "completed"
+
+
+class _TimeoutComputer:
+    def __init__(self):
+        self.prompts = []
+
+    def prompt(self, instruction):
+        self.prompts.append(instruction)
+        raise TimeoutError("Orgo prompt timed out")
+
+
+def test_optimized_prompt_does_not_retry_timeouts(tmp_path):
+    """retry_operation stops at a timeout when the ledger is on, and the repeat is refused"""
+    computer = _TimeoutComputer()
+    agent = OptimizedCalendarAgent("test-project", use_cache=False, max_retries=3, computers=[computer],
+                                   ledger=make_ledger(tmp_path))
+    with pytest.raises(TimeoutError):
+        agent.optimized_prompt("Create Dentist", event_details=DETAILS)
+    with pytest.raises(DuplicateExecutionError):
+        agent.optimized_prompt("Create Dentist again", event_details=DETAILS)
+    assert len(computer.prompts) == 1
+
+
+class _EchoComputer:
+    def __init__(self):
+        self.prompts = []
+
+    def prompt(self, instruction):
+        self.prompts.append(instruction)
+        return f"done: {instruction}"
+
+
+def test_optimized_prompt_only_dedupes_event_creation(tmp_path):
+    """Prompts without event_details (reads, checks) run every time"""
+    computer = _EchoComputer()
+    agent = OptimizedCalendarAgent("test-project", use_cache=False, computers=[computer],
+                                   ledger=make_ledger(tmp_path))
+    assert agent.optimized_prompt("List today's events") == "done: List today's events"
+    assert agent.optimized_prompt("List today's events") == "done: List today's events"
+    agent.optimized_prompt("Create Dentist", event_details=DETAILS)
+    agent.optimized_prompt("Create Dentist", event_details=DETAILS)
+    assert computer.prompts == ["List today's events"] * 2 + ["Create Dentist"]
+
+
+class _Executor:
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def supports(self, event_details):
+        return True
+
+    def execute(self, instruction, event_details=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"{self.name} created"
+
+
+def test_router_does_not_fail_over_after_timeout(tmp_path):
+    """A timed-out backend may have saved the event, so the next backend is not tried"""
+    slow, backup = _Executor("orgo", TimeoutError("timed out")), _Executor("local")
+    router = ExecutorRouter([slow, backup], ledger=make_ledger(tmp_path))
+    with pytest.raises(TimeoutError):
+        router.execute("Create Dentist", DETAILS)
+    assert backup.calls == 0
+
+    broken = _Executor("orgo", RuntimeError("VM error"))
+    router = ExecutorRouter([broken, backup], ledger=make_ledger(tmp_path / "other"))
+    assert router.execute("Create Dentist", DETAILS) == "local created"
+    assert router.execute("Create Dentist", DETAILS) == "local created"
+    assert backup.calls == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
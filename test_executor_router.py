@@ -0,0 +1,119 @@
+"""
+Test latency- and success-aware executor routing with fake executors and a fake clock
+"""
+
+import pytest
+from agent_s_interface import CalendarExecutor
+from executor_router import ExecutorRouter, NoExecutorAvailableError
+
+DETAILS = {"title": "Dentist", "date": "2025-08-22", "time": "08:00"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeExecutor(CalendarExecutor):
+    """Takes `latency` fake seconds per call and raises while `failing` is set"""
+
+    def __init__(self, name, clock, latency, failing=False, needs_details=False):
+        self.name = name
+        self.clock = clock
+        self.latency = latency
+        self.failing = failing
+        self.needs_details = needs_details
+        self.calls = 0
+
+    def supports(self, event_details):
+        return bool(event_details) or not self.needs_details
+
+    def execute(self, instruction, event_details=None):
+        self.calls += 1
+        self.clock.now += self.latency
+        if self.failing:
+            raise ConnectionError(f"{self.name} unreachable")
+        return self.name
+
+
+def make_router(*specs, **kwargs):
+    clock = FakeClock()
+    executors = [FakeExecutor(name, clock, latency, **options) for name, latency, options in specs]
+    return ExecutorRouter(executors, clock=clock, **kwargs), executors, clock
+
+
+def test_untried_executors_follow_registry_order():
+    """With no samples every executor has the same expected cost, so order decides"""
+    router, (orgo, local), _ = make_router(("orgo", 40.0, {}), ("agent_s", 10.0, {}))
+    assert [executor.name for executor in router.rank()] == ["orgo", "agent_s"]
+    assert router.execute("x") == "orgo"
+    assert router.metrics()["executors"]["orgo"]["routed"] == 1
+
+
+def test_slow_backend_stops_stalling_the_queue():
+    """Once a backend is measured as slow, requests go to the faster one"""
+    router, (orgo, local), _ = make_router(("orgo", 40.0, {}), ("agent_s", 10.0, {}), prior_latency=30.0)
+    results = [router.execute("x") for _ in range(5)]
+    assert results[0] == "orgo"
+    assert results[1:] == ["agent_s"] * 4
+    assert router.metrics()["executors"]["orgo"]["latency_ms"] == 40000
+
+
+def test_failover_within_one_request():
+    """An exception moves the same request to the next backend"""
+    router, (api, orgo), _ = make_router(("api", 1.0, {"failing": True}), ("orgo", 20.0, {}))
+    assert router.execute("x") == "orgo"
+    metrics = router.metrics()
+    assert metrics["decisions"] == {"requests": 1, "failovers": 1, "exhausted": 0}
+    assert metrics["executors"]["api"]["failures"] == 1
+    assert metrics["executors"]["orgo"]["failovers"] == 1
+
+
+def test_cooldown_and_recovery():
+    """Repeated failures put a backend in cooldown; it is tried again once the cooldown ends"""
+    router, (api, orgo), clock = make_router(("api", 1.0, {"failing": True}), ("orgo", 100.0, {}),
+                                             failure_threshold=2, cooldown=600.0, stale_after=3600.0)
+    router.execute("x")
+    router.execute("x")
+    assert not router.metrics()["executors"]["api"]["healthy"]
+    assert [executor.name for executor in router.rank()] == ["orgo", "api"]
+
+    api.calls = 0
+    router.execute("x")
+    assert api.calls == 0
+
+    api.failing = False
+    clock.now += 601
+    assert router.rank()[0].name == "api"
+    assert router.execute("x") == "api"
+
+
+def test_stale_latency_reverts_to_prior():
+    """A backend measured as slow long ago gets another chance"""
+    router, (orgo, local), clock = make_router(("orgo", 40.0, {}), ("agent_s", 10.0, {}),
+                                               prior_latency=5.0, stale_after=300.0)
+    router.execute("x")  # orgo measured at 40 s
+    assert router.rank()[0].name == "agent_s"
+    clock.now += 301
+    assert router.rank()[0].name == "orgo"
+
+
+def test_unsupported_events_and_exhaustion():
+    """Executors that need event details are skipped without them; all failing re-raises"""
+    router, (api, orgo), _ = make_router(("api", 1.0, {"needs_details": True}), ("orgo", 20.0, {"failing": True}))
+    assert [executor.name for executor in router.rank(DETAILS)] == ["api", "orgo"]
+    assert [executor.name for executor in router.rank(None)] == ["orgo"]
+    with pytest.raises(ConnectionError):
+        router.execute("x")
+    assert router.metrics()["decisions"]["exhausted"] == 1
+
+    empty = ExecutorRouter([])
+    with pytest.raises(NoExecutorAvailableError):
+        empty.execute("x")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
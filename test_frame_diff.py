@@ -0,0 +1,91 @@
+"""
+Test frame change detection and settle waiting on synthetic screenshots
+"""
+
+import random
+from PIL import Image, ImageDraw
+from frame_diff import FrameChangeDetector, block_change_ratio, dhash_change_ratio
+from performance_optimizer import OptimizedCalendarAgent
+
+
+def calendar_frame(dialog=False, typed="", noise=0, seed=0):
+    """A 1280x800 'calendar' with an optional event dialog and typed title"""
+    image = Image.new("RGB", (1280, 800), "white")
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 1280, 180):
+        draw.line([(x, 100), (x, 800)], fill=(200, 200, 200), width=1)
+    if dialog:
+        draw.rectangle([400, 200, 880, 600], fill=(240, 240, 250), outline=(60, 60, 60), width=2)
+    if typed:
+        draw.rectangle([420, 230, 420 + 9 * len(typed), 246], fill=(30, 30, 30))
+    if noise:
+        rng = random.Random(seed)
+        pixels = image.load()
+        for _ in range(4000):
+            x, y = rng.randrange(1280), rng.randrange(800)
+            value = max(0, 255 - rng.randrange(noise))
+            pixels[x, y] = (value, value, value)
+    return image
+
+
+def test_block_diff_sees_small_changes_but_not_noise():
+    """A typed title is a change; scattered compression-like noise is not"""
+    base = calendar_frame(dialog=True)
+    assert block_change_ratio(base, base.copy()) == 0.0
+    assert block_change_ratio(base, calendar_frame(dialog=True, noise=6, seed=1)) == 0.0
+    detector = FrameChangeDetector()
+    assert detector.differs(base, calendar_frame(dialog=True, typed="Dentist"))
+    assert detector.differs(calendar_frame(), base)
+    assert block_change_ratio(base, Image.new("RGB", (640, 400))) == 1.0
+
+
+def test_dhash_sees_layout_changes():
+    """The perceptual hash ignores noise and flags a dialog opening"""
+    base = calendar_frame()
+    assert dhash_change_ratio(base, calendar_frame(noise=6, seed=2)) == 0.0
+    assert FrameChangeDetector(method="dhash", threshold=0.02).differs(base, calendar_frame(dialog=True))
+
+
+def test_only_new_frames_are_passed_on():
+    """is_new keeps the last new frame as reference"""
+    detector = FrameChangeDetector()
+    frames = [calendar_frame(), calendar_frame(), calendar_frame(dialog=True), calendar_frame(dialog=True)]
+    assert [detector.is_new(frame) for frame in frames] == [True, False, True, False]
+    assert detector.stats == {"frames": 4, "changed": 2, "skipped": 2}
+
+
+def test_wait_for_settle_and_change():
+    """Waiting returns as soon as the screen is stable (or changed) instead of sleeping a fixed time"""
+    frames = iter([calendar_frame(), calendar_frame(dialog=True), calendar_frame(dialog=True, typed="D"),
+                   calendar_frame(dialog=True, typed="D"), calendar_frame(dialog=True, typed="D")])
+    detector = FrameChangeDetector()
+    image, settled = detector.wait_for_settle(lambda: next(frames), interval=0, stable_frames=2)
+    assert settled and detector.differs(image, calendar_frame(dialog=True))
+
+    frozen, settled = detector.wait_for_settle(calendar_frame, interval=0, timeout=0)
+    assert not settled
+
+    frames = iter([calendar_frame(), calendar_frame(), calendar_frame(dialog=True)])
+    image, changed = detector.wait_for_change(lambda: next(frames), reference=calendar_frame(), interval=0)
+    assert changed and not detector.differs(image, calendar_frame(dialog=True))
+
+
+class _ScreenComputer:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def screenshot(self):
+        return self.frames.pop(0) if len(self.frames) > 1 else self.frames[0]
+
+
+def test_smart_screenshot_skips_unchanged_frames():
+    """smart_screenshot only returns frames that differ from the last one returned"""
+    computer = _ScreenComputer([calendar_frame(), calendar_frame(), calendar_frame(dialog=True)])
+    agent = OptimizedCalendarAgent("test-project", use_cache=False, computers=[computer])
+    results = [agent.smart_screenshot() for _ in range(3)]
+    assert results[0] is not None and results[1] is None and results[2] is not None
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
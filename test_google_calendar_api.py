@@ -0,0 +1,269 @@
+"""
+Test the Calendar API executor against a local fake Calendar API server (no Google calls)
+"""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import agent_s_interface
+import executor_router
+from agent_s_interface import CalendarExecutor, create_calendar_event_with_agent_s, run_executor, select_executor
+from bulk_import import BulkImporter
+from execution_ledger import ExecutionLedger
+from google_calendar_api import (GoogleCalendarAPIError, GoogleCalendarAPIExecutor, GoogleCalendarClient,
+                                 event_resource, parse_batch_response)
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+
+DETAILS = {"title": "Dentist", "date": "2025-08-22", "time": "08:00", "duration": "1 hour", "location": "Main St"}
+
+
+class FakeCalendarServer:
+    """
+    Implements events.insert and the /batch/calendar/v3 endpoint in memory
+    """
+
+    def __init__(self, token="test-token"):
+        self.token = token
+        self.events = []
+        self.requests = []
+        self.connections = set()
+        self.reject_titles = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                with server._lock:
+                    server.requests.append(self.path)
+                    server.connections.add(self.client_address)
+                if self.headers.get("Authorization") != f"Bearer {server.token}":
+                    self._send(401, "application/json", json.dumps({"error": {"message": "Invalid Credentials"}}))
+                elif self.path.startswith("/batch/"):
+                    self._batch(body)
+                else:
+                    status, payload = server.insert(json.loads(body))
+                    self._send(status, "application/json", json.dumps(payload))
+
+            def _batch(self, body):
+                boundary = self.headers["Content-Type"].split("boundary=")[1]
+                parts = []
+                for part in body.split(f"--{boundary}")[1:]:
+                    if part.startswith("--"):
+                        break
+                    outer, _, inner = part.strip("\r\n").partition("\r\n\r\n")
+                    content_id = [line.split(":", 1)[1].strip() for line in outer.split("\r\n")
+                                  if line.lower().startswith("content-id")][0]
+                    status, payload = server.insert(json.loads(inner.split("\r\n\r\n", 1)[1]))
+                    parts.append(
+                        f"--response_boundary\r\nContent-Type: application/http\r\n"
+                        f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+                        f"HTTP/1.1 {status} {'OK' if status == 200 else 'Bad Request'}\r\n"
+                        f"Content-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n"
+                    )
+                self._send(200, "multipart/mixed; boundary=response_boundary",
+                           "".join(parts) + "--response_boundary--\r\n")
+
+            def _send(self, status, content_type, text):
+                data = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+
+    def insert(self, resource):
+        if resource["summary"] in self.reject_titles:
+            return 400, {"error": {"code": 400, "message": "Invalid start time"}}
+        with self._lock:
+            event = dict(resource, id=f"evt{len(self.events)}", status="confirmed")
+            self.events.append(event)
+        return 200, event
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def make_client(server, **kwargs):
+    return GoogleCalendarClient(access_token="test-token", base_url=server.base_url, time_zone="Europe/Berlin",
+                                **kwargs)
+
+
+def test_event_resource():
+    """Event details map to an events.insert body with computed end time"""
+    resource = event_resource(dict(DETAILS, duration="90 minutes"), "Europe/Berlin")
+    assert resource == {
+        "summary": "Dentist", "location": "Main St",
+        "start": {"dateTime": "2025-08-22T08:00:00", "timeZone": "Europe/Berlin"},
+        "end": {"dateTime": "2025-08-22T09:30:00", "timeZone": "Europe/Berlin"},
+    }
+
+
+def test_calendar_id_argument_wins_over_environment(monkeypatch):
+    monkeypatch.setenv("GOOGLE_CALENDAR_ID", "team@example.com")
+    assert GoogleCalendarClient(access_token="t", calendar_id="me@example.com").calendar_id == "me@example.com"
+    assert GoogleCalendarClient(access_token="t").calendar_id == "team@example.com"
+    monkeypatch.delenv("GOOGLE_CALENDAR_ID")
+    assert GoogleCalendarClient(access_token="t").calendar_id == "primary"
+
+
+def test_insert_reuses_pooled_connection():
+    """Sequential inserts share one keep-alive connection"""
+    with FakeCalendarServer() as server:
+        client = make_client(server)
+        for day in range(22, 26):
+            client.insert_event(dict(DETAILS, date=f"2025-08-{day}"))
+        client.close()
+
+    assert len(server.events) == 4
+    assert len(server.connections) == 1
+    assert server.requests[0] == "/calendar/v3/calendars/primary/events"
+    assert client.stats["events_inserted"] == 4
+
+
+def test_batch_insert_reports_per_event_outcomes():
+    """Batches are split by size and each event gets its own result"""
+    events = [dict(DETAILS, title=f"Event {i}") for i in range(5)] + [{"title": "No date"}]
+    with FakeCalendarServer() as server:
+        server.reject_titles.add("Event 3")
+        results = make_client(server).insert_events(events, batch_size=2)
+
+    assert server.requests == ["/batch/calendar/v3"] * 3
+    assert [result["ok"] for result in results] == [True, True, True, False, True, False]
+    assert results[3]["error"] == "Invalid start time"
+    assert results[0]["event"]["summary"] == "Event 0"
+    assert "Date must be" in results[5]["error"]
+
+
+def test_api_errors_raise():
+    """A rejected token surfaces as GoogleCalendarAPIError"""
+    with FakeCalendarServer(token="other") as server:
+        with pytest.raises(GoogleCalendarAPIError) as error:
+            make_client(server).insert_event(DETAILS)
+    assert error.value.status == 401
+    assert parse_batch_response("multipart/mixed; boundary=b", "--b--") == []
+
+
+def test_executor_selection(monkeypatch, tmp_path):
+    """The API executor handles supported events; other events go to the GUI backends"""
+    with FakeCalendarServer() as server:
+        api = GoogleCalendarAPIExecutor(make_client(server))
+        gui = _RecordingExecutor()
+        monkeypatch.setattr(agent_s_interface, "_executors", [api, gui])
+        ledger = ExecutionLedger(str(tmp_path / "executions.sqlite3"))
+        monkeypatch.setattr(executor_router, "_default_router", executor_router.ExecutorRouter(ledger=ledger))
+
+        assert select_executor(DETAILS) is api
+        assert select_executor(dict(DETAILS, recurrence="weekly")) is gui
+        assert select_executor(None) is gui
+
+        create_calendar_event_with_agent_s("Create Dentist", DETAILS)
+        create_calendar_event_with_agent_s("Create a weekly standup")
+        assert len(server.events) == 1
+        assert gui.instructions == ["Create a weekly standup"]
+
+        # Resubmitting the same event returns the earlier result instead of creating it again
+        create_calendar_event_with_agent_s("Please create Dentist", DETAILS)
+        assert len(server.events) == 1
+
+    # Plain callables keep receiving only the instruction
+    assert run_executor(lambda instruction: instruction, "x", DETAILS) == "x"
+
+
+def test_pipeline_passes_event_details(monkeypatch):
+    """MultiLayerCalendarSystem gives a CalendarExecutor the structured event"""
+    executor = _RecordingExecutor()
+    system = MultiLayerCalendarSystem("test-key", executor=executor, use_cache=False)
+    assert system.create_calendar_event("Dentist on August 22nd at 8am for 1 hour")
+    assert executor.details[0]["title"] == "Dentist" and executor.details[0]["time"] == "08:00"
+
+
+def test_bulk_import_uses_batches():
+    """With an API client each import chunk is one batch request"""
+    rows = "title,date,time\n" + "".join(f"Event {i},2025-08-22,{8 + i}:00\n" for i in range(5))
+    with FakeCalendarServer() as server, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(rows)
+        summary = BulkImporter(chunk_size=3, api_client=make_client(server)).import_file(path)
+
+    assert summary["created"] == 5 and summary["chunks"] == 2
+    assert server.requests == ["/batch/calendar/v3"] * 2
+
+
+def test_bulk_import_does_not_retry_rejected_events():
+    """Events the API rejects with a 4xx fail at once; the rest of the chunk is created"""
+    rows = "title,date,time\n" + "".join(f"Event {i},2025-08-22,{8 + i}:00\n" for i in range(3))
+    with FakeCalendarServer() as server, tempfile.TemporaryDirectory() as tmp:
+        server.reject_titles.add("Event 1")
+        path = os.path.join(tmp, "events.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(rows)
+        summary = BulkImporter(chunk_size=3, max_attempts=3, api_client=make_client(server)).import_file(path)
+
+    assert summary["created"] == 2 and summary["failed"] == 1 and summary["chunks"] == 1
+    rejected = next(entry for entry in summary["events"].values() if entry["title"] == "Event 1")
+    assert rejected["attempts"] == 1 and rejected["error"] == "Invalid start time"
+    assert server.requests == ["/batch/calendar/v3"]
+
+
+def test_pipeline_reports_failed_or_refused_creation(monkeypatch, tmp_path):
+    """With the default executor, router errors reach the pipeline instead of counting as created"""
+    class _TimingOut(CalendarExecutor):
+        name = "slow"
+        calls = 0
+
+        def execute(self, instruction, event_details=None):
+            _TimingOut.calls += 1
+            raise TimeoutError("prompt timed out")
+
+    ledger = ExecutionLedger(str(tmp_path / "executions.sqlite3"))
+    monkeypatch.setattr(executor_router, "_default_router", executor_router.ExecutorRouter(ledger=ledger))
+    system = MultiLayerCalendarSystem("test-key", use_cache=False)
+    request = "Dentist on August 22nd at 8am for 1 hour"
+
+    monkeypatch.setattr(agent_s_interface, "_executors", [])
+    assert not system.create_calendar_event(request)
+    monkeypatch.setattr(agent_s_interface, "_executors", [_TimingOut()])
+    assert not system.create_calendar_event(request)
+    # The timed-out event may exist, so the ledger refuses the repeat and that is not a success either
+    assert not system.create_calendar_event(request)
+    assert _TimingOut.calls == 1
+
+
+class _RecordingExecutor(CalendarExecutor):
+    name = "recording"
+
+    def __init__(self):
+        self.instructions = []
+        self.details = []
+
+    def execute(self, instruction, event_details=None):
+        self.instructions.append(instruction)
+        self.details.append(event_details)
+        return "ok"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,88 @@
+"""
+Test the local instruction compiler (no API calls)
+"""
+
+from instruction_compiler import InstructionCompiler, UnsupportedEventError, compile_instruction
+from multi_layer_prompt_system import PromptEngineeringLayer
+
+EVENT = {
+    "title": "Diving Event",
+    "date": "2025-08-22",
+    "time": "08:32",
+    "duration": "2 hours",
+    "location": "",
+}
+
+
+def test_date_time_and_end_time():
+    """Dates are reformatted, times typed as digits and end time computed"""
+    instruction = InstructionCompiler().compile(EVENT)
+    assert "August 22, 2025" in instruction
+    assert "08/22/2025" in instruction
+    assert "type 832 and press ENTER" in instruction
+    assert "type 1032 and press ENTER" in instruction
+    assert "from 8:32 AM to 10:32 AM" in instruction
+    assert "Add location" not in instruction
+
+
+def test_optional_steps():
+    """Location and midnight-crossing steps only appear when needed"""
+    instruction = InstructionCompiler().compile(
+        dict(EVENT, time="23:30", duration="1 hour", location="Sentosa")
+    )
+    assert "type 2330 and press ENTER" in instruction
+    assert "type 0030 and press ENTER" in instruction
+    assert "end date is 08/23/2025" in instruction
+    assert "type: Sentosa" in instruction
+
+
+def test_missing_duration_defaults_to_one_hour():
+    """A missing duration uses the same one-hour default as the LLM prompt"""
+    instruction = InstructionCompiler().compile(dict(EVENT, duration=""))
+    assert "from 8:32 AM to 9:32 AM" in instruction
+
+
+def test_unusual_events_are_rejected():
+    """Events the template cannot express are left to the LLM"""
+    for event in (
+        dict(EVENT, recurrence="weekly"),
+        dict(EVENT, date="next Friday"),
+        dict(EVENT, time="8am"),
+        dict(EVENT, duration="3 days"),
+        dict(EVENT, title=""),
+    ):
+        try:
+            InstructionCompiler().compile(event)
+        except UnsupportedEventError:
+            pass
+        else:
+            raise AssertionError(f"Expected UnsupportedEventError for {event}")
+        assert compile_instruction(event) is None
+
+
+class _FailingClient:
+    """Stands in for openai.OpenAI and fails if the LLM is reached"""
+
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                raise AssertionError("LLM should not be called for compilable events")
+
+
+def test_generate_agent_s_instruction_skips_llm():
+    """generate_agent_s_instruction uses the compiler for ordinary events"""
+    layer = PromptEngineeringLayer("test-key", use_cache=False)
+    layer.client = _FailingClient()
+    instruction = layer.generate_agent_s_instruction(EVENT)
+    assert instruction == InstructionCompiler().compile(EVENT)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Instruction Compiler")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All instruction compiler tests passed!")
@@ -0,0 +1,196 @@
+"""
+Test the durable job queue: stage resume after a crash, leases, interrupted executions and group commits (no API calls)
+"""
+
+import threading
+
+import pytest
+import agent_s_interface
+import executor_router
+from agent_s_interface import CalendarExecutor
+from execution_ledger import ExecutionLedger
+from job_queue import (ANALYZED, DONE, EXECUTING, FAILED, INSTRUCTION_READY, QUEUED, UNKNOWN, DurableJobQueue,
+                       LeaseLostError, QueueWorker)
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+
+REQUEST = "Dentist on August 22nd at 8am for 1 hour"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def queue(tmp_path):
+    clock = Clock()
+    queue = DurableJobQueue(str(tmp_path / "jobs.sqlite3"), visibility_timeout=60, clock=clock)
+    queue.test_clock = clock
+    yield queue
+    queue.close()
+
+
+def make_system(executed):
+    system = MultiLayerCalendarSystem("test-key", executor=executed.append, use_cache=False)
+    return system
+
+
+def counting(method, calls):
+    def wrapper(*args, **kwargs):
+        calls.append(method.__name__)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def test_job_runs_through_every_stage(queue, tmp_path):
+    executed = []
+    job_id = queue.enqueue(REQUEST)
+    assert queue.get(job_id)["state"] == QUEUED
+
+    worker = QueueWorker(queue, make_system(executed), ledger=ExecutionLedger(str(tmp_path / "ledger.sqlite3")))
+    assert worker.run(until_empty=True) == 1
+    job = queue.get(job_id)
+    assert job["state"] == DONE and job["attempts"] == 1
+    assert job["event_details"]["title"].lower() == "dentist"
+    assert executed == [job["instruction"]]
+    assert queue.counts() == {DONE: 1}
+
+
+def test_restart_resumes_at_the_saved_stage(queue, tmp_path):
+    """A job whose worker died after analysis is not analyzed again once its lease expires"""
+    executed, calls = [], []
+    system = make_system(executed)
+    prompt_engineer = system.prompt_engineer
+    prompt_engineer.analyze_user_input = counting(prompt_engineer.analyze_user_input, calls)
+    prompt_engineer.generate_agent_s_instruction = counting(prompt_engineer.generate_agent_s_instruction, calls)
+    job_id = queue.enqueue(REQUEST)
+
+    crashed = QueueWorker(queue, system, worker_id="crashed")
+    (job,) = queue.claim("crashed")
+    job = queue.advance(job, ANALYZED, event_details=prompt_engineer.analyze_user_input(job.text))
+    assert queue.claim("other") == []  # still leased
+
+    queue.test_clock.now += 61
+    worker = QueueWorker(queue, system, ledger=ExecutionLedger(str(tmp_path / "ledger.sqlite3")))
+    assert worker.run(until_empty=True) == 1
+    assert calls == ["analyze_user_input", "generate_agent_s_instruction"]
+    assert queue.get(job_id)["state"] == DONE and queue.get(job_id)["attempts"] == 2
+
+    with pytest.raises(LeaseLostError):
+        crashed.queue.advance(job, INSTRUCTION_READY, instruction="late write")
+
+
+def test_interrupted_execution_is_not_repeated(queue, tmp_path):
+    """Mid-execution crashes finish from the ledger's record, or become unknown instead of running twice"""
+    ledger = ExecutionLedger(str(tmp_path / "ledger.sqlite3"))
+    executed = []
+    system = make_system(executed)
+    finished_id, interrupted_id = queue.enqueue_many([REQUEST, "Gym session next Friday at 6:30pm for 90 minutes"])
+
+    for job in queue.claim("crashed", limit=2):
+        job = queue.advance(job, EXECUTING, event_details={"title": "x"}, instruction="create x")
+        claim = ledger.claim(f"job:{job.id}")
+        if job.id == finished_id:
+            ledger.complete(claim, {"event": "created"})
+
+    queue.test_clock.now += 61
+    worker = QueueWorker(queue, system, ledger=ledger)
+    assert worker.run(until_empty=True) == 2
+    assert executed == []
+    assert queue.get(finished_id)["state"] == DONE and queue.get(finished_id)["result"] == {"event": "created"}
+    assert queue.get(interrupted_id)["state"] == UNKNOWN
+
+
+def test_failures_retry_then_give_up(queue):
+    """A definite execution failure is retried from instruction_ready until attempts run out"""
+    attempts = []
+
+    def failing(instruction):
+        attempts.append(instruction)
+        raise RuntimeError("VM error")
+
+    system = MultiLayerCalendarSystem("test-key", executor=failing, use_cache=False)
+    job_id = queue.enqueue(REQUEST)
+    worker = QueueWorker(queue, system)
+    for _ in range(4):
+        worker.run(until_empty=True)
+        assert queue.get(job_id)["state"] in (INSTRUCTION_READY, FAILED)
+        queue.test_clock.now += 10
+    job = queue.get(job_id)
+    assert job["state"] == FAILED and "gave up after 3 attempts" in job["error"]
+    assert len(attempts) == 3 and worker.stats["released"] == 3
+
+
+def test_execution_interrupted_on_the_last_attempt_is_unknown(queue):
+    """A job that keeps dying mid-execution runs out of attempts as unknown, not failed"""
+    job_id = queue.enqueue(REQUEST)
+    for attempt in range(3):
+        (job,) = queue.claim(f"crashed-{attempt}")
+        queue.advance(job, EXECUTING, event_details={"title": "x"}, instruction="create x")
+        queue.test_clock.now += 61
+    assert queue.claim("next") == []
+    job = queue.get(job_id)
+    assert job["state"] == UNKNOWN and "the event may exist" in job["error"]
+
+
+class _Backend(CalendarExecutor):
+    name = "backend"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def execute(self, instruction, event_details=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return "created"
+
+
+def test_default_executor_outcomes_reach_the_worker(queue, tmp_path, monkeypatch):
+    """Without an injected executor, router errors decide the job state and the job keeps one ledger record"""
+    router_ledger = ExecutionLedger(str(tmp_path / "router.sqlite3"))
+    monkeypatch.setattr(executor_router, "_default_router", executor_router.ExecutorRouter(ledger=router_ledger))
+    ledger = ExecutionLedger(str(tmp_path / "ledger.sqlite3"))
+    system = MultiLayerCalendarSystem("test-key", use_cache=False)
+    worker = QueueWorker(queue, system, ledger=ledger)
+
+    monkeypatch.setattr(agent_s_interface, "_executors", [_Backend()])
+    done_id = queue.enqueue(REQUEST)
+    worker.run(until_empty=True)
+    assert queue.get(done_id)["state"] == DONE and queue.get(done_id)["result"] == "created"
+
+    broken = _Backend(RuntimeError("VM error"))
+    monkeypatch.setattr(agent_s_interface, "_executors", [broken])
+    failed_id = queue.enqueue("Gym session next Friday at 6:30pm for 90 minutes")
+    worker.run(until_empty=True)
+    assert queue.get(failed_id)["state"] == INSTRUCTION_READY and broken.calls == 1
+
+    slow = _Backend(TimeoutError("prompt timed out"))
+    monkeypatch.setattr(agent_s_interface, "_executors", [slow])
+    unknown_id = queue.enqueue("Lunch with Sam tomorrow at noon")
+    worker.run(until_empty=True)
+    assert queue.get(unknown_id)["state"] == UNKNOWN and slow.calls == 1
+    assert ledger.status(f"job:{unknown_id}")["status"] == "unknown"
+    assert ledger.status(f"job:{done_id}")["status"] == "completed"
+    assert router_ledger.status(f"job:{done_id}") is None
+    assert router_ledger.stats["claims"] == 0
+
+
+def test_concurrent_writes_share_commits(queue):
+    """Enqueues from many threads are committed in far fewer transactions"""
+    threads = [threading.Thread(target=lambda: [queue.enqueue(f"event {i}") for i in range(50)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer = queue.metrics()["writer"]
+    assert queue.counts() == {QUEUED: 400}
+    assert writer["statements"] == 400 and writer["commits"] < 200
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,123 @@
+"""
+Test the HTTP job service: immediate job IDs, polling, server-sent progress and bounded queueing (no API calls)
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from job_service import JobManager, JobQueueFullError, JobServer
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+
+
+def request(method, url, body=None, headers=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, response.read().decode("utf-8"), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8"), e.headers
+
+
+def wait_done(url, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = json.loads(request("GET", f"{url}/jobs/{job_id}")[1])
+        if status["status"] in ("succeeded", "failed"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+class BlockingSystem:
+    """Stands in for MultiLayerCalendarSystem; jobs wait until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def create_calendar_event(self, user_input, ask=None, progress=None):
+        progress.stage("execute")
+        self.release.wait(10)
+        progress.finished(True, {"event_details": {"title": user_input}})
+        return True
+
+
+@pytest.fixture
+def service():
+    executed = []
+    system = MultiLayerCalendarSystem("test-key", executor=executed.append, use_cache=False)
+    manager = JobManager(system, max_workers=2)
+    server = JobServer(manager, port=0)
+    yield server.url, executed
+    server.close()
+    manager.shutdown()
+
+
+def test_submit_returns_immediately_and_job_can_be_polled(service):
+    url, executed = service
+    status, body, headers = request("POST", f"{url}/jobs", {"text": "Dentist on August 22nd at 8am for 1 hour"})
+    assert status == 202
+    job = json.loads(body)
+    assert headers["Location"] == f"/jobs/{job['id']}"
+
+    result = wait_done(url, job["id"])
+    assert result["status"] == "succeeded" and result["success"] is True
+    assert result["event_details"]["title"].lower() == "dentist"
+    assert "analyze" in result["timings"]
+    assert len(executed) == 1
+
+
+def test_events_stream_progress_and_resume(service):
+    """The SSE stream replays from the start, follows to the finished event, and honours Last-Event-ID"""
+    url, _ = service
+    job = json.loads(request("POST", f"{url}/jobs", {"text": "Gym session next Friday at 6:30pm for 90 minutes"})[1])
+    status, body, headers = request("GET", f"{url}/jobs/{job['id']}/events")
+    assert status == 200 and headers["Content-Type"] == "text/event-stream"
+    events = [block for block in body.split("\n\n") if block.startswith("id:")]
+    kinds = [block.split("\n")[1] for block in events]
+    assert "event: stage" in kinds and kinds[-1] == "event: finished"
+    assert json.loads(events[-1].split("data: ", 1)[1])["data"]["success"] is True
+
+    _, replay, _ = request("GET", f"{url}/jobs/{job['id']}/events", headers={"Last-Event-ID": "2"})
+    assert replay.startswith("id: 3\n")
+
+
+def test_bad_requests_and_unknown_jobs(service):
+    url, _ = service
+    assert request("POST", f"{url}/jobs", {"answers": {}})[0] == 400
+    assert request("GET", f"{url}/jobs/missing")[0] == 404
+    status, body, _ = request("GET", f"{url}/health")
+    assert status == 200 and json.loads(body)["workers"] == 2
+
+
+def test_queue_is_bounded():
+    """Jobs beyond the workers wait in a bounded queue; more are rejected with 429"""
+    system = BlockingSystem()
+    manager = JobManager(system, max_workers=1, max_queued=2)
+    server = JobServer(manager, port=0)
+    try:
+        ids = [json.loads(request("POST", f"{server.url}/jobs", {"text": "event 0"})[1])["id"]]
+        while manager.metrics()["running"] < 1:
+            time.sleep(0.01)
+        ids += [json.loads(request("POST", f"{server.url}/jobs", {"text": f"event {i}"})[1])["id"] for i in (1, 2)]
+        status, _, headers = request("POST", f"{server.url}/jobs", {"text": "one too many"})
+        assert status == 429 and headers["Retry-After"] == "5"
+        with pytest.raises(JobQueueFullError):
+            manager.submit("another")
+        assert manager.metrics()["rejected"] == 2
+
+        system.release.set()
+        assert all(wait_done(server.url, job_id)["success"] for job_id in ids)
+        assert manager.metrics()["succeeded"] == 3
+    finally:
+        system.release.set()
+        server.close()
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
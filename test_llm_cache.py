@@ -0,0 +1,144 @@
+"""
+Test the persistent LLM response cache (no API calls)
+"""
+
+import os
+import tempfile
+import threading
+import time
+import llm_cache
+from llm_cache import LLMResponseCache
+from multi_layer_prompt_system import PromptEngineeringLayer
+
+MESSAGES = [
+    {"role": "system", "content": "You are a calendar event analyzer."},
+    {"role": "user", "content": "Analyze this calendar request: gym at 8am"},
+]
+
+
+def make_cache(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    return LLMResponseCache(path=path, **kwargs)
+
+
+def test_hit_and_miss_counters():
+    """Identical requests hit; any change to the key misses"""
+    cache = make_cache()
+    assert cache.get("gpt-4", MESSAGES, 0.3) is None
+    cache.set("gpt-4", MESSAGES, 0.3, '{"ok": true}')
+    assert cache.get("gpt-4", MESSAGES, 0.3) == '{"ok": true}'
+    assert cache.get("gpt-4", MESSAGES, 0.2) is None
+    assert cache.get("gpt-4o", MESSAGES, 0.3) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 1
+
+
+def test_default_path_does_not_depend_on_the_working_directory():
+    """The default cache lives next to the module, not wherever the agent was started"""
+    assert os.path.isabs(llm_cache.DEFAULT_CACHE_PATH)
+    assert os.path.dirname(os.path.dirname(llm_cache.DEFAULT_CACHE_PATH)) == os.path.dirname(
+        os.path.abspath(llm_cache.__file__))
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL are treated as misses"""
+    cache = make_cache(ttl_seconds=0.05)
+    cache.set("gpt-4", MESSAGES, 0.3, "old")
+    time.sleep(0.1)
+    assert cache.get("gpt-4", MESSAGES, 0.3) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    """The least recently used entry is evicted when the cache is full"""
+    cache = make_cache(max_entries=2)
+    first = [{"role": "user", "content": "first"}]
+    second = [{"role": "user", "content": "second"}]
+    third = [{"role": "user", "content": "third"}]
+    cache.set("gpt-4", first, 0.0, "1")
+    time.sleep(0.01)
+    cache.set("gpt-4", second, 0.0, "2")
+    time.sleep(0.01)
+    assert cache.get("gpt-4", first, 0.0) == "1"  # first is now more recent than second
+    cache.set("gpt-4", third, 0.0, "3")
+
+    assert cache.get("gpt-4", second, 0.0) is None
+    assert cache.get("gpt-4", first, 0.0) == "1"
+    assert cache.get("gpt-4", third, 0.0) == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_writers():
+    """Many threads can read and write the same cache file"""
+    cache = make_cache(max_entries=50)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                messages = [{"role": "user", "content": f"{n}-{i % 5}"}]
+                cache.set("gpt-4", messages, 0.0, str(i))
+                cache.get("gpt-4", messages, 0.0)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert cache.stats()["entries"] <= 50
+
+
+class _CountingClient:
+    """Stands in for openai.OpenAI and counts completions"""
+
+    def __init__(self, content):
+        self.calls = 0
+        client = self
+
+        class _Completions:
+            @staticmethod
+            def create(**kwargs):
+                client.calls += 1
+                message = type("Message", (), {"content": content})
+                choice = type("Choice", (), {"message": message})
+                return type("Response", (), {"choices": [choice]})
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+
+def test_prompt_layer_uses_cache():
+    """Repeated Layer 1 calls are served from the cache"""
+    layer = PromptEngineeringLayer("test-key", use_fast_path=False, cache=make_cache())
+    layer.client = _CountingClient(
+        '{"extracted_details": {}, "missing_details": [], "confidence": 0.5, "clarification_questions": []}'
+    )
+    first = layer.analyze_user_input("something unusual every other week")
+    second = layer.analyze_user_input("something unusual every other week")
+    assert first == second
+    assert layer.client.calls == 1
+
+
+def test_unparseable_responses_are_not_cached():
+    """Responses that fail to parse as JSON are not stored"""
+    layer = PromptEngineeringLayer("test-key", use_fast_path=False, cache=make_cache())
+    layer.client = _CountingClient("not json")
+    layer.analyze_user_input("something unusual")
+    layer.analyze_user_input("something unusual")
+    assert layer.client.calls == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing LLM Response Cache")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All cache tests passed!")
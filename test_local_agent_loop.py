@@ -0,0 +1,119 @@
+"""
+Test the local Agent-S perception/action loop with a scripted planner, driver and screen
+"""
+
+import pytest
+from PIL import Image, ImageDraw
+from local_agent_loop import LocalAgentLoop, UnsupportedActionError, batch_keystrokes, parse_actions
+
+AGENT_S_CODE = "import pyautogui; pyautogui.click(640, 120); pyautogui.write('Dentist'); pyautogui.press('enter')"
+
+
+class FakeScreen:
+    """The 'screen' shows one bar per executed action, so every action visibly changes it"""
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, action):
+        self.executed.append(action)
+
+    def capture(self):
+        image = Image.new("RGB", (640, 400), "white")
+        draw = ImageDraw.Draw(image)
+        for index in range(len(self.executed)):
+            draw.rectangle([20, 20 + index * 30, 300, 40 + index * 30], fill="black")
+        return image
+
+
+class ScriptedPlanner:
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.calls = []
+
+    def __call__(self, instruction, frame, history):
+        self.calls.append(list(history))
+        return parse_actions(self.steps.pop(0))
+
+
+def make_loop(screen, planner, **kwargs):
+    return LocalAgentLoop(planner, screen, screen.capture, poll_interval=0, settle_timeout=0.5,
+                          change_timeout=0.05, **kwargs)
+
+
+def test_parse_and_batch_agent_s_code():
+    """pyautogui code becomes structured actions; typing and Enter go out as one write()"""
+    actions = parse_actions(AGENT_S_CODE)
+    assert actions == [
+        {"type": "click", "x": 640, "y": 120, "clicks": 1, "button": "left"},
+        {"type": "type", "text": "Dentist"},
+        {"type": "press", "key": "enter"},
+    ]
+    assert batch_keystrokes(actions + parse_actions("pyautogui.hotkey('ctrl', 's')")) == [
+        actions[0], {"type": "type", "text": "Dentist\n"}, {"type": "hotkey", "keys": ["ctrl", "s"]}]
+    assert parse_actions("DONE") == [{"type": "done"}]
+    assert parse_actions("pyautogui.doubleClick(1, 2)")[0]["clicks"] == 2
+
+
+def test_unsafe_code_is_rejected():
+    """Anything other than plain pyautogui/time calls is refused instead of exec'd"""
+    for code in ("import os; os.system('rm -rf /')", "x = 1", "pyautogui.click(__import__('os'))"):
+        with pytest.raises(UnsupportedActionError):
+            parse_actions(code)
+
+
+def test_loop_runs_until_done_with_step_timings():
+    """Steps execute in order until the planner reports DONE"""
+    screen = FakeScreen()
+    planner = ScriptedPlanner([AGENT_S_CODE, "pyautogui.click(900, 700)", "DONE"])
+    result = make_loop(screen, planner).run("Create Dentist")
+
+    assert result.success and result.reason == "planner reported DONE"
+    assert [step.index for step in result.state.steps] == [1, 2]
+    assert len(screen.executed) == 3  # click, batched "Dentist\n", click
+    assert all(step.screen_changed for step in result.state.steps)
+    assert planner.calls[2][0]["actions"][1] == {"type": "type", "text": "Dentist\n"}
+
+
+def test_goal_check_stops_early():
+    """A goal check on the fresh frame ends the run without another model call"""
+    screen = FakeScreen()
+    planner = ScriptedPlanner([AGENT_S_CODE, "pyautogui.click(1, 1)"])
+    result = make_loop(screen, planner, goal_check=lambda frame: len(screen.executed) >= 2).run("Create Dentist")
+    assert result.success and result.reason == "goal detected"
+    assert len(planner.calls) == 1
+
+
+def test_failed_step_resumes_from_last_good_step():
+    """A driver error returns a resumable state; resuming continues with the next step"""
+    screen = FakeScreen()
+    planner = ScriptedPlanner(["pyautogui.click(1, 1)", "pyautogui.click(2, 2)", "pyautogui.click(2, 2)", "DONE"])
+    loop = make_loop(screen, planner)
+
+    def fail_second_step(action, original=screen.execute):
+        if action["x"] == 2 and not getattr(screen, "failed", False):
+            screen.failed = True
+            raise RuntimeError("window lost focus")
+        original(action)
+
+    screen.execute = fail_second_step
+    first = loop.run("Create Dentist")
+    assert not first.success and first.resumable and first.state.last_good_step == 1
+
+    second = loop.run("Create Dentist", resume=first.state)
+    assert second.success
+    assert [step.index for step in second.state.steps] == [1, 2]
+    assert planner.calls[2] == first.state.history[:1]
+
+
+def test_max_steps_bound():
+    """The loop stops after max_steps planner calls"""
+    screen = FakeScreen()
+    planner = ScriptedPlanner([f"pyautogui.click({i}, {i})" for i in range(10)])
+    result = make_loop(screen, planner, max_steps=3).run("Create Dentist")
+    assert not result.success and not result.resumable
+    assert len(result.state.steps) == 3
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
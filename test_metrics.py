@@ -0,0 +1,86 @@
+"""
+Test streaming histograms, labelled registry, the Prometheus endpoint and agent latency percentiles
+"""
+
+import random
+import urllib.request
+
+import pytest
+from metrics import MetricsRegistry, MetricsServer, StreamingHistogram, get_default_registry
+from performance_optimizer import OptimizedCalendarAgent
+
+
+def test_quantiles_within_relative_error():
+    """p50/p90/p99 stay within 1% of the exact nearest-rank values"""
+    rng = random.Random(3)
+    values = [rng.lognormvariate(0, 1.5) for _ in range(20000)]
+    histogram = StreamingHistogram(precision=0.01)
+    for value in values:
+        histogram.observe(value)
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[max(1, int(-(-q * len(ordered) // 1))) - 1]
+        assert histogram.quantile(q) == pytest.approx(exact, rel=0.01)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 20000
+    assert snapshot["min"] == ordered[0] and snapshot["max"] == ordered[-1]
+
+
+def test_memory_depends_on_range_not_count():
+    """A million samples over a fixed range use a bounded number of buckets"""
+    histogram = StreamingHistogram()
+    for i in range(1_000_000):
+        histogram.observe(0.01 + (i % 1000) * 0.01)  # 10 ms .. 10 s
+    # log(1000) / log(1.01 / 0.99) ~ 346 buckets
+    assert histogram.bucket_count < 400
+    assert StreamingHistogram().quantile(0.5) == 0.0
+
+
+def test_prometheus_text_and_endpoint():
+    """Labelled histograms render as summaries and are served on /metrics"""
+    registry = MetricsRegistry()
+    registry.observe("calendar_stage_seconds", 0.2, "Stage durations", stage="analyze", pipeline="multi_call")
+    registry.observe("calendar_stage_seconds", 1.5, stage="execute", pipeline="multi_call")
+    registry.inc("cache_hits_total", 2, stage="analyze")
+    text = registry.render_prometheus()
+    assert "# HELP calendar_stage_seconds Stage durations" in text
+    assert "# TYPE calendar_stage_seconds summary" in text
+    assert 'calendar_stage_seconds{pipeline="multi_call",stage="analyze",quantile="0.5"} 0.2' in text
+    assert 'calendar_stage_seconds_count{pipeline="multi_call",stage="execute"} 1' in text
+    assert 'cache_hits_total{stage="analyze"} 2' in text
+
+    server = MetricsServer(registry, port=0)
+    try:
+        with urllib.request.urlopen(server.url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode("utf-8") == registry.render_prometheus()
+    finally:
+        server.close()
+
+
+class _FakeComputer:
+    def prompt(self, instruction):
+        if "bad" in instruction:
+            raise RuntimeError("VM error")
+        return "done"
+
+
+def test_agent_reports_percentiles():
+    """get_performance_metrics keeps its keys, adds p50/p90/p99, and feeds the labelled registry"""
+    agent = OptimizedCalendarAgent("test-project", use_cache=False, max_retries=1, computers=[_FakeComputer()])
+    assert agent.get_performance_metrics()["total_operations"] == 0
+    before = get_default_registry().histogram("calendar_operation_seconds", operation="prompt", backend="orgo",
+                                              outcome="failure").count
+    agent.batch_operations(["good 1", "good 2", "bad 3"])
+
+    metrics = agent.get_performance_metrics()
+    assert metrics["total_operations"] == 3 and metrics["success_count"] == 2
+    assert metrics["min_time"] <= metrics["p50_time"] <= metrics["p99_time"] <= metrics["max_time"]
+    assert set(metrics) >= {"success_rate", "average_time", "p90_time", "retries"}
+    after = get_default_registry().histogram("calendar_operation_seconds", operation="prompt", backend="orgo",
+                                             outcome="failure").count
+    assert after - before == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
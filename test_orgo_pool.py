@@ -0,0 +1,150 @@
+"""
+Test the warm Orgo computer pool with fake computers (no Orgo calls)
+"""
+
+import threading
+import time
+import pytest
+from orgo_pool import ComputerPool, PoolExhaustedError
+
+
+class FakeComputer:
+    """Stands in for orgo.Computer and records lifecycle calls"""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.state = "running"
+        self.starts = 0
+        self.stops = 0
+        self.fail_status = False
+
+    def start(self):
+        self.starts += 1
+        self.state = "running"
+
+    def stop(self):
+        self.stops += 1
+        self.state = "stopped"
+
+    def status(self):
+        if self.fail_status:
+            raise ConnectionError("unreachable")
+        return {"status": self.state}
+
+    def prompt(self, instruction):
+        return f"done: {instruction}"
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory(project_id):
+        computer = FakeComputer(project_id)
+        created.append(computer)
+        return computer
+
+    return ComputerPool(factory=factory, **kwargs), created
+
+
+def test_warm_computer_is_reused():
+    """Sequential leases reuse the warm computer instead of connecting again"""
+    pool, created = make_pool(project_ids=["project-a"], min_size=1, max_size=2)
+    pool.warm_up()
+    assert len(created) == 1 and created[0].starts == 1
+
+    for i in range(3):
+        with pool.lease() as computer:
+            assert computer.prompt(f"event {i}") == f"done: event {i}"
+
+    stats = pool.stats()
+    assert len(created) == 1
+    assert stats["leases"] == 3
+    assert stats["size"] == 1 and stats["idle"] == 1
+
+
+def test_project_ids_assigned_before_new_computers():
+    """Concurrent leases take configured projects first, then new computers"""
+    pool, created = make_pool(project_ids=["project-a"], max_size=2)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.project_id, second.project_id} == {"project-a", None}
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["size"] == 2
+
+
+def test_lease_waits_for_release_and_times_out():
+    """A full pool blocks until a computer is returned, or raises after the timeout"""
+    pool, _ = make_pool(max_size=1)
+    entry = pool.acquire()
+
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire(timeout=0.05)
+
+    threading.Timer(0.05, pool.release, args=(entry,)).start()
+    with pool.lease(timeout=2) as computer:
+        assert computer is entry.computer
+
+
+def test_stopped_computer_is_restarted():
+    """A computer found stopped on a health check is started again, not replaced"""
+    pool, created = make_pool(max_size=1, health_check_interval=0)
+    with pool.lease() as computer:
+        pass
+    computer.stop()
+
+    with pool.lease() as again:
+        assert again is computer
+    assert computer.state == "running"
+    assert len(created) == 1
+
+
+def test_unreachable_computer_is_replaced():
+    """A computer whose status check fails is discarded and a new one is created"""
+    pool, created = make_pool(max_size=1, health_check_interval=0)
+    with pool.lease() as computer:
+        pass
+    computer.fail_status = True
+
+    with pool.lease() as replacement:
+        assert replacement is not computer
+    assert len(created) == 2
+    assert pool.stats()["health_failures"] == 1
+    assert computer.stops == 1  # stopped best-effort even though its status check fails
+
+
+def test_failed_lease_forces_health_check():
+    """An exception inside a lease triggers a status check before the next lease"""
+    pool, created = make_pool(max_size=1, health_check_interval=3600)
+    with pytest.raises(RuntimeError):
+        with pool.lease() as computer:
+            computer.fail_status = True
+            raise RuntimeError("prompt failed")
+
+    with pool.lease() as replacement:
+        assert replacement is not computer
+    assert len(created) == 2
+
+
+def test_idle_computers_above_min_size_are_evicted():
+    """Only idle computers beyond min_size are stopped and removed"""
+    pool, created = make_pool(min_size=1, max_size=3, idle_timeout=0.01)
+    entries = [pool.acquire() for _ in range(3)]
+    for entry in entries:
+        pool.release(entry)
+    time.sleep(0.02)
+
+    assert pool.evict_idle() == 2
+    stats = pool.stats()
+    assert stats["size"] == 1 and stats["evicted"] == 2
+    assert sum(computer.stops for computer in created) == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Orgo Computer Pool")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All pool tests passed!")
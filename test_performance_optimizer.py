@@ -0,0 +1,127 @@
+"""
+Test OptimizedCalendarAgent batching with fake Orgo computers (no API calls)
+"""
+
+import threading
+import time
+from orgo_pool import ComputerPool
+from performance_optimizer import OptimizedCalendarAgent
+
+
+class _FakeComputer:
+    """Stands in for orgo.Computer; prompt() sleeps and echoes"""
+
+    def __init__(self, delay=0.05, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.prompts = []
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def prompt(self, instruction):
+        with self.lock:
+            self.prompts.append(instruction)
+        time.sleep(self.delay)
+        if self.fail_on and self.fail_on in instruction:
+            raise RuntimeError("VM error")
+        return f"done: {instruction}"
+
+    def stop(self):
+        self.stopped = True
+
+
+def make_agent(computers, max_retries=1):
+    return OptimizedCalendarAgent("test-project", use_cache=False, max_retries=max_retries, computers=computers)
+
+
+def test_batch_runs_in_parallel_and_keeps_order():
+    """Operations fan out across computers and results stay in input order"""
+    computers = [_FakeComputer() for _ in range(4)]
+    agent = make_agent(computers)
+    operations = [f"event {i}" for i in range(8)]
+
+    start = time.time()
+    results = agent.batch_operations(operations)
+    elapsed = time.time() - start
+
+    assert [r["operation"] for r in results] == operations
+    assert all(r["status"] == "success" for r in results)
+    assert all(r["result"] == f"done: {r['operation']}" for r in results)
+    assert all(r["duration"] > 0 for r in results)
+    assert {r["computer"] for r in results} == {0, 1, 2, 3}
+    assert elapsed < 8 * 0.05  # sequential would take at least 0.4s
+    assert sum(len(c.prompts) for c in computers) == 8
+
+
+def test_max_concurrency_limits_computers():
+    """max_concurrency caps how many computers are used"""
+    computers = [_FakeComputer(delay=0.01) for _ in range(4)]
+    agent = make_agent(computers)
+    results = agent.batch_operations([f"event {i}" for i in range(6)], max_concurrency=2)
+    assert {r["computer"] for r in results} <= {0, 1}
+    assert not computers[2].prompts and not computers[3].prompts
+
+
+def test_failures_keep_result_shape():
+    """A failed operation is reported without stopping the rest of the batch"""
+    agent = make_agent([_FakeComputer(delay=0.01, fail_on="bad") for _ in range(2)])
+    results = agent.batch_operations(["good 1", "bad 2", "good 3"])
+    assert [r["status"] for r in results] == ["success", "failed", "success"]
+    assert results[1]["result"] == "VM error"
+
+    metrics = agent.get_performance_metrics()
+    assert metrics["success_count"] == 2
+    assert metrics["failure_count"] == 1
+
+
+
+def test_computers_are_leased_from_the_pool_per_call():
+    """A shared pool's computers are leased for each prompt or batch, not for the agent's lifetime"""
+    created = []
+
+    def factory(project_id):
+        created.append(project_id)
+        return _FakeComputer(delay=0.01)
+
+    pool = ComputerPool(project_ids=["p1", "p2"], max_size=2, factory=factory)
+    agent = OptimizedCalendarAgent("p1", use_cache=False, project_ids=["p1", "p2"], pool=pool)
+    assert created == [] and pool.stats()["leased"] == 0
+    results = agent.batch_operations(["a", "b", "c"])
+    assert [r["status"] for r in results] == ["success"] * 3
+    assert sorted(created) == ["p1", "p2"] and {r["computer"] for r in results} == {0, 1}
+    assert pool.stats()["leased"] == 0
+
+    # Another user of the pool (e.g. the Orgo executor) gets a computer while the agent is alive
+    with pool.lease(timeout=0) as computer:
+        assert computer.prompt("x") == "done: x"
+    assert agent.optimized_prompt("d") == "done: d"
+    assert pool.stats()["leased"] == 0 and len(created) == 2
+    agent.close()
+
+
+
+def test_close_stops_the_extra_computers(monkeypatch):
+    """Computers started for new projects are stopped on close; the project's own computer keeps running"""
+    created = []
+
+    def factory(self, project_id):
+        created.append((project_id, _FakeComputer(delay=0.01)))
+        return created[-1][1]
+
+    monkeypatch.setattr(ComputerPool, "_default_factory", factory)
+    agent = OptimizedCalendarAgent("own-project", use_cache=False, num_computers=3)
+    assert len(agent.computers) == 3
+    agent.close()
+    assert sorted((project_id or "", computer.stopped) for project_id, computer in created) == [
+        ("", True), ("", True), ("own-project", False)]
+    assert agent.pool.stats()["size"] == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Optimized Agent Batching")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All batching tests passed!")
@@ -0,0 +1,92 @@
+"""
+Test the single-call and multi-call Layer 1 pipelines (no API calls)
+"""
+
+import json
+from multi_layer_prompt_system import MultiLayerCalendarSystem, SINGLE_CALL_RESPONSE_FORMAT
+
+# The fast path rejects recurring events, so these requests reach the (fake) LLM
+UNUSUAL_INPUT = "Team standup every Monday at 9am for 30 minutes"
+
+SINGLE_CALL_RESPONSE = {
+    "extracted_details": {
+        "title": "Team standup", "date": "2025-02-03", "time": "09:00",
+        "duration": "30 minutes", "location": ""
+    },
+    "missing_details": [],
+    "confidence": 0.95,
+    "clarification_questions": [],
+    "agent_s_instruction": "Open Google Calendar and create the Team standup event."
+}
+
+
+class _ScriptedClient:
+    """Stands in for openai.OpenAI and replays canned responses"""
+
+    def __init__(self, responses):
+        self.requests = []
+        client = self
+
+        class _Completions:
+            @staticmethod
+            def create(**kwargs):
+                client.requests.append(kwargs)
+                content = responses[len(client.requests) - 1]
+                message = type("Message", (), {"content": content})
+                choice = type("Choice", (), {"message": message})
+                return type("Response", (), {"choices": [choice]})
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+
+def make_system(mode, responses):
+    system = MultiLayerCalendarSystem("test-key", pipeline_mode=mode, use_cache=False)
+    system.prompt_engineer.client = _ScriptedClient(responses)
+    return system
+
+
+def test_single_call_makes_one_request():
+    """The single-call pipeline returns details and instruction from one structured request"""
+    system = make_system("single_call", [json.dumps(SINGLE_CALL_RESPONSE)])
+    details, instruction = system.prepare_event(UNUSUAL_INPUT, ask=lambda questions: {})
+
+    requests = system.prompt_engineer.client.requests
+    assert len(requests) == 1
+    assert requests[0]["response_format"] == SINGLE_CALL_RESPONSE_FORMAT
+    assert requests[0]["model"] == "gpt-4o"
+    assert "location" not in details  # empty strings are dropped
+    assert instruction == SINGLE_CALL_RESPONSE["agent_s_instruction"]
+    assert "analyze" in system.last_timings and "generate" not in system.last_timings
+
+
+def test_multi_call_flow_unchanged():
+    """The default pipeline still analyzes with the LLM and compiles the instruction locally"""
+    analysis = dict(SINGLE_CALL_RESPONSE)
+    analysis.pop("agent_s_instruction")
+    system = make_system("multi_call", [json.dumps(analysis)])
+    details, instruction = system.prepare_event(UNUSUAL_INPUT, ask=lambda questions: {})
+
+    requests = system.prompt_engineer.client.requests
+    assert len(requests) == 1
+    assert "response_format" not in requests[0]
+    assert "Team standup" in instruction
+    assert set(system.last_timings) >= {"analyze", "generate", "layer1_total"}
+
+
+def test_invalid_mode_rejected():
+    """Unknown pipeline modes are rejected"""
+    try:
+        MultiLayerCalendarSystem("test-key", pipeline_mode="two_call")
+    except ValueError:
+        return
+    raise AssertionError("Expected ValueError for an unknown pipeline mode")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Layer 1 Pipeline Modes")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All pipeline mode tests passed!")
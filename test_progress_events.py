@@ -0,0 +1,68 @@
+"""
+Test the progress event bus and concurrent progress reporting (no API calls)
+"""
+
+import threading
+import multi_layer_prompt_system
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+from progress_events import ProgressBus, ProgressEvent
+
+
+def test_bus_drains_in_order_without_blocking():
+    """drain returns queued events in publish order and never blocks"""
+    bus = ProgressBus()
+    assert bus.drain() == []
+
+    reporter = bus.reporter("abc")
+    reporter.stage("analyze")
+    reporter.log("hello")
+    reporter.token("tok")
+    reporter.finished(True, {"timings": {"analyze": 0.1}})
+
+    events = bus.drain(max_events=3)
+    assert [event.kind for event in events] == ["stage", "log", "token"]
+    assert all(isinstance(event, ProgressEvent) and event.request_id == "abc" for event in events)
+
+    finished = bus.drain()
+    assert len(finished) == 1
+    assert finished[0].data == {"timings": {"analyze": 0.1}, "success": True}
+
+
+def test_concurrent_requests_report_separately(monkeypatch):
+    """Requests running in parallel on one system publish under their own IDs"""
+    executed = []
+    monkeypatch.setattr(multi_layer_prompt_system, "create_calendar_event_with_agent_s", executed.append)
+    system = MultiLayerCalendarSystem("test-key", use_cache=False)
+    bus = ProgressBus()
+
+    inputs = {
+        "r1": "Dentist on August 22nd at 8am for 1 hour",
+        "r2": "Gym session on August 23rd at 6pm for 2 hours",
+    }
+    threads = [
+        threading.Thread(
+            target=system.create_calendar_event,
+            args=(text,),
+            kwargs={"ask": lambda questions: {}, "progress": bus.reporter(request_id)},
+        )
+        for request_id, text in inputs.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = bus.drain()
+    assert len(executed) == 2
+    for request_id, text in inputs.items():
+        own = [event for event in events if event.request_id == request_id]
+        assert own[0].message == f"🎯 Processing request: {text}"
+        assert [event.message for event in own if event.kind == "stage"] == ["analyze", "generate", "execute"]
+        finished = [event for event in own if event.kind == "finished"]
+        assert len(finished) == 1 and finished[0].data["success"] is True
+        assert {"analyze", "generate", "layer1_total", "execute"} <= set(finished[0].data["timings"])
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,197 @@
+"""
+Test the OpenAI rate limiter and single-flight coalescing (fake clocks and clients, no API calls)
+"""
+
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from multi_layer_prompt_system import PromptEngineeringLayer
+from rate_limiter import RateLimiter, RateLimitTimeout, SingleFlight
+from resilience import CircuitBreaker, RetryEngine
+
+ANALYSIS = {"extracted_details": {"title": "Lunch"}, "missing_details": [], "confidence": 0.9,
+            "clarification_questions": []}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(rpm, tpm, **kwargs):
+    clock, sleeps = Clock(), []
+    return RateLimiter(rpm, tpm, clock=clock, sleep=sleeps.append, **kwargs), clock, sleeps
+
+
+def test_requests_wait_in_order_once_the_burst_is_used():
+    """A full minute of requests goes out at once; later ones queue behind each other"""
+    limiter, clock, sleeps = make_limiter(60, 0)
+    assert all(limiter.acquire() == 0 for _ in range(60))
+    assert limiter.acquire() == pytest.approx(1.0)
+    assert limiter.acquire() == pytest.approx(2.0)
+    clock.now += 10
+    assert limiter.acquire() == 0
+    assert sleeps == pytest.approx([1.0, 2.0])
+    assert limiter.metrics()["waited"] == 2
+
+
+def test_token_budget_and_settlement():
+    """Token reservations wait for refill, max_wait gives the reservation back, usage is settled"""
+    limiter, clock, _ = make_limiter(0, 600)  # 10 tokens per second
+    assert limiter.reserve(500) == 0
+    with pytest.raises(RateLimitTimeout):
+        limiter.reserve(200, max_wait=5)
+    assert limiter.reserve(200) == pytest.approx(10.0)
+    limiter.adjust_tokens(-300)  # the first call used 300 tokens fewer than reserved
+    assert limiter.reserve(0) == 0
+
+
+def test_async_reservations_run_off_the_event_loop():
+    """aacquire runs the (lock-taking) reserve in a worker thread"""
+    limiter, _, _ = make_limiter(60, 0)
+    threads = []
+    reserve = limiter.reserve
+    limiter.reserve = lambda *args: threads.append(threading.get_ident()) or reserve(*args)
+
+    async def run():
+        return await limiter.aacquire(), threading.get_ident()
+
+    waited, loop_thread = asyncio.run(run())
+    assert waited == 0 and threads and threads[0] != loop_thread
+
+
+def test_retried_completion_settles_every_reservation():
+    """A failed attempt gives its tokens back, so a retried call costs the tokens of one call"""
+    def make_layer(failures):
+        def create(**request):
+            if failures:
+                raise failures.pop(0)
+            message = SimpleNamespace(content=json.dumps(ANALYSIS))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        layer = PromptEngineeringLayer("test-key", use_cache=False, use_fast_path=False)
+        layer.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        layer.rate_limiter, _, _ = make_limiter(0, 60000)
+        layer.retry_engine = RetryEngine("test", sleep=lambda seconds: None, breaker=CircuitBreaker("test"))
+        return layer
+
+    once, retried = make_layer([]), make_layer([ConnectionError("reset"), ConnectionError("reset")])
+    assert once.analyze_user_input("lunch with Sam") == retried.analyze_user_input("lunch with Sam") == ANALYSIS
+    assert retried.retry_engine.decisions["retry"] == 2
+    assert retried.rate_limiter._buckets["tokens"].level == pytest.approx(once.rate_limiter._buckets["tokens"].level)
+
+
+def test_state_file_is_shared_between_limiters(tmp_path):
+    """Limiters in different processes coordinate through the locked state file"""
+    path = str(tmp_path / "openai-limits.json")
+    first, clock, _ = make_limiter(2, 0, state_path=path)
+    second = RateLimiter(2, 0, state_path=path, clock=clock)
+    assert first.reserve() == 0 and second.reserve() == 0
+    assert first.reserve() == pytest.approx(30.0)
+    with open(path) as f:
+        assert set(json.load(f)) == {"requests"}
+
+
+def test_single_flight_shares_one_call():
+    """Concurrent identical calls run once and all get the result (or the error)"""
+    flight = SingleFlight()
+    calls, results = [], []
+    barrier = threading.Barrier(5)
+
+    def operation():
+        calls.append(1)
+        time.sleep(0.1)
+        return "completion"
+
+    def caller():
+        barrier.wait()
+        results.append(flight.do("key", operation))
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flight.stats == {"leaders": 1, "shared": 4}
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def gather():
+        return await asyncio.gather(*(flight.ado("key", failing) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(gather())
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert flight.stats == {"leaders": 2, "shared": 6}
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    """Cancelling the task that runs a shared call doesn't cancel the tasks waiting on it"""
+    flight = SingleFlight()
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return f"completion {len(calls)}"
+
+    async def run():
+        leader = asyncio.create_task(flight.ado("key", operation))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.ado("key", operation)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader.cancelled(), results
+
+    cancelled, results = asyncio.run(run())
+    assert cancelled and len(calls) == 2
+    assert sorted(results) == [("completion 2", False), ("completion 2", True)]
+
+
+def test_identical_analyses_share_one_completion():
+    """Layer 1 callers asking the same thing at once cost one API call"""
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        time.sleep(0.1)
+        message = SimpleNamespace(content=json.dumps(ANALYSIS))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    layers = [PromptEngineeringLayer("test-key", use_cache=False, use_fast_path=False) for _ in range(4)]
+    assert layers[0].client is layers[1].client
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    for layer in layers:
+        layer.client = client
+        layer.rate_limiter = RateLimiter(0, 0)
+
+    barrier = threading.Barrier(len(layers))
+    results = []
+
+    def analyze(layer):
+        barrier.wait()
+        results.append(layer.analyze_user_input("lunch with Sam sometime"))
+
+    threads = [threading.Thread(target=analyze, args=(layer,)) for layer in layers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [ANALYSIS] * 4
+    assert sum(layer.token_usage.report()["analyze"]["cache_hits"] for layer in layers) == 3
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
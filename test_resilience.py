@@ -0,0 +1,193 @@
+"""
+Test error classification, jittered retries, retry budgets and circuit breaking (no network)
+"""
+
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+from multi_layer_prompt_system import PromptEngineeringLayer
+from resilience import (CircuitBreaker, CircuitOpenError, RetryEngine, classify_error, retry_after_seconds,
+                        retry_budget)
+
+
+class StatusError(Exception):
+    """Shaped like openai.APIStatusError: status_code plus a response with headers"""
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"Error code: {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_engine(**kwargs):
+    sleeps = []
+    kwargs.setdefault("breaker", CircuitBreaker("test"))
+    engine = RetryEngine("test", sleep=sleeps.append, rng=random.Random(7), **kwargs)
+    return engine, sleeps
+
+
+def flaky(errors, result="ok"):
+    errors = list(errors)
+    calls = []
+
+    def operation():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    operation.calls = calls
+    return operation
+
+
+def test_classification():
+    """Rate limits and server errors retry, client errors don't; timeouts only for idempotent calls"""
+    assert classify_error(StatusError(429, {"retry-after": "3"})) == (True, "rate_limited", 429, 3.0)
+    assert classify_error(StatusError(503)).retryable
+    assert classify_error(StatusError(401)) == (False, "auth", 401, None)
+    assert not classify_error(StatusError(400)).retryable
+    assert not classify_error(ValueError("bad JSON")).retryable
+    assert classify_error(TimeoutError("timed out")).retryable
+    assert classify_error(TimeoutError("timed out"), idempotent=False) == (False, "ambiguous", None, None)
+    try:
+        try:
+            raise ConnectionRefusedError("refused")
+        except ConnectionRefusedError as e:
+            raise Exception("API error: 502 - bad gateway") from e  # how orgo reports HTTP errors
+    except Exception as wrapped:
+        assert classify_error(wrapped) == (True, "server_error", 502, None)
+    assert retry_after_seconds(StatusError(429, {"retry-after-ms": "250"})) == 0.25
+
+
+def test_jittered_retries_honour_retry_after():
+    """Waits stay within the jitter bounds, and a longer Retry-After hint wins"""
+    engine, sleeps = make_engine(max_attempts=4, base_delay=0.5, max_delay=4.0)
+    operation = flaky([StatusError(503), StatusError(429, {"retry-after": "6"}), StatusError(500)])
+    assert engine.call(operation) == "ok"
+    assert len(operation.calls) == 4
+    assert 0.5 <= sleeps[0] <= 1.5 and sleeps[1] == 6.0 and 0.5 <= sleeps[2] <= 4.0
+    assert engine.decisions["retry"] == 3 and engine.decisions["retry_after"] == 1
+    assert engine.decisions["success"] == 1
+
+
+def test_fatal_errors_are_not_retried():
+    engine, sleeps = make_engine()
+    operation = flaky([StatusError(400)])
+    with pytest.raises(StatusError):
+        engine.call(operation)
+    assert len(operation.calls) == 1 and not sleeps
+    assert engine.decisions["fatal"] == 1
+
+
+def test_request_budget_is_shared():
+    """Calls inside one retry_budget draw from the same retries"""
+    engine, sleeps = make_engine(max_attempts=5)
+    with retry_budget(max_retries=1):
+        assert engine.call(flaky([StatusError(503)])) == "ok"
+        with pytest.raises(StatusError):
+            engine.call(flaky([StatusError(503)]))
+    assert engine.decisions["budget_exhausted"] == 1 and len(sleeps) == 1
+
+
+def test_circuit_breaker_opens_and_probes():
+    """Repeated failures open the circuit; after the reset timeout one probe may close it again"""
+    clock = Clock()
+    breaker = CircuitBreaker("openai", failure_threshold=2, reset_timeout=30, clock=clock)
+    engine, _ = make_engine(max_attempts=2, breaker=breaker)
+    with pytest.raises(StatusError):
+        engine.call(flaky([StatusError(503), StatusError(503)]))
+    assert breaker.state == "open" and breaker.trips == 1
+
+    skipped = flaky([])
+    with pytest.raises(CircuitOpenError):
+        engine.call(skipped)
+    assert not skipped.calls and engine.decisions["circuit_open"] == 1
+
+    clock.now += 31
+    assert engine.call(skipped) == "ok"
+    assert breaker.state == "closed"
+    assert engine.metrics()["circuit"] == {"state": "closed", "consecutive_failures": 0, "trips": 1}
+
+
+def test_interrupted_probe_is_released():
+    """A probe ended by Ctrl-C or task cancellation doesn't leave the circuit refusing every call"""
+    clock = Clock()
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout=30, clock=clock)
+    engine, _ = make_engine(max_attempts=1, breaker=breaker)
+    with pytest.raises(StatusError):
+        engine.call(flaky([StatusError(503)]))
+    clock.now += 31
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        engine.call(interrupted)
+    assert breaker.state == "half_open"
+
+    async def cancelled():
+        raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(engine.acall(cancelled))
+    assert engine.call(flaky([])) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_async_and_background_variants():
+    """acall waits with asyncio.sleep; submit returns at once and retries on a timer"""
+    engine, _ = make_engine(base_delay=0.01, max_delay=0.02)
+
+    async def call():
+        attempts = []
+
+        async def operation():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise StatusError(502)
+            return "async ok"
+
+        return await engine.acall(operation), len(attempts)
+
+    assert asyncio.run(call()) == ("async ok", 2)
+
+    operation = flaky([StatusError(503), StatusError(503)], result="background ok")
+    start = time.perf_counter()
+    future = engine.submit(operation)
+    assert time.perf_counter() - start < 0.01
+    assert future.result(timeout=5) == "background ok"
+    assert len(operation.calls) == 3
+
+
+def test_layer1_fallback_is_reported_and_auth_errors_raise():
+    """Transient failures fall back after retries; a rejected API key is not hidden behind a fallback"""
+    layer = PromptEngineeringLayer("test-key", use_cache=False, use_fast_path=False)
+    layer.retry_engine, _ = make_engine()
+    errors = []
+
+    def create(**request):
+        raise errors[0]
+
+    layer.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    errors.append(StatusError(503))
+    assert layer.analyze_user_input("lunch with Sam")["confidence"] == 0.0
+    assert layer.fallbacks == {"analyze": 1}
+
+    errors[0] = StatusError(401)
+    with pytest.raises(StatusError):
+        layer.analyze_user_input("lunch with Sam")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,89 @@
+"""
+Test the screen capture service with a fake grabber (no display needed)
+"""
+
+import io
+import threading
+from PIL import Image
+from screen_capture import ScreenCaptureService
+
+
+class FakeShot:
+    def __init__(self, width, height, bgra):
+        self.size = (width, height)
+        self.bgra = bgra
+
+
+class FakeGrabber:
+    """Stands in for mss.mss(); every pixel is pure red in BGRA and the buffer is reused"""
+
+    instances = []
+
+    def __init__(self):
+        self.monitors = [None, {"left": 0, "top": 0, "width": 400, "height": 200}]
+        self.areas = []
+        self.closed = False
+        self._buffer = bytearray()
+        FakeGrabber.instances.append(self)
+
+    def grab(self, area):
+        self.areas.append(area)
+        size = area["width"] * area["height"] * 4
+        if len(self._buffer) != size:
+            self._buffer = bytearray(b"\x00\x00\xff\xff" * (area["width"] * area["height"]))
+        return FakeShot(area["width"], area["height"], self._buffer)
+
+    def close(self):
+        self.closed = True
+
+
+def make_service(**kwargs):
+    FakeGrabber.instances = []
+    return ScreenCaptureService(grabber_factory=FakeGrabber, **kwargs)
+
+
+def test_grabber_is_persistent_per_thread():
+    """Repeated grabs reuse one grabber per thread"""
+    service = make_service()
+    for _ in range(3):
+        service.grab(encode=False)
+    thread = threading.Thread(target=lambda: service.grab(encode=False))
+    thread.start()
+    thread.join()
+    assert len(FakeGrabber.instances) == 2
+    assert len(FakeGrabber.instances[0].areas) == 3
+    service.close()
+    assert FakeGrabber.instances[0].closed
+
+
+def test_downscale_and_colour_order():
+    """Frames are downscaled to max_width and BGRA is decoded as RGB"""
+    service = make_service(max_width=100)
+    frame = service.grab(encode=False)
+    assert frame.source_size == (400, 200)
+    assert frame.size == (100, 50)
+    assert frame.image.getpixel((10, 10)) == (255, 0, 0)
+    service.close()
+
+
+def test_region_crop_and_background_encoding():
+    """A region limits the grab and encoded bytes decode to the frame"""
+    service = make_service(region={"left": 10, "top": 20, "width": 64, "height": 32}, max_width=None)
+    frame = service.grab()
+    assert FakeGrabber.instances[0].areas == [{"left": 10, "top": 20, "width": 64, "height": 32}]
+    decoded = Image.open(io.BytesIO(frame.encoded(timeout=5)))
+    assert decoded.format == "PNG" and decoded.size == (64, 32)
+
+    # Full-size frames are detached from the grabber's reused buffer
+    FakeGrabber.instances[0]._buffer[:4] = b"\xff\x00\x00\xff"
+    assert frame.image.getpixel((0, 0)) == (255, 0, 0)
+
+    jpeg = make_service(image_format="JPEG").grab()
+    assert Image.open(io.BytesIO(jpeg.encoded(timeout=5))).format == "JPEG"
+    assert service.metrics()["frames"] == 1
+    service.close()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
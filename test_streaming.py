@@ -0,0 +1,121 @@
+"""
+Test token streaming of Layer 1 completions (no API calls)
+"""
+
+import json
+import tempfile
+import os
+from llm_cache import LLMResponseCache
+from multi_layer_prompt_system import PromptEngineeringLayer
+
+UNUSUAL_INPUT = "Team standup every Monday at 9am for 30 minutes"
+
+ANALYSIS = {
+    "extracted_details": {"title": "Team standup", "time": "09:00", "duration": "30 minutes"},
+    "missing_details": ["date"],
+    "confidence": 0.6,
+    "clarification_questions": ["Which Monday should it start?"]
+}
+
+
+def _chunk(text):
+    delta = type("Delta", (), {"content": text})
+    choice = type("Choice", (), {"delta": delta})
+    return type("Chunk", (), {"choices": [choice]})
+
+
+class _StreamingClient:
+    """Stands in for openai.OpenAI and streams a canned response in small pieces"""
+
+    def __init__(self, content, piece_size=8):
+        self.requests = []
+        client = self
+
+        class _Completions:
+            @staticmethod
+            def create(**kwargs):
+                client.requests.append(kwargs)
+                assert kwargs.get("stream") is True
+                pieces = [content[i:i + piece_size] for i in range(0, len(content), piece_size)]
+                # The final chunk of a real stream carries no content
+                return iter([_chunk(piece) for piece in pieces] + [_chunk(None)])
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+
+def make_layer(content, cache=None, on_token=None):
+    layer = PromptEngineeringLayer("test-key", use_cache=cache is not None, cache=cache, on_token=on_token)
+    layer.client = _StreamingClient(content)
+    return layer
+
+
+def test_on_token_receives_incremental_output():
+    """Completions are streamed to on_token and still parsed as a whole"""
+    tokens = []
+    layer = make_layer(json.dumps(ANALYSIS), on_token=tokens.append)
+
+    analysis = layer.analyze_user_input(UNUSUAL_INPUT)
+
+    assert analysis == ANALYSIS
+    assert len(tokens) > 2
+    assert "".join(tokens) == json.dumps(ANALYSIS) + "\n"
+
+
+def test_stream_completion_iterator_and_cache():
+    """stream_completion yields pieces, fills the cache and replays a hit in one piece; usage is accounted"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.sqlite3"))
+        layer = make_layer("Open Google Calendar and click Create.", cache=cache)
+        messages = [{"role": "user", "content": "instruction please"}]
+
+        pieces = list(layer.stream_completion(messages, temperature=0.1))
+        assert len(pieces) > 1
+        assert "".join(pieces) == "Open Google Calendar and click Create."
+
+        cached = list(layer.stream_completion(messages, temperature=0.1))
+        assert cached == ["Open Google Calendar and click Create."]
+        assert len(layer.client.requests) == 1
+        usage = layer.token_usage.report()["llm"]
+        assert usage["calls"] == 1 and usage["cache_hits"] == 1 and usage["completion_tokens"] > 0
+
+
+def test_stream_completion_raises_upstream_errors():
+    """A failed completion surfaces from the iterator after retries, instead of ending it silently"""
+    layer = make_layer("unused")
+
+    class _Down:
+        @staticmethod
+        def create(**kwargs):
+            raise ValueError("bad request")
+
+    layer.client.chat = type("Chat", (), {"completions": _Down})
+    try:
+        list(layer.stream_completion([{"role": "user", "content": "hi"}], temperature=0.1))
+    except ValueError as e:
+        assert str(e) == "bad request"
+    else:
+        raise AssertionError("expected the upstream error")
+
+
+def test_cache_hit_is_emitted_to_on_token():
+    """A cached completion reaches on_token at once without a request"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.sqlite3"))
+        layer = make_layer(json.dumps(ANALYSIS), cache=cache, on_token=lambda token: None)
+        layer.analyze_user_input(UNUSUAL_INPUT)
+
+        tokens = []
+        layer.on_token = tokens.append
+        assert layer.analyze_user_input(UNUSUAL_INPUT) == ANALYSIS
+        assert tokens == [json.dumps(ANALYSIS), "\n"]
+        assert len(layer.client.requests) == 1
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Token Streaming")
+    print("=" * 50)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
+    print("\n✅ All streaming tests passed!")
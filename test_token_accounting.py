@@ -0,0 +1,112 @@
+"""
+Test token accounting and the cache-friendly Layer 1 prompt layout (no API calls)
+"""
+
+import json
+from datetime import datetime as real_datetime
+import multi_layer_prompt_system
+from multi_layer_prompt_system import PromptEngineeringLayer
+from token_accounting import TokenUsageTracker, count_message_tokens, count_tokens, usage_counts
+
+UNUSUAL_INPUT = "Team standup every Monday at 9am for 30 minutes"
+DETAILS = {"title": "Team standup", "date": "2025-02-03", "time": "09:00", "duration": "30 minutes"}
+
+
+class _ScriptedClient:
+    """Stands in for openai.OpenAI; responses carry no usage so tokens are counted locally"""
+
+    def __init__(self, responses):
+        self.requests = []
+        client = self
+
+        class _Completions:
+            @staticmethod
+            def create(**kwargs):
+                client.requests.append(kwargs)
+                message = type("Message", (), {"content": responses[len(client.requests) - 1]})
+                choice = type("Choice", (), {"message": message})
+                return type("Response", (), {"choices": [choice]})
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+
+def _frozen_datetime(day):
+    class _FrozenDatetime(real_datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return real_datetime(2025, 1, day, 9, 0)
+    return _FrozenDatetime
+
+
+def test_counting_helpers():
+    """Local counts are positive and API usage wins when present"""
+    assert count_tokens("") == 0
+    assert count_tokens("Open Google Calendar") > 0
+    messages = [{"role": "system", "content": "hi"}, {"role": "user", "content": "there"}]
+    assert count_message_tokens(messages) > count_tokens("hi") + count_tokens("there")
+
+    usage = type("Usage", (), {"prompt_tokens": 11, "completion_tokens": 7})
+    assert usage_counts(usage, messages, "done", "gpt-4") == {"prompt_tokens": 11, "completion_tokens": 7}
+    local = usage_counts(None, messages, "done", "gpt-4")
+    assert local["prompt_tokens"] == count_message_tokens(messages)
+
+
+def test_tracker_report_per_stage():
+    """The report has per-stage totals, averages and an overall row"""
+    tracker = TokenUsageTracker()
+    tracker.record("analyze", 200, 50)
+    tracker.record("analyze", 100, 30)
+    tracker.record("generate", 0, 0, cache_hit=True)
+    report = tracker.report()
+    assert report["analyze"]["calls"] == 2
+    assert report["analyze"]["avg_prompt_tokens"] == 150
+    assert report["generate"]["cache_hits"] == 1 and report["generate"]["calls"] == 0
+    assert report["all"]["prompt_tokens"] == 300 and report["all"]["completion_tokens"] == 80
+
+
+def test_system_prompts_are_stable_across_days(monkeypatch):
+    """Only the end of the user message changes with the date, so the prefix can be cached"""
+    layer = PromptEngineeringLayer("test-key", use_cache=False)
+    builds = []
+    for day in (27, 28):
+        monkeypatch.setattr(multi_layer_prompt_system, "datetime", _frozen_datetime(day))
+        builds.append([
+            layer._analysis_messages(UNUSUAL_INPUT),
+            layer._plan_messages(UNUSUAL_INPUT),
+            layer._refine_messages(DETAILS, {}),
+        ])
+
+    for first, second in zip(*builds):
+        assert first[0] == second[0]
+        assert first[1]["content"] != second[1]["content"]
+        assert first[1]["content"].rsplit("\n", 1)[-1].startswith("Current date:")
+    assert "2025-01-28" in builds[1][0][1]["content"]
+
+
+def test_prompt_budgets():
+    """Guards against the analysis and instruction prompts growing back"""
+    layer = PromptEngineeringLayer("test-key", use_cache=False)
+    assert count_message_tokens(layer._analysis_messages(UNUSUAL_INPUT)) < 300
+    assert count_message_tokens(layer._instruction_messages(DETAILS)) < 300
+
+
+def test_layer_records_tokens_per_stage():
+    """Every LLM call adds its prompt and completion tokens to its stage"""
+    analysis = {"extracted_details": DETAILS, "missing_details": [], "confidence": 0.9,
+                "clarification_questions": []}
+    layer = PromptEngineeringLayer("test-key", use_cache=False, use_local_compiler=False)
+    layer.client = _ScriptedClient([json.dumps(analysis), "1. Open Google Calendar"])
+
+    layer.analyze_user_input(UNUSUAL_INPUT)
+    layer.generate_agent_s_instruction(DETAILS)
+
+    report = layer.token_usage.report()
+    assert report["analyze"]["calls"] == 1
+    assert report["analyze"]["prompt_tokens"] == count_message_tokens(layer.client.requests[0]["messages"])
+    assert report["generate"]["completion_tokens"] == count_tokens("1. Open Google Calendar")
+    assert report["all"]["calls"] == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
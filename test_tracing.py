@@ -0,0 +1,160 @@
+"""
+Test pipeline tracing spans and the JSONL exporter (no API calls)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import multi_layer_prompt_system
+from async_multi_layer_system import AsyncMultiLayerCalendarSystem
+from multi_layer_prompt_system import MultiLayerCalendarSystem
+from performance_optimizer import OptimizedCalendarAgent
+from tracing import NOOP_SPAN, JsonlSpanExporter, Tracer, current_span, set_tracer
+
+UNUSUAL_INPUT = "Team standup every Monday at 9am for 30 minutes"
+
+ANALYSIS = {
+    "extracted_details": {"title": "Team standup", "date": "2025-02-03", "time": "09:00", "duration": "30 minutes"},
+    "missing_details": [],
+    "confidence": 0.95,
+    "clarification_questions": []
+}
+
+
+class _ScriptedClient:
+    """Stands in for openai.OpenAI, returning a canned completion with token usage"""
+
+    def __init__(self, content):
+        class _Completions:
+            @staticmethod
+            def create(**kwargs):
+                message = type("Message", (), {"content": content})
+                choice = type("Choice", (), {"message": message})
+                usage = type("Usage", (), {"prompt_tokens": 120, "completion_tokens": 40})
+                return type("Response", (), {"choices": [choice], "usage": usage})
+
+        self.chat = type("Chat", (), {"completions": _Completions})
+
+
+def read_spans(path):
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                for scope_spans in resource_spans["scopeSpans"]:
+                    spans.extend(scope_spans["spans"])
+    return {span["name"]: span for span in spans}
+
+
+def attributes(span):
+    return {item["key"]: list(item["value"].values())[0] for item in span["attributes"]}
+
+
+def test_disabled_tracer_returns_noop_span():
+    """Without an exporter every span is the shared no-op span"""
+    tracer = Tracer()
+    with tracer.span("anything") as span:
+        span.set_attribute("ignored", 1)
+        assert span is NOOP_SPAN
+        assert current_span() is NOOP_SPAN
+
+
+def test_pipeline_spans_exported_as_otlp_jsonl(monkeypatch):
+    """A request produces nested stage and LLM spans with usage attributes"""
+    monkeypatch.setattr(multi_layer_prompt_system, "create_calendar_event_with_agent_s", lambda instruction: None)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spans.jsonl")
+        exporter = JsonlSpanExporter(path)
+        set_tracer(Tracer(exporter))
+        try:
+            system = MultiLayerCalendarSystem("test-key", use_cache=False)
+            system.prompt_engineer.client = _ScriptedClient(json.dumps(ANALYSIS))
+            assert system.create_calendar_event(UNUSUAL_INPUT, ask=lambda questions: {})
+        finally:
+            set_tracer(None)
+            exporter.close()
+
+        spans = read_spans(path)
+
+    root = spans["calendar.create_event"]
+    analyze = spans["layer1.analyze"]
+    llm = spans["llm.chat_completion"]
+    execute = spans["layer2.execute"]
+
+    assert root["parentSpanId"] == ""
+    assert analyze["parentSpanId"] == root["spanId"]
+    assert llm["parentSpanId"] == analyze["spanId"]
+    assert execute["parentSpanId"] == root["spanId"]
+    assert len({span["traceId"] for span in spans.values()}) == 1
+    assert "layer1.generate" in spans  # compiled locally, but still timed
+
+    llm_attributes = attributes(llm)
+    assert llm_attributes["llm.model"] == "gpt-4"
+    assert llm_attributes["llm.prompt_tokens"] == "120"
+    assert llm_attributes["llm.completion_tokens"] == "40"
+    assert llm_attributes["llm.cache_hit"] is False
+    assert attributes(root)["request.id"] == root["traceId"]
+    assert int(llm["endTimeUnixNano"]) >= int(llm["startTimeUnixNano"])
+    assert root["status"]["code"] == 1
+
+
+def test_failed_execution_marks_span_as_error(monkeypatch):
+    """An executor exception is recorded on the layer2 span"""
+    def failing_executor(instruction):
+        raise RuntimeError("desktop unreachable")
+
+    monkeypatch.setattr(multi_layer_prompt_system, "create_calendar_event_with_agent_s", failing_executor)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spans.jsonl")
+        exporter = JsonlSpanExporter(path)
+        set_tracer(Tracer(exporter))
+        try:
+            system = MultiLayerCalendarSystem("test-key", use_cache=False)
+            assert not system.create_calendar_event("Dentist on August 22nd at 8am for 1 hour")
+        finally:
+            set_tracer(None)
+            exporter.close()
+
+        spans = read_spans(path)
+
+    execute = spans["layer2.execute"]
+    assert execute["status"]["code"] == 2
+    assert execute["events"][0]["name"] == "exception"
+    assert spans["calendar.create_event"]["status"]["code"] == 2
+
+
+def test_worker_threads_keep_the_callers_trace(monkeypatch):
+    """Executor-pool and batch worker threads see the caller's span, so their spans join its trace"""
+    seen = []
+
+    def executor(instruction):
+        seen.append(current_span())
+
+    class _Computer:
+        def prompt(self, instruction):
+            seen.append(current_span())
+            return "done"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exporter = JsonlSpanExporter(os.path.join(tmp, "spans.jsonl"))
+        tracer = Tracer(exporter)
+        set_tracer(tracer)
+        try:
+            system = AsyncMultiLayerCalendarSystem("test-key", executor=executor, use_cache=False)
+            assert asyncio.run(system.acreate_calendar_event("Dentist on August 22nd at 8am for 1 hour"))
+            agent = OptimizedCalendarAgent("test-project", use_cache=False, computers=[_Computer(), _Computer()])
+            with tracer.span("batch") as batch:
+                agent.batch_operations(["Check Monday", "Check Tuesday"])
+        finally:
+            set_tracer(None)
+            exporter.close()
+
+    assert seen[0].name == "layer2.execute"
+    assert [span.name for span in seen[1:]] == ["orgo.operation"] * 2
+    assert all(span.parent_span_id == batch.span_id and span.trace_id == batch.trace_id for span in seen[1:])
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
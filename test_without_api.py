@@ -33,7 +33,7 @@ def test_system_structure():
         from multi_layer_prompt_system import PromptEngineeringLayer
         
         # Test class initialization (won't make API calls)
-        prompt_layer = PromptEngineeringLayer(mock_api_key)
+        prompt_layer = PromptEngineeringLayer(mock_api_key, use_cache=False)
         print("✅ PromptEngineeringLayer initialized")
         
         # Test method existence
@@ -0,0 +1,125 @@
+"""
+Token Accounting
+Counts prompt and completion tokens per Layer 1 stage. Counting is local:
+tiktoken is used when it is installed (pip install tiktoken), otherwise a
+~4 characters per token estimate. Token usage reported by the API takes
+precedence over the local count when it is available.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Chat formatting overhead per message and for the reply primer (OpenAI cookbook figures)
+TOKENS_PER_MESSAGE = 3
+REPLY_PRIMER_TOKENS = 3
+
+_encodings: Dict[str, object] = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except Exception:
+                try:
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # e.g. the encoding file cannot be downloaded; fall back to the estimate
+                    _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Number of tokens in text for the given model
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model) if TIKTOKEN_AVAILABLE else None
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4") -> int:
+    """
+    Prompt tokens of a chat request, including per-message formatting overhead
+    """
+    total = REPLY_PRIMER_TOKENS
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get("content", ""), model)
+    return total
+
+
+class TokenUsageTracker:
+    """
+    Thread-safe per-stage totals of prompt and completion tokens
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int, cache_hit: bool = False) -> None:
+        """
+        Adds one call; cache hits are counted separately since they cost no tokens
+        """
+        with self._lock:
+            totals = self._stages.setdefault(stage, {
+                "calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            if cache_hit:
+                totals["cache_hits"] += 1
+                return
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage totals plus averages per API call and an "all" row
+        """
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self._stages.items()}
+        overall = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        for totals in stages.values():
+            for key in overall:
+                overall[key] += totals[key]
+        stages["all"] = overall
+        for totals in stages.values():
+            calls = totals["calls"]
+            totals["avg_prompt_tokens"] = totals["prompt_tokens"] / calls if calls else 0.0
+            totals["avg_completion_tokens"] = totals["completion_tokens"] / calls if calls else 0.0
+        return stages
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def print_report(self) -> None:
+        print("\n🔢 Layer 1 token usage by stage:")
+        for stage, totals in self.report().items():
+            print(f"   {stage:10s} calls {totals['calls']:4d}  cache hits {totals['cache_hits']:4d}  "
+                  f"prompt {totals['prompt_tokens']:7d}  completion {totals['completion_tokens']:7d}  "
+                  f"(avg {totals['avg_prompt_tokens']:.0f}/{totals['avg_completion_tokens']:.0f})")
+
+
+def usage_counts(usage: Optional[object], messages: List[Dict[str, str]], completion: str,
+                 model: str) -> Dict[str, int]:
+    """
+    Prompt/completion token counts, from the API usage object if given, else counted locally
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    return {
+        "prompt_tokens": prompt_tokens if prompt_tokens is not None else count_message_tokens(messages, model),
+        "completion_tokens": completion_tokens if completion_tokens is not None else count_tokens(completion, model),
+    }
@@ -0,0 +1,238 @@
+"""
+Pipeline Tracing
+Lightweight spans around the analyze → refine → generate → execute stages
+and every LLM call. Finished spans are appended to a JSONL file in the
+OTLP/JSON shape (one {"resourceSpans": [...]} object per line, like the
+OpenTelemetry Collector file exporter), so they can be loaded by any
+OTLP-aware tool.
+
+Tracing is off unless TRACE_JSONL_PATH is set (or set_tracer is called);
+a disabled tracer hands out one shared no-op span, so instrumented code
+pays for little more than a function call.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+SERVICE_NAME = "ai-calendar-system"
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_UNSET = 0
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    # OTLP/JSON AnyValue encoding; int64 values are strings in proto3 JSON
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """
+    A timed operation; use as a context manager so it always ends and exports
+    """
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, kind: int, parent: Optional["Span"],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else ""
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events = []
+        self.status_code = STATUS_CODE_UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = 0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_status(self, ok: bool, message: str = "") -> None:
+        self.status_code = STATUS_CODE_OK if ok else STATUS_CODE_ERROR
+        self.status_message = message
+
+    def record_exception(self, error: BaseException) -> None:
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": [
+                {"key": "exception.type", "value": {"stringValue": type(error).__name__}},
+                {"key": "exception.message", "value": {"stringValue": str(error)}},
+            ],
+        })
+        self.set_status(False, str(error))
+
+    def end(self) -> None:
+        if self.end_time_ns:
+            return
+        self.end_time_ns = time.time_ns()
+        if self.status_code == STATUS_CODE_UNSET:
+            self.status_code = STATUS_CODE_OK
+        self.tracer.export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self.end()
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+            "events": self.events,
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+
+
+class _NoopSpan:
+    """
+    Shared stand-in returned while tracing is disabled
+    """
+
+    recording = False
+    trace_id = ""
+    span_id = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_status(self, ok: bool, message: str = "") -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlSpanExporter:
+    """
+    Appends finished spans to a JSONL file, one OTLP/JSON resourceSpans object per line
+    """
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [span.to_otlp()]}],
+            }]
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to the exporter; without an exporter it is disabled
+    """
+
+    def __init__(self, exporter: Optional[JsonlSpanExporter] = None):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL):
+        """
+        Starts a child of the current span (or a new trace); returns NOOP_SPAN when disabled
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, kind, _current_span.get(), attributes)
+
+    def export(self, span: Span) -> None:
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide tracer, exporting to TRACE_JSONL_PATH when it is set
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                path = os.getenv("TRACE_JSONL_PATH")
+                _tracer = Tracer(JsonlSpanExporter(path) if path else None)
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """
+    Replaces the process-wide tracer (None re-reads TRACE_JSONL_PATH on next use)
+    """
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def current_span():
+    """
+    Returns the active span, or NOOP_SPAN outside any span
+    """
+    return _current_span.get() or NOOP_SPAN